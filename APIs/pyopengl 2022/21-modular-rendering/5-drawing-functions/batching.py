@@ -0,0 +1,312 @@
+from config import *
+from constants import *
+
+#---- Batching ----#
+#region
+def gather_instances(objects: list, tinted: bool = False) -> tuple[np.ndarray]:
+    """
+        Collect what's needed to draw a list of objects.
+
+        Parameters:
+
+            objects: the objects to draw, each with render and
+                transform components (and a light component if tinted).
+                Their transforms must all be kept in the same store.
+
+            tinted: whether to take each object's tint from its light's
+                color. Otherwise objects are drawn untinted.
+
+        Returns:
+
+            (mesh_types, transform_ids, instances): the objects' mesh
+            types, their indices in the transform store, and a
+            DATA_TYPE_INSTANCE array with materials and tints filled
+            in, all in the order given.
+    """
+
+    count = len(objects)
+    mesh_types = np.fromiter(
+        (obj.render.mesh_type for obj in objects), dtype=np.int32, count = count)
+    instances = np.zeros(count, dtype=DATA_TYPE_INSTANCE)
+    if count == 0:
+        return mesh_types, np.zeros(0, dtype=np.int64), instances
+
+    instances['material'] = np.fromiter(
+        (obj.render.material_type for obj in objects),
+        dtype=np.float32, count = count) - WOOD_MATERIAL
+    #objects share a transform store, so their matrices are one gather
+    store = objects[0].transform.store
+    assert all(obj.transform.store is store for obj in objects), \
+        "objects must keep their transforms in the same store"
+    transform_ids = np.fromiter(
+        (obj.transform.index for obj in objects), dtype=np.int64, count = count)
+    if tinted:
+        instances['tint'] = [obj.light.color for obj in objects]
+    else:
+        instances['tint'] = 1.0
+
+    return mesh_types, transform_ids, instances
+
+def sort_into_groups(mesh_types: np.ndarray,
+                     materials: np.ndarray) -> tuple[np.ndarray]:
+    """
+        Order objects so each mesh and material pair is contiguous.
+
+        Parameters:
+
+            mesh_types: mesh type of each object.
+
+            materials: material of each object.
+
+        Returns:
+
+            (order, group_meshes, group_starts, group_counts): the
+            permutation putting objects in group order, then each
+            group's mesh, first position and size in that order.
+    """
+
+    if len(mesh_types) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty
+
+    materials = materials.astype(np.int64)
+    keys = mesh_types.astype(np.int64) * (materials.max() + 1) + materials
+    order = np.argsort(keys, kind = "stable")
+    sorted_keys = keys[order]
+
+    group_starts = np.flatnonzero(np.diff(sorted_keys, prepend = -1))
+    group_counts = np.diff(group_starts, append = len(keys))
+    group_meshes = mesh_types[order[group_starts]]
+
+    return order, group_meshes, group_starts, group_counts
+
+def build_commands(group_meshes: np.ndarray, group_starts: np.ndarray,
+                   group_counts: np.ndarray,
+                   offsets: dict[int, tuple[int]],
+                   index_byte_offset: int = 0) -> np.ndarray:
+    """
+        Make one indirect draw command per group.
+
+        Parameters:
+
+            group_meshes, group_starts, group_counts: as returned
+                by sort_into_groups.
+
+            offsets: a MeshGroup's offsets, mesh type to
+                (first vertex, index byte offset, index count).
+
+            index_byte_offset: where the index partition starts
+                in the element buffer.
+
+        Returns:
+
+            A DATA_TYPE_DRAW_COMMAND array.
+    """
+
+    commands = np.zeros(len(group_meshes), dtype=DATA_TYPE_DRAW_COMMAND)
+    for i, mesh_type in enumerate(group_meshes):
+        first_vertex, local_offset, index_count = offsets[int(mesh_type)]
+        commands[i] = (index_count, group_counts[i],
+                       (local_offset + index_byte_offset) // 4,
+                       first_vertex, group_starts[i])
+
+    return commands
+
+def batch_objects(objects: list, offsets: dict[int, tuple[int]],
+                  index_byte_offset: int = 0,
+                  tinted: bool = False) -> tuple[np.ndarray]:
+    """
+        Turn a list of objects into instance data and draw commands.
+        Needs no GL context.
+
+        Parameters:
+
+            objects: the objects to draw.
+
+            offsets, index_byte_offset: as for build_commands.
+
+            tinted: as for gather_instances.
+
+        Returns:
+
+            (transform_ids, instances, commands): each instance's index
+            in the transform store and its data, both in group order,
+            then one draw command per group. Model matrices are left
+            for the caller to gather.
+    """
+
+    mesh_types, transform_ids, instances = gather_instances(objects, tinted)
+    order, group_meshes, group_starts, group_counts = sort_into_groups(
+        mesh_types, instances['material'])
+    commands = build_commands(group_meshes, group_starts, group_counts,
+                              offsets, index_byte_offset)
+
+    return transform_ids[order], instances[order], commands
+
+class Batch:
+    """
+        A list of objects, batched. The groups, draw commands,
+        materials and tints only change with the list, so they're
+        kept, and each frame just gathers the model matrices.
+        Objects' meshes, materials and light colors are read
+        when the batch is made.
+    """
+
+    def __init__(self, objects: list, offsets: dict[int, tuple[int]],
+                 index_byte_offset: int = 0, tinted: bool = False):
+        """
+            Batch the objects.
+
+            Parameters:
+
+                objects: the objects to draw.
+
+                offsets, index_byte_offset: as for build_commands.
+
+                tinted: as for gather_instances.
+        """
+
+        self.objects = list(objects)
+        self.mesh_count = len(offsets)
+        self.index_byte_offset = index_byte_offset
+        self.store = objects[0].transform.store if objects else None
+        self.transform_ids, self.instances, self.commands = batch_objects(
+            objects, offsets, index_byte_offset, tinted)
+
+    def matches(self, objects: list, offsets: dict[int, tuple[int]],
+                index_byte_offset: int = 0) -> bool:
+        """
+            Whether the batch still describes the objects, for
+            the mesh group's current layout.
+        """
+
+        return len(offsets) == self.mesh_count \
+            and index_byte_offset == self.index_byte_offset \
+            and objects == self.objects
+
+    def update(self) -> np.ndarray:
+        """
+            Gather the objects' current model matrices.
+
+            Returns:
+
+                The instance data, in group order.
+        """
+
+        if self.store is not None:
+            self.instances['model'] = self.store.matrices[self.transform_ids]
+
+        return self.instances
+#endregion
+
+#---- Rendering ----#
+#region
+class BatchRenderer:
+    """
+        Draws lists of objects from a MeshGroup, one draw per mesh and
+        material rather than per object. Transforms and materials are
+        read from an instance buffer.
+    """
+
+    def __init__(self, mesh_group: "meshes.MeshGroup"):
+        """
+            Attach an instance buffer to the mesh group's vertex array.
+
+            Parameters:
+
+                mesh_group: the meshes to draw.
+        """
+
+        self.mesh_group = mesh_group
+        self.instance_buffer = glGenBuffers(1)
+        #(id of the object list, tinted): its Batch
+        self.batches: dict[tuple[int, bool], Batch] = {}
+
+        #multi draw indirect needs 4.3, otherwise each group is its own
+        #instanced draw with the instance attributes pointed at its slice
+        version = (glGetIntegerv(GL_MAJOR_VERSION), glGetIntegerv(GL_MINOR_VERSION))
+        self.multi_draw = version >= (4, 3)
+        self.command_buffer = glGenBuffers(1) if self.multi_draw else None
+
+        glBindVertexArray(mesh_group.VAO)
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_buffer)
+        glBufferData(GL_ARRAY_BUFFER, DATA_TYPE_INSTANCE.itemsize, None, GL_STREAM_DRAW)
+        #model matrix columns at 5 to 8, material at 9, tint at 10
+        for attribute in range(5, 11):
+            glEnableVertexAttribArray(attribute)
+            glVertexAttribDivisor(attribute, 1)
+        self.point_attributes(0)
+
+    def point_attributes(self, first_instance: int) -> None:
+        """
+            Point the instance attributes at the given instance onwards.
+        """
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_buffer)
+        stride = DATA_TYPE_INSTANCE.itemsize
+        offset = first_instance * stride
+        #model
+        for column in range(4):
+            glVertexAttribPointer(5 + column, 4, GL_FLOAT, GL_FALSE,
+                                  stride, ctypes.c_void_p(offset + 16 * column))
+        #material
+        glVertexAttribPointer(9, 1, GL_FLOAT, GL_FALSE,
+                              stride, ctypes.c_void_p(offset + 64))
+        #tint
+        glVertexAttribPointer(10, 3, GL_FLOAT, GL_FALSE,
+                              stride, ctypes.c_void_p(offset + 68))
+
+    def draw(self, objects: list, tinted: bool = False) -> None:
+        """
+            Draw the objects with the current shader.
+
+            Parameters:
+
+                objects: the objects to draw.
+
+                tinted: whether objects carry a light whose
+                    color tints them.
+        """
+
+        if not objects:
+            return
+
+        #rebatch only when the list or the mesh group's layout changes
+        offsets = self.mesh_group.offsets
+        index_byte_offset = self.mesh_group.buffer.partitions[1].offset
+        key = (id(objects), tinted)
+        batch = self.batches.get(key)
+        if batch is None or not batch.matches(objects, offsets, index_byte_offset):
+            batch = Batch(objects, offsets, index_byte_offset, tinted)
+            self.batches[key] = batch
+        instances = batch.update()
+        commands = batch.commands
+
+        self.mesh_group.bind()
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_buffer)
+        glBufferData(GL_ARRAY_BUFFER, instances.nbytes, instances, GL_STREAM_DRAW)
+
+        if self.multi_draw:
+            self.point_attributes(0)
+            glBindBuffer(GL_DRAW_INDIRECT_BUFFER, self.command_buffer)
+            glBufferData(GL_DRAW_INDIRECT_BUFFER, commands.nbytes, commands, GL_STREAM_DRAW)
+            glMultiDrawElementsIndirect(GL_TRIANGLES, GL_UNSIGNED_INT,
+                                        None, len(commands), 0)
+            return
+
+        for command in commands:
+            self.point_attributes(int(command['base_instance']))
+            glDrawElementsInstancedBaseVertex(
+                GL_TRIANGLES, int(command['count']), GL_UNSIGNED_INT,
+                ctypes.c_void_p(4 * int(command['first_index'])),
+                int(command['instance_count']), int(command['base_vertex']))
+
+    def destroy(self) -> None:
+        """
+            Destroy everything.
+        """
+
+        glDeleteBuffers(1, (self.instance_buffer,))
+        if self.command_buffer is not None:
+            glDeleteBuffers(1, (self.command_buffer,))
+#endregion
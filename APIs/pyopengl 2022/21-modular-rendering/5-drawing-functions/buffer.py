@@ -43,6 +43,27 @@ class Partition:
 
         self.host_memory[:] = data[:len(self.host_memory)]
 
+    def blit_range(self, data: np.ndarray, first: int) -> int:
+        """
+            Copy elements into part of the backing memory.
+
+            Parameters:
+
+                data: numpy array of data to copy in
+
+                first: element to start writing at
+
+            Returns:
+
+                The number of elements written, anything past
+                the end of the region is dropped.
+        """
+
+        count = max(0, min(len(data), len(self.host_memory) - first))
+        self.host_memory[first:first + count] = data[:count]
+
+        return count
+
 class Buffer:
     """
         An allocation of memory on the GPU. Regions can be bound as independent resources.
@@ -122,6 +143,46 @@ class Buffer:
         glBufferSubData(partition.target, partition.offset,
                         partition.size, partition.host_memory)
 
+    def blit_range(self, partition_index: int, 
+                   data: np.ndarray, first: int) -> None:
+        """
+            Upload data to part of a partition, the rest is left as is.
+
+            Parameters:
+
+                partition_index: index of the partition to upload to
+
+                data: array of data to upload
+
+                first: element of the partition to start writing at
+        """
+
+        count = self.partitions[partition_index].blit_range(data, first)
+        self.upload(partition_index, first, count)
+
+    def upload(self, partition_index: int, first: int, count: int) -> None:
+        """
+            Send a range of a partition's backing memory to the GPU.
+            Goes through the copy write target, so whichever
+            vertex array is bound keeps its element buffer.
+
+            Parameters:
+
+                partition_index: index of the partition to upload
+
+                first, count: range of elements to send
+        """
+
+        if count <= 0:
+            return
+
+        partition = self.partitions[partition_index]
+        itemsize = partition.host_memory.itemsize
+        glBindBuffer(GL_COPY_WRITE_BUFFER, self.device_memory)
+        glBufferSubData(GL_COPY_WRITE_BUFFER, 
+                        partition.offset + first * itemsize, count * itemsize,
+                        partition.host_memory[first:first + count])
+
     def read_from(self, partition_index: int) -> None:
         """
             Bind a partition of the buffer for GPU usage.
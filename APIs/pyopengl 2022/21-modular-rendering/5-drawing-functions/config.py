@@ -7,18 +7,24 @@ import pyrr
 import ctypes
 from PIL import Image, ImageOps
 import math
-from numba import njit
+from numba import njit, prange
 
 vec = list[float]
 
-DATA_TYPE_PARTICLE = np.dtype({
+#one drawn object: model matrix, material layer and tint
+DATA_TYPE_INSTANCE = np.dtype({
+    'names': ['model', 'material', 'tint'],
+    'formats': [(np.float32, (4, 4)), np.float32, (np.float32, 3)],
+    'offsets': [0, 64, 68],
+    'itemsize': 80})
+
+#laid out as GL's DrawElementsIndirectCommand
+DATA_TYPE_DRAW_COMMAND = np.dtype({
     'names': [
-         'x',  'y',  'z',
-         'vx', 'vy', 'vz'],
+        'count', 'instance_count', 'first_index',
+        'base_vertex', 'base_instance'],
     'formats': [
-        np.float32, np.float32, np.float32,
-        np.float32, np.float32, np.float32],
-    'offsets': [
-         0,  4,  8,
-         12, 16, 20],
-    'itemsize': 24})
+        np.uint32, np.uint32, np.uint32,
+        np.int32, np.uint32],
+    'offsets': [0, 4, 8, 12, 16],
+    'itemsize': 20})
\ No newline at end of file
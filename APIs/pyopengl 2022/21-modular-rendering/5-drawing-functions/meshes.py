@@ -1,20 +1,34 @@
 from config import *
 import buffer
+import obj_loader
 
 class MeshGroup:
     """
         A group of meshes, can be bound and drawn easily.
+
+        Meshes added before build are only collected, build then sizes
+        one buffer for all of them and writes each into place. Meshes
+        added afterwards are streamed into the spare room, the buffer
+        doubles in size whenever that runs out.
     """
 
-    def __init__(self):
+    def __init__(self, vertex_capacity: int = 0, index_capacity: int = 0):
         """
             Initialize a new MeshGroup
+
+            Parameters:
+
+                vertex_capacity, index_capacity: room to reserve on build,
+                    for meshes which will be added later. The buffer is
+                    always made big enough for what's already been added.
         """
 
         self.offsets: dict[int, tuple[int]] = {}
-        self.buffer = buffer.Buffer()
-        self.vertices = np.array([], dtype=np.float32)
-        self.indices = np.array([], dtype=np.uint32)
+        self.buffer: buffer.Buffer | None = None
+        #meshes waiting for build
+        self.pending: list[tuple[int, int, np.ndarray, np.ndarray]] = []
+        self.vertex_capacity = vertex_capacity
+        self.index_capacity = index_capacity
         self.first_vertex = 0
         self.first_index = 0
         self.VAO = glGenVertexArrays(1)
@@ -31,20 +45,7 @@ class MeshGroup:
         """
 
         mesh = Mesh(filename)
-        vertices = mesh.vertices
-        vertex_count = len(vertices)//14
-        indices = mesh.indices
-        index_count = len(indices)
-        index_byte_offset = self.first_index * 4
-        self.offsets[mesh_id] = (self.first_vertex,
-                                   index_byte_offset,
-                                   index_count)
-
-        self.first_vertex += vertex_count
-        self.vertices = np.append(self.vertices, vertices)
-
-        self.first_index += index_count
-        self.indices = np.append(self.indices, indices)
+        self.add_mesh(mesh_id, mesh.vertices, mesh.indices)
 
     def add_billboard(self, mesh_id: int, size: tuple[float]) -> None:
         """
@@ -59,43 +60,108 @@ class MeshGroup:
 
         width, height = size
         mesh = BillBoard(width, height)
-        vertices = mesh.vertices
+        self.add_mesh(mesh_id, mesh.vertices, mesh.indices)
+
+    def add_mesh(self, mesh_id: int, 
+                 vertices: np.ndarray, indices: np.ndarray) -> None:
+        """
+            Add a mesh to the group. Before build this only records it,
+            after build its vertices and indices are uploaded straight away.
+
+            Parameters:
+
+                mesh_id: id of the mesh to add. Used later for drawing.
+
+                vertices: flat array of vertices, 14 floats each.
+
+                indices: the mesh's indices, counting from its first vertex.
+        """
+
         vertex_count = len(vertices)//14
-        indices = mesh.indices
         index_count = len(indices)
         index_byte_offset = self.first_index * 4
         self.offsets[mesh_id] = (self.first_vertex,
                                    index_byte_offset,
                                    index_count)
 
-        self.first_vertex += vertex_count
-        self.vertices = np.append(self.vertices, vertices)
+        if self.buffer is None:
+            self.pending.append(
+                (self.first_vertex, self.first_index, vertices, indices))
+        else:
+            self.reserve(self.first_vertex + vertex_count,
+                         self.first_index + index_count)
+            self.buffer.blit_range(0, vertices, self.first_vertex * 14)
+            self.buffer.blit_range(1, indices, self.first_index)
 
+        self.first_vertex += vertex_count
         self.first_index += index_count
-        self.indices = np.append(self.indices, indices)
-
-        vertex_count = len(vertices)//14
 
     def build(self) -> None:
         """
             Build the underlying GPU resource, This action should be performed
-            once, upon adding all meshes and before drawing.
+            once, upon adding the initial meshes and before drawing.
         """
 
-        vertex_count = len(self.vertices)//14
+        self.allocate(max(self.first_vertex, self.vertex_capacity),
+                      max(self.first_index, self.index_capacity))
 
-        glBindVertexArray(self.VAO)
+        vertex_partition, index_partition = self.buffer.partitions
+        for first_vertex, first_index, vertices, indices in self.pending:
+            vertex_partition.blit_range(vertices, first_vertex * 14)
+            index_partition.blit_range(indices, first_index)
+        self.pending.clear()
+
+        self.buffer.upload(0, 0, self.first_vertex * 14)
+        self.buffer.upload(1, 0, self.first_index)
+
+    def reserve(self, vertex_count: int, index_count: int) -> None:
+        """
+            Make sure the buffer can hold the given number of vertices
+            and indices, at least doubling it if it has to grow.
+        """
+
+        if vertex_count <= self.vertex_capacity \
+            and index_count <= self.index_capacity:
+            return
+
+        if vertex_count > self.vertex_capacity:
+            vertex_count = max(vertex_count, 2 * self.vertex_capacity)
+        if index_count > self.index_capacity:
+            index_count = max(index_count, 2 * self.index_capacity)
+        self.allocate(max(vertex_count, self.vertex_capacity),
+                      max(index_count, self.index_capacity))
+
+    def allocate(self, vertex_capacity: int, index_capacity: int) -> None:
+        """
+            Make a buffer of the given size and point the vertex array
+            at it. Anything already uploaded is carried over.
+            Whichever vertex array was bound before is bound again after,
+            so this is safe mid frame.
+        """
 
-        vertex_partition = self.buffer.add_partition(self.vertices.nbytes,
+        old_buffer = self.buffer
+        self.vertex_capacity = max(vertex_capacity, 1)
+        self.index_capacity = max(index_capacity, 1)
+
+        self.buffer = buffer.Buffer()
+        vertex_partition = self.buffer.add_partition(self.vertex_capacity * 56,
                                                      np.float32,
                                                      GL_ARRAY_BUFFER)
-        index_partition = self.buffer.add_partition(self.indices.nbytes,
+        index_partition = self.buffer.add_partition(self.index_capacity * 4,
                                                     np.uint32,
                                                     GL_ELEMENT_ARRAY_BUFFER)
         self.buffer.build()
 
+        if old_buffer is not None:
+            self.buffer.blit_range(vertex_partition, 
+                old_buffer.partitions[0].host_memory[:self.first_vertex * 14], 0)
+            self.buffer.blit_range(index_partition,
+                old_buffer.partitions[1].host_memory[:self.first_index], 0)
+            old_buffer.destroy()
+
+        previous_vao = glGetIntegerv(GL_VERTEX_ARRAY_BINDING)
+        glBindVertexArray(self.VAO)
         self.buffer.bind(vertex_partition)
-        self.buffer.blit(vertex_partition, self.vertices)
 
         # x, y, z, s, t, nx, ny, nz, tx, ty, tz, bx, by, bz
         offset = 0
@@ -133,10 +199,7 @@ class MeshGroup:
         attribute += 1
 
         self.buffer.bind(index_partition)
-        self.buffer.blit(index_partition, self.indices)
-
-        self.vertices = None
-        self.indices = None
+        glBindVertexArray(previous_vao)
 
     def bind(self) -> None:
         """
@@ -168,134 +231,23 @@ class MeshGroup:
         """
 
         glDeleteVertexArrays(1, (self.VAO,))
-        glDeleteBuffers(1,(self.buffer.device_memory,))
+        if self.buffer is not None:
+            glDeleteBuffers(1,(self.buffer.device_memory,))
 
 class Mesh:
-    def __init__(self, filename: str):
-
-        vertices, indices = self.load(filename)
-
-        self.vertices = np.array(vertices, dtype=np.float32)
-        self.indices = np.array(indices, dtype=np.uint32)
+    def __init__(self, filename: str, cache_dir: str | None = "mesh_cache"):
+        """
+            Load a mesh from an obj file, or from its binary cache.
 
-    def load(self, filename):
+            Parameters:
 
-        #raw, unassembled data
-        v = []
-        vt = []
-        vn = []
+                filename: the obj file to load.
 
-        #final, assembled and packed result
-        vertices = []
-        indices = []
-        history = {}
-
-        #open the obj file and read the data
-        with open(filename,'r') as f:
-            line = f.readline().replace("\n", "")
-            while line:
-                words = line.split(" ")
-                flag = words[0]
-                if flag=="v":
-                    self.read_vec(v, words)
-                elif flag=="vt":
-                    self.read_vec(vt, words)
-                elif flag=="vn":
-                    self.read_vec(vn, words)
-                elif flag=="f":
-                    self.read_face(v, vt, vn, vertices, indices, words, history)
-                line = f.readline().replace("\n", "")
-        return vertices, indices
-
-    def read_vec(self, target: list[vec], words: list[str]):
-        target.append([float(x) for x in words[1:]])
-
-    def read_face(self, 
-                  v: list[list[float]], vt: list[vec], vn: list[vec], 
-                  vertices: list[float], indices: list[int], words: list[str],
-                  history: dict[str, int]):
-
-        triangles_in_face = len(words) - 3
-
-        for i in range(triangles_in_face):
-
-            v_vt_vn_a, pos_a, tex_a, normal_a = self.unpack_corner(words[1], v, vt, vn)
-            v_vt_vn_b, pos_b, tex_b, normal_b = self.unpack_corner(words[i + 2], v, vt, vn)
-            v_vt_vn_c, pos_c, tex_c, normal_c = self.unpack_corner(words[i + 3], v, vt, vn)
-
-            tangent, bitangent = self.get_btn(pos_a, tex_a, pos_b, tex_b, pos_c, tex_c)
-
-            self.consume_corner(v_vt_vn_a, history, 
-                                pos_a, tex_a, normal_a, tangent, bitangent, 
-                                vertices, indices)
-
-            self.consume_corner(v_vt_vn_b, history, 
-                                pos_b, tex_b, normal_b, tangent, bitangent, 
-                                vertices, indices)
-
-            self.consume_corner(v_vt_vn_c, history, 
-                                pos_c, tex_c, normal_c, tangent, bitangent, 
-                                vertices, indices)
-
-    def unpack_corner(self, v_vt_vn: str, 
-                      v: list[vec], vt: list[vec], 
-                      vn: list[vec]) -> tuple[str, vec, vec, vec]:
-
-        components = [int(i) - 1 for i in v_vt_vn.split("/")]
-
-        return v_vt_vn, v[components[0]], vt[components[1]], vn[components[2]]
-
-    def get_btn(self, 
-                pos_a: vec, tex_a: vec, 
-                pos_b: vec, tex_b: vec, 
-                pos_c: vec, tex_c: vec) -> tuple[vec]:
-
-        #direction vectors
-        deltaPos1 = [pos_b[i] - pos_a[i] for i in range(3)]
-        deltaPos2 = [pos_c[i] - pos_a[i] for i in range(3)]
-        deltaUV1 = [tex_b[i] - tex_a[i] for i in range(2)]
-        deltaUV2 = [tex_c[i] - tex_a[i] for i in range(2)]
-        # calculate
-        den = 1 / (deltaUV1[0] * deltaUV2[1] - deltaUV2[0] * deltaUV1[1])
-        tangent = []
-        #tangent x
-        tangent.append(den * (deltaUV2[1] * deltaPos1[0] - deltaUV1[1] * deltaPos2[0]))
-        #tangent y
-        tangent.append(den * (deltaUV2[1] * deltaPos1[1] - deltaUV1[1] * deltaPos2[1]))
-        #tangent z
-        tangent.append(den * (deltaUV2[1] * deltaPos1[2] - deltaUV1[1] * deltaPos2[2]))
-        bitangent = []
-        #bitangent x
-        bitangent.append(den * (-deltaUV2[0] * deltaPos1[0] + deltaUV1[0] * deltaPos2[0]))
-        #bitangent y
-        bitangent.append(den * (-deltaUV2[0] * deltaPos1[1] + deltaUV1[0] * deltaPos2[1]))
-        #bitangent z
-        bitangent.append(den * (-deltaUV2[0] * deltaPos1[2] + deltaUV1[0] * deltaPos2[2]))
-
-        return tangent, bitangent
-
-    def consume_corner(self, v_vt_vn: str, history: dict[str, int], 
-                       pos: vec, tex_coord: vec, normal: vec, 
-                       tangent: vec, bitangent: vec,
-                       vertices: list[float], indices: list[int]):
-
-        if v_vt_vn in history:
-            indices.append(history[v_vt_vn])
-            return
+                cache_dir: folder for binary copies of loaded models,
+                    None to always parse the obj.
+        """
 
-        history[v_vt_vn] = len(vertices) // 14
-        indices.append(history[v_vt_vn])
-
-        for x in pos:
-            vertices.append(x)
-        for x in tex_coord:
-            vertices.append(x)
-        for x in normal:
-            vertices.append(x)
-        for x in tangent:
-            vertices.append(x)
-        for x in bitangent:
-            vertices.append(x)
+        self.vertices, self.indices = obj_loader.load(filename, cache_dir)
 
 class BillBoard:
     def __init__(self, w: float, h: float):
@@ -1,15 +1,152 @@
 from config import *
 from constants import *
 
+#---- Transforms ----#
+#region
+@njit()
+def update_transforms(positions: np.ndarray, eulers: np.ndarray,
+                      scales: np.ndarray, matrices: np.ndarray,
+                      dirty: np.ndarray, count: int) -> None:
+    """
+        Rebuild the model matrix of every dirty transform:
+        scale, then rotate about x, y and z, then translate.
+    """
+
+    for i in range(count):
+
+        if not dirty[i]:
+            continue
+        dirty[i] = 0
+
+        cx = np.cos(eulers[i][0])
+        sx = np.sin(eulers[i][0])
+        cy = np.cos(eulers[i][1])
+        sy = np.sin(eulers[i][1])
+        cz = np.cos(eulers[i][2])
+        sz = np.sin(eulers[i][2])
+
+        # Rotation rows, x * y * z
+        matrices[i][0][0] = scales[i][0] * cy * cz
+        matrices[i][0][1] = scales[i][0] * -cy * sz
+        matrices[i][0][2] = scales[i][0] * sy
+        matrices[i][0][3] = 0.0
+
+        matrices[i][1][0] = scales[i][1] * (sx * sy * cz + cx * sz)
+        matrices[i][1][1] = scales[i][1] * (cx * cz - sx * sy * sz)
+        matrices[i][1][2] = scales[i][1] * -sx * cy
+        matrices[i][1][3] = 0.0
+
+        matrices[i][2][0] = scales[i][2] * (sx * sz - cx * sy * cz)
+        matrices[i][2][1] = scales[i][2] * (cx * sy * sz + sx * cz)
+        matrices[i][2][2] = scales[i][2] * cx * cy
+        matrices[i][2][3] = 0.0
+
+        # Translation
+        matrices[i][3][0] = positions[i][0]
+        matrices[i][3][1] = positions[i][1]
+        matrices[i][3][2] = positions[i][2]
+        matrices[i][3][3] = 1.0
+
+@njit()
+def face_towards(positions: np.ndarray, eulers: np.ndarray,
+                 dirty: np.ndarray, indices: np.ndarray,
+                 target: np.ndarray) -> None:
+    """
+        Turn the given transforms to face the target position.
+    """
+
+    for i in indices:
+
+        dx = positions[i][0] - target[0]
+        dy = positions[i][1] - target[1]
+        dz = positions[i][2] - target[2]
+
+        eulers[i][2] = np.arctan2(-dy, dx)
+        eulers[i][1] = np.arctan2(dz, np.sqrt(dx * dx + dy * dy))
+        dirty[i] = 1
+
+class TransformStore:
+    """
+        Positions, rotations, scales and model matrices of many
+        transforms, as contiguous arrays. Matrices are only rebuilt
+        for transforms marked dirty, all at once on update.
+    """
+
+    def __init__(self, capacity: int = 64):
+        """
+            Create an empty store.
+
+            Parameters:
+
+                capacity: number of transforms to make room for,
+                    the store doubles when it fills up.
+        """
+
+        self.count = 0
+        self.positions = np.zeros((capacity, 3), dtype=np.float32)
+        self.eulers = np.zeros((capacity, 3), dtype=np.float32)
+        self.scales = np.ones((capacity, 3), dtype=np.float32)
+        #(count, 4, 4), ready to be sent as instance data
+        self.matrices = np.zeros((capacity, 4, 4), dtype=np.float32)
+        self.dirty = np.zeros(capacity, dtype=np.uint8)
+
+    def add(self, position: vec, eulers: vec, scale: vec = [1,1,1]) -> int:
+        """
+            Add a transform.
+
+            Returns:
+
+                The index of the new transform.
+        """
+
+        if self.count == len(self.positions):
+            self.reserve(2 * self.count)
+
+        index = self.count
+        self.count += 1
+        self.positions[index] = position
+        self.eulers[index] = eulers
+        self.scales[index] = scale
+        self.dirty[index] = 1
+
+        return index
+
+    def reserve(self, capacity: int) -> None:
+        """
+            Make room for at least the given number of transforms.
+        """
+
+        if capacity <= len(self.positions):
+            return
+
+        for name in ("positions", "eulers", "scales", "matrices", "dirty"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        self.scales[self.count:] = 1
+
+    def update(self) -> None:
+        """
+            Rebuild the matrices of all dirty transforms.
+        """
+
+        update_transforms(self.positions, self.eulers, self.scales,
+                          self.matrices, self.dirty, self.count)
+#endregion
 #---- Base Components ----#
 #region
 class TransformComponent:
     """
         Info needed to describe a transformation.
+        The data lives in a TransformStore and is found by index.
+        The store's arrays are replaced when it grows, so reading an
+        attribute gives a copy, change it by assigning it back.
     """
 
 
-    def __init__(self, position: vec = [0,0,0], eulers: vec = [0,0,0]):
+    def __init__(self, position: vec = [0,0,0], eulers: vec = [0,0,0],
+                 scale: vec = [1,1,1], store: TransformStore | None = None):
         """
             Create a new TransformComponent.
 
@@ -18,35 +155,55 @@ class TransformComponent:
                 position: the initial position.
 
                 eulers: the initial rotation.
+
+                scale: the initial scale.
+
+                store: where to keep the transform, by default
+                    it gets a store of its own.
         """
 
-        self.position = np.array(position, dtype=np.float32)
-        self.eulers = np.array(eulers, dtype=np.float32)
-        self.matrix = pyrr.matrix44.create_identity(dtype=np.float32)
+        self.store = TransformStore(1) if store is None else store
+        self.index = self.store.add(position, eulers, scale)
+
+    @property
+    def position(self) -> np.ndarray:
+        return self.store.positions[self.index].copy()
+
+    @position.setter
+    def position(self, position: vec) -> None:
+        self.store.positions[self.index] = position
+        self.update()
+
+    @property
+    def eulers(self) -> np.ndarray:
+        return self.store.eulers[self.index].copy()
+
+    @eulers.setter
+    def eulers(self, eulers: vec) -> None:
+        self.store.eulers[self.index] = eulers
+        self.update()
+
+    @property
+    def scale(self) -> np.ndarray:
+        return self.store.scales[self.index].copy()
+
+    @scale.setter
+    def scale(self, scale: vec) -> None:
+        self.store.scales[self.index] = scale
+        self.update()
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self.store.matrices[self.index].copy()
     
     def update(self) -> None:
         """
-            Construct a new transform matrix which corresponds to the
-            component's rotation and translation.
+            Flag the transform matrix for rebuilding, to match the
+            component's scale, rotation and translation. It's rebuilt
+            on the store's next update.
         """
 
-        self.matrix = pyrr.matrix44.create_identity(dtype=np.float32)
-        self.matrix = pyrr.matrix44.multiply(
-            self.matrix,
-            pyrr.matrix44.create_from_x_rotation(theta=self.eulers[0], dtype=np.float32)
-        )
-        self.matrix = pyrr.matrix44.multiply(
-            self.matrix,
-            pyrr.matrix44.create_from_y_rotation(theta=self.eulers[1], dtype=np.float32)
-        )
-        self.matrix = pyrr.matrix44.multiply(
-           self.matrix,
-            pyrr.matrix44.create_from_z_rotation(theta=self.eulers[2], dtype=np.float32)
-        )
-        self.matrix = pyrr.matrix44.multiply(
-            self.matrix,
-            pyrr.matrix44.create_from_translation(self.position,dtype=np.float32)
-        )
+        self.store.dirty[self.index] = 1
 
 class RenderComponent:
     """
@@ -131,12 +288,13 @@ class StaticModel:
         A basic model. Doesn't move or anything.
     """
 
-    def __init__(self, position: vec, mesh_type: int, material_type: int):
+    def __init__(self, position: vec, mesh_type: int, material_type: int,
+                 store: TransformStore | None = None):
         """
             Create a new StaticModel.
         """
 
-        self.transform = TransformComponent(position)
+        self.transform = TransformComponent(position, store = store)
         self.render = RenderComponent(mesh_type, material_type)
         self.transform.update()
 
@@ -146,12 +304,13 @@ class BillBoard:
     """
 
     def __init__(self, position: vec, 
-                 mesh_type: int, material_type: int):
+                 mesh_type: int, material_type: int,
+                 store: TransformStore | None = None):
         """
             Create a new Billboard.
         """
 
-        self.transform = TransformComponent(position)
+        self.transform = TransformComponent(position, store = store)
         self.render = RenderComponent(mesh_type, material_type)
     
     def update(self, target: np.ndarray) -> None:
@@ -159,13 +318,9 @@ class BillBoard:
             Turn to face the given target position.
         """
         
-        direction_from_player = self.transform.position - target
-        self.transform.eulers[2] = np.arctan2(-direction_from_player[1],
-                                              direction_from_player[0])
-        dist_2d = math.sqrt(direction_from_player[0] ** 2 + direction_from_player[1] ** 2)
-        self.transform.eulers[1] = np.arctan2(direction_from_player[2], 
-                                              dist_2d)
-        self.transform.update()
+        store = self.transform.store
+        face_towards(store.positions, store.eulers, store.dirty,
+                     np.array([self.transform.index]), target)
 
 class Light:
     """
@@ -175,12 +330,13 @@ class Light:
 
     def __init__(self, position: vec, 
                  color: vec, strength: float, 
-                 mesh_type: int, material_type: int):
+                 mesh_type: int, material_type: int,
+                 store: TransformStore | None = None):
         """
             Create a new light.
         """
 
-        self.transform = TransformComponent(position)
+        self.transform = TransformComponent(position, store = store)
         self.light = LightComponent(color, strength)
         self.render = RenderComponent(mesh_type, material_type)
     
@@ -189,49 +345,40 @@ class Light:
             Turn to face the given target position.
         """
         
-        direction_from_player = self.transform.position - target
-        self.transform.eulers[2] = np.arctan2(-direction_from_player[1],
-                                              direction_from_player[0])
-        dist_2d = math.sqrt(direction_from_player[0] ** 2 + direction_from_player[1] ** 2)
-        self.transform.eulers[1] = np.arctan2(direction_from_player[2], 
-                                              dist_2d)
-        self.transform.update()
+        store = self.transform.store
+        face_towards(store.positions, store.eulers, store.dirty,
+                     np.array([self.transform.index]), target)
 
 class Player:
 
 
-    def __init__(self, position: vec):
+    def __init__(self, position: vec, store: TransformStore | None = None):
         """
             Create a new Player
         """
 
-        self.transform = TransformComponent(position)
+        self.transform = TransformComponent(position, store = store)
         self.camera = CameraComponent()
     
     def update(self):
 
         self.camera.update(self.transform.position, self.transform.eulers)
 
-@njit()
-def update_particles(particles: np.ndarray, rate: float) -> None:
+@njit(parallel = True)
+def update_particles(positions: np.ndarray, velocities: np.ndarray,
+                     lifetimes: np.ndarray, count: int, rate: float) -> None:
     """
-        Update a set of particles.
+        Update the first count particles, wrapping them around the box.
+        Particles whose lifetime runs out are left for compaction.
     """
 
-    for i in range(len(particles)):
+    for i in prange(count):
         # Fetch
-        x  = particles[i]['x']
-        y  = particles[i]['y']
-        z  = particles[i]['z']
-        vx = particles[i]['vx']
-        vy = particles[i]['vy']
-        vz = particles[i]['vz']
+        x  = positions[i][0] + rate * velocities[i][0]
+        y  = positions[i][1] + rate * velocities[i][1]
+        z  = positions[i][2] + rate * velocities[i][2]
 
         # Modify
-        x += rate * vx
-        y += rate * vy
-        z += rate * vz
-
         if x < -10.0:
             x += 20.0
         elif x > 10.0:
@@ -248,46 +395,151 @@ def update_particles(particles: np.ndarray, rate: float) -> None:
             z -= 20.0
 
         # Store
-        particles[i]['x']  = x
-        particles[i]['y']  = y
-        particles[i]['z']  = z
-        particles[i]['vx'] = vx
-        particles[i]['vy'] = vy
-        particles[i]['vz'] = vz
-
-class ParticleSystem:
+        positions[i][0] = x
+        positions[i][1] = y
+        positions[i][2] = z
+        lifetimes[i] -= rate
+
+@njit()
+def compact_particles(positions: np.ndarray, velocities: np.ndarray,
+                      lifetimes: np.ndarray, count: int) -> int:
+    """
+        Fill each dead particle's slot with the last live one,
+        so live particles stay packed at the front.
+
+        Returns:
+
+            The number of live particles.
+    """
+
+    i = 0
+    while i < count:
+        if lifetimes[i] > 0.0:
+            i += 1
+            continue
+        count -= 1
+        positions[i] = positions[count]
+        velocities[i] = velocities[count]
+        lifetimes[i] = lifetimes[count]
+
+    return count
+
+class ParticlePool:
+    """
+        Particle state as separate arrays, live particles first.
+        Everything past the live count is free, ready for spawning.
+        Needs no GL context.
+    """
+
+    def __init__(self, capacity: int = 1_024):
+        """
+            Create an empty pool.
+
+            Parameters:
+
+                capacity: number of particles to make room for,
+                    the pool doubles when it fills up.
+        """
+
+        self.particle_count = 0
+        self.positions = np.zeros((capacity, 3), dtype=np.float32)
+        self.velocities = np.zeros((capacity, 3), dtype=np.float32)
+        self.lifetimes = np.zeros(capacity, dtype=np.float32)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.lifetimes)
+
+    def reserve(self, capacity: int) -> None:
+        """
+            Make room for at least the given number of particles.
+        """
+
+        if capacity <= self.capacity:
+            return
+
+        for name in ("positions", "velocities", "lifetimes"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.particle_count] = old[:self.particle_count]
+            setattr(self, name, new)
+
+    def spawn(self, count: int, positions: np.ndarray | None = None,
+              velocities: np.ndarray | None = None,
+              lifetime: float = np.inf) -> None:
+        """
+            Add particles.
+
+            Parameters:
+
+                count: how many to add.
+
+                positions, velocities: (count, 3) starting values,
+                    random within the box if not given.
+
+                lifetime: how long (in update rate units) they live.
+        """
+
+        first = self.particle_count
+        if first + count > self.capacity:
+            self.reserve(max(first + count, 2 * self.capacity))
+
+        if positions is None:
+            positions = np.random.uniform(
+                (-10.0, -10.0, 0.0), (10.0, 10.0, 20.0), (count, 3))
+        if velocities is None:
+            velocities = np.random.uniform(-1.0, 1.0, (count, 3))
+
+        self.positions[first:first + count] = positions
+        self.velocities[first:first + count] = velocities
+        self.lifetimes[first:first + count] = lifetime
+        self.particle_count += count
+
+    def kill(self, indices: np.ndarray) -> None:
+        """
+            Remove the particles at the given indices, on the next update.
+        """
+
+        self.lifetimes[indices] = 0.0
+
+    def update(self, rate: float) -> None:
+        """
+            Move every live particle, then compact away the dead.
+        """
+
+        update_particles(self.positions, self.velocities,
+                         self.lifetimes, self.particle_count, rate)
+        self.particle_count = compact_particles(
+            self.positions, self.velocities, self.lifetimes, self.particle_count)
+
+class ParticleSystem(ParticlePool):
     """
         Manages a group of particles.
     """
 
-    def __init__(self):
+    def __init__(self, particle_count: int = 1_000):
         """
             Create a particle system.
-        """
 
-        self.particle_count = 1_000
+            Parameters:
 
-        self.particles = np.zeros(self.particle_count, dtype=DATA_TYPE_PARTICLE)
+                particle_count: how many particles to start with.
+        """
 
-        for i in range(self.particle_count):
-            self.particles[i]['x'] = np.random.uniform(-10.0, 10.0)
-            self.particles[i]['y'] = np.random.uniform(-10.0, 10.0)
-            self.particles[i]['z'] = np.random.uniform(0.0, 20.0)
-            self.particles[i]['vx'] = np.random.uniform(-1.0, 1.0)
-            self.particles[i]['vy'] = np.random.uniform(-1.0, 1.0)
-            self.particles[i]['vz'] = np.random.uniform(-1.0, 1.0)
+        super().__init__(particle_count)
+        self.spawn(particle_count)
 
         self.VAO = glGenVertexArrays(1)
         glBindVertexArray(self.VAO)
         self.VBO = glGenBuffers(1)
         glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
-        glBufferData(GL_ARRAY_BUFFER, self.particles.nbytes, self.particles, GL_DYNAMIC_DRAW)
+        glBufferData(GL_ARRAY_BUFFER, self.positions.nbytes, None, GL_STREAM_DRAW)
 
         offset = 0;
         attribute = 0
 
         glEnableVertexAttribArray(attribute)
-        glVertexAttribPointer(attribute, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(offset))
+        glVertexAttribPointer(attribute, 3, GL_FLOAT, GL_FALSE, 12, ctypes.c_void_p(offset))
         attribute += 1
         offset += 12
 
@@ -296,13 +548,15 @@ class ParticleSystem:
             Update all the particles.
         """
 
-        update_particles(self.particles, rate)
+        super().update(rate)
 
-        # Upload
+        # Upload the live particles. Orphaning the old storage
+        # means the driver never waits for last frame's draw
         glBindVertexArray(self.VAO)
         glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
-        glBufferSubData(GL_ARRAY_BUFFER, 0, self.particles.nbytes, self.particles)
-
+        glBufferData(GL_ARRAY_BUFFER, self.positions.nbytes, None, GL_STREAM_DRAW)
+        glBufferSubData(GL_ARRAY_BUFFER, 0, self.particle_count * 12,
+                        self.positions[:self.particle_count])
 
 class Scene:
 
@@ -312,147 +566,177 @@ class Scene:
         self.lit_objects = []
         self.unlit_objects = []
         self.particles = ParticleSystem()
+        #every object's transform
+        self.transforms = TransformStore()
  
         self.cubes = [
             StaticModel(
                 position = [-5,-6,1],
                 mesh_type = CUBE_MESH,
-                material_type = WOOD_MATERIAL
+                material_type = WOOD_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-5,-4,1],
                 mesh_type = CUBE_MESH,
-                material_type = CLAYBRICK_MATERIAL
+                material_type = CLAYBRICK_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-5,-2,1],
                 mesh_type = CUBE_MESH,
-                material_type = HOTEL_WALL_MATERIAL
+                material_type = HOTEL_WALL_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-5,0,1],
                 mesh_type = CUBE_MESH,
-                material_type = GLASS_WALL_MATERIAL
+                material_type = GLASS_WALL_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-5,0,1],
                 mesh_type = CUBE_MESH,
-                material_type = PLASTER_MATERIAL
+                material_type = PLASTER_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-5,0,1],
                 mesh_type = CUBE_MESH,
-                material_type = MARBLE_BRASS_MATERIAL
+                material_type = MARBLE_BRASS_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-5,0,1],
                 mesh_type = CUBE_MESH,
-                material_type = MARBLE_COLD_MATERIAL
+                material_type = MARBLE_COLD_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-3,-6,3],
                 mesh_type = CUBE_MESH,
-                material_type = WOOD_MATERIAL
+                material_type = WOOD_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-3,-4,3],
                 mesh_type = CUBE_MESH,
-                material_type = CLAYBRICK_MATERIAL
+                material_type = CLAYBRICK_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-3,-2,3],
                 mesh_type = CUBE_MESH,
-                material_type = HOTEL_WALL_MATERIAL
+                material_type = HOTEL_WALL_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-3,0,3],
                 mesh_type = CUBE_MESH,
-                material_type = GLASS_WALL_MATERIAL
+                material_type = GLASS_WALL_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-3,0,3],
                 mesh_type = CUBE_MESH,
-                material_type = PLASTER_MATERIAL
+                material_type = PLASTER_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-3,0,3],
                 mesh_type = CUBE_MESH,
-                material_type = MARBLE_BRASS_MATERIAL
+                material_type = MARBLE_BRASS_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-3,0,3],
                 mesh_type = CUBE_MESH,
-                material_type = MARBLE_COLD_MATERIAL
+                material_type = MARBLE_COLD_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-1,-6,5],
                 mesh_type = CUBE_MESH,
-                material_type = WOOD_MATERIAL
+                material_type = WOOD_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-1,-4,5],
                 mesh_type = CUBE_MESH,
-                material_type = CLAYBRICK_MATERIAL
+                material_type = CLAYBRICK_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-1,-2,5],
                 mesh_type = CUBE_MESH,
-                material_type = HOTEL_WALL_MATERIAL
+                material_type = HOTEL_WALL_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-1,0,5],
                 mesh_type = CUBE_MESH,
-                material_type = GLASS_WALL_MATERIAL
+                material_type = GLASS_WALL_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-1,0,5],
                 mesh_type = CUBE_MESH,
-                material_type = PLASTER_MATERIAL
+                material_type = PLASTER_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-1,0,5],
                 mesh_type = CUBE_MESH,
-                material_type = MARBLE_BRASS_MATERIAL
+                material_type = MARBLE_BRASS_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [-1,0,5],
                 mesh_type = CUBE_MESH,
-                material_type = MARBLE_COLD_MATERIAL
+                material_type = MARBLE_COLD_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [1,-6,7],
                 mesh_type = CUBE_MESH,
-                material_type = WOOD_MATERIAL
+                material_type = WOOD_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [1,-4,7],
                 mesh_type = CUBE_MESH,
-                material_type = CLAYBRICK_MATERIAL
+                material_type = CLAYBRICK_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [1,-2,7],
                 mesh_type = CUBE_MESH,
-                material_type = HOTEL_WALL_MATERIAL
+                material_type = HOTEL_WALL_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [1,0,7],
                 mesh_type = CUBE_MESH,
-                material_type = GLASS_WALL_MATERIAL
+                material_type = GLASS_WALL_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [1,0,7],
                 mesh_type = CUBE_MESH,
-                material_type = PLASTER_MATERIAL
+                material_type = PLASTER_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [1,0,7],
                 mesh_type = CUBE_MESH,
-                material_type = MARBLE_BRASS_MATERIAL
+                material_type = MARBLE_BRASS_MATERIAL,
+                store = self.transforms
             ),
             StaticModel(
                 position = [1,0,7],
                 mesh_type = CUBE_MESH,
-                material_type = MARBLE_COLD_MATERIAL
+                material_type = MARBLE_COLD_MATERIAL,
+                store = self.transforms
             )
         ]
 
@@ -460,7 +744,8 @@ class Scene:
             BillBoard(
                 position = [3,0,0.5],
                 mesh_type = MEDKIT_MESH,
-                material_type = MEDKIT_MATERIAL
+                material_type = MEDKIT_MATERIAL,
+                store = self.transforms
             )
         ]
 
@@ -475,7 +760,8 @@ class Scene:
             StaticModel(
                 position = [0,0,0],
                 mesh_type = CONTAINER_MESH,
-                material_type = CLAYBRICK_MATERIAL
+                material_type = CLAYBRICK_MATERIAL,
+                store = self.transforms
             ),
         ]
 
@@ -493,12 +779,18 @@ class Scene:
                 ],
                 strength = 3,
                 mesh_type = LIGHT_MESH,
-                material_type = LIGHT_MATERIAL
+                material_type = LIGHT_MATERIAL,
+                store = self.transforms
             )
             for i in range(8)
         ]
 
-        self.player = Player(position = [0,0,2])
+        self.player = Player(position = [0,0,2], store = self.transforms)
+
+        #everything which turns to face the player
+        self.billboard_ids = np.array(
+            [obj.transform.index for obj in self.medkits + self.lights],
+            dtype=np.int64)
 
         for obj in self.cubes:
             self.lit_objects.append(obj)
@@ -516,11 +808,9 @@ class Scene:
 
         player_position = self.player.transform.position
         
-        for medkit in self.medkits:
-            medkit.update(player_position)
-
-        for light in self.lights:
-            light.update(player_position)
+        face_towards(self.transforms.positions, self.transforms.eulers,
+                     self.transforms.dirty, self.billboard_ids, player_position)
+        self.transforms.update()
         
         self.player.update()
 
@@ -533,7 +823,8 @@ class Scene:
     
     def spin_player(self, dTheta, dPhi):
 
-        eulers = self.player.transform.eulers
+        transform = self.player.transform
+        eulers = transform.eulers
         eulers[2] += 0.4 * np.radians(dTheta)
         if eulers[2] > 2 * np.pi:
             eulers[2] -= 2 * np.pi
@@ -543,3 +834,4 @@ class Scene:
         eulers[1] = min(
             np.radians(89), 
             max(np.radians(-89), eulers[1] + 0.4 * np.radians(dPhi)))
+        transform.eulers = eulers
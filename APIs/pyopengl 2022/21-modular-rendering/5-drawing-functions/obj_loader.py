@@ -0,0 +1,287 @@
+from config import *
+import hashlib
+import json
+import os
+import re
+
+#---- Binary Cache ----#
+#region
+#bump whenever the vertex layout or loader output changes
+CACHE_VERSION = 1
+
+MESH_CACHE_HEADER = np.dtype([
+    ('magic', 'S4'), ('version', '<u4'),
+    ('vertex_count', '<u4'), ('index_count', '<u4')])
+
+def cache_path(filename: str, cache_dir: str) -> str:
+    """
+        Where the binary copy of a model lives. The name carries a hash
+        of the source's path, size and modification time, so editing
+        the model makes a fresh entry.
+
+        Parameters:
+
+            filename: the source obj file.
+
+            cache_dir: folder holding the cache.
+
+        Returns:
+
+            Path of the cache file.
+    """
+
+    info = os.stat(filename)
+    digest = hashlib.blake2b(digest_size = 16)
+    digest.update(json.dumps(
+        [CACHE_VERSION, os.path.abspath(filename),
+         info.st_size, info.st_mtime_ns]).encode())
+    name = os.path.splitext(os.path.basename(filename))[0]
+
+    return os.path.join(cache_dir, f"{name}_{digest.hexdigest()}.mesh")
+
+def read_cache(path: str) -> tuple[np.ndarray] | None:
+    """
+        Map a cached mesh straight from disk.
+
+        Parameters:
+
+            path: the cache file.
+
+        Returns:
+
+            (vertices, indices), read only, or None if there is no
+            valid entry.
+    """
+
+    try:
+        header = np.fromfile(path, dtype = MESH_CACHE_HEADER, count = 1)
+    except OSError:
+        return None
+    if len(header) == 0 or header['magic'][0] != b"MESH" \
+        or header['version'][0] != CACHE_VERSION:
+        return None
+
+    vertex_count = int(header['vertex_count'][0])
+    index_count = int(header['index_count'][0])
+    offset = MESH_CACHE_HEADER.itemsize
+    vertex_bytes = vertex_count * 14 * 4
+    if os.path.getsize(path) != offset + vertex_bytes + index_count * 4:
+        return None
+
+    vertices = np.memmap(path, dtype = np.float32, mode = 'r',
+                         offset = offset, shape = (vertex_count * 14,))
+    indices = np.memmap(path, dtype = np.uint32, mode = 'r',
+                        offset = offset + vertex_bytes, shape = (index_count,))
+
+    return vertices, indices
+
+def write_cache(path: str, vertices: np.ndarray, indices: np.ndarray) -> None:
+    """
+        Store a loaded mesh. It's written to a scratch file and then
+        renamed, so an interrupted write never leaves a bad entry.
+
+        Parameters:
+
+            path: the cache file.
+
+            vertices, indices: the mesh data, as the loader returns it.
+    """
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok = True)
+    header = np.zeros(1, dtype = MESH_CACHE_HEADER)
+    header['magic'] = b"MESH"
+    header['version'] = CACHE_VERSION
+    header['vertex_count'] = len(vertices) // 14
+    header['index_count'] = len(indices)
+
+    scratch = f"{path}.{os.getpid()}.tmp"
+    with open(scratch, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(np.ascontiguousarray(vertices, dtype = np.float32).tobytes())
+        f.write(np.ascontiguousarray(indices, dtype = np.uint32).tobytes())
+    os.replace(scratch, path)
+#endregion
+
+#---- OBJ Parsing ----#
+#region
+def read_attribute(text: str, flag: str, width: int) -> np.ndarray:
+    """
+        Read every line of one attribute type at once.
+
+        Parameters:
+
+            text: contents of the obj file.
+
+            flag: the line type, "v", "vt" or "vn".
+
+            width: number of components to keep.
+
+        Returns:
+
+            (count, width) array of the attribute.
+    """
+
+    lines = re.findall(rf"^{flag}[ \t]+(.*)$", text, re.M)
+    if not lines:
+        return np.zeros((0, width), dtype=np.float64)
+
+    values = np.fromstring(" ".join(lines), dtype=np.float64, sep=" ")
+
+    return values.reshape(len(lines), -1)[:, :width]
+
+def resolve_indices(raw: np.ndarray, count: int) -> np.ndarray:
+    """
+        Turn obj indices (counting from 1, or back from the end
+        if negative) into array indices.
+    """
+
+    return np.where(raw < 0, raw + count, raw - 1)
+
+def triangulate(corner_counts: np.ndarray) -> np.ndarray:
+    """
+        Fan out each polygon from its first corner.
+
+        Parameters:
+
+            corner_counts: number of corners in each face.
+
+        Returns:
+
+            (triangle count, 3) array of indices into the face corners,
+            in the order the faces list them.
+    """
+
+    face_starts = np.cumsum(corner_counts) - corner_counts
+    triangle_counts = corner_counts - 2
+    face = np.repeat(np.arange(len(corner_counts)), triangle_counts)
+    first_triangle = np.cumsum(triangle_counts) - triangle_counts
+    local = np.arange(len(face)) - first_triangle[face]
+    start = face_starts[face]
+
+    return np.stack((start, start + local + 1, start + local + 2), axis = 1)
+
+def get_btn(positions: np.ndarray, tex_coords: np.ndarray) -> tuple[np.ndarray]:
+    """
+        Tangent and bitangent of every triangle at once.
+
+        Parameters:
+
+            positions: (triangle count, 3, 3) corner positions.
+
+            tex_coords: (triangle count, 3, 2) corner texture coordinates.
+
+        Returns:
+
+            (tangents, bitangents), each (triangle count, 3). Triangles with
+            degenerate texture coordinates get zero vectors.
+    """
+
+    deltaPos1 = positions[:, 1] - positions[:, 0]
+    deltaPos2 = positions[:, 2] - positions[:, 0]
+    deltaUV1 = tex_coords[:, 1] - tex_coords[:, 0]
+    deltaUV2 = tex_coords[:, 2] - tex_coords[:, 0]
+
+    determinant = deltaUV1[:, 0] * deltaUV2[:, 1] - deltaUV2[:, 0] * deltaUV1[:, 1]
+    den = np.zeros_like(determinant)
+    np.divide(1.0, determinant, out = den, where = determinant != 0)
+    den = den[:, None]
+
+    tangent = den * (deltaUV2[:, 1, None] * deltaPos1 - deltaUV1[:, 1, None] * deltaPos2)
+    bitangent = den * (-deltaUV2[:, 0, None] * deltaPos1 + deltaUV1[:, 0, None] * deltaPos2)
+
+    return tangent, bitangent
+
+def parse(text: str) -> tuple[np.ndarray]:
+    """
+        Assemble an obj file's faces into an indexed mesh.
+        Each distinct v/vt/vn corner becomes one vertex, numbered in the
+        order it first appears and taking its tangent frame from the first
+        triangle using it.
+
+        Parameters:
+
+            text: contents of the obj file, faces must be v/vt/vn.
+
+        Returns:
+
+            (vertices, indices): vertices flattened as
+            x, y, z, s, t, nx, ny, nz, tx, ty, tz, bx, by, bz (float32),
+            indices as uint32.
+    """
+
+    v = read_attribute(text, "v", 3)
+    vt = read_attribute(text, "vt", 2)
+    vn = read_attribute(text, "vn", 3)
+
+    faces = re.findall(r"^f[ \t]+(.*)$", text, re.M)
+    if not faces:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.uint32)
+
+    #each corner is v/vt/vn, two slashes apiece
+    corner_counts = np.char.count(np.array(faces), "/") // 2
+    corners = np.fromstring(
+        " ".join(faces).replace("/", " "), dtype=np.int64, sep=" ").reshape(-1, 3)
+    corners[:, 0] = resolve_indices(corners[:, 0], len(v))
+    corners[:, 1] = resolve_indices(corners[:, 1], len(vt))
+    corners[:, 2] = resolve_indices(corners[:, 2], len(vn))
+
+    #the three corners of every triangle, in drawing order
+    triangle_corners = corners[triangulate(corner_counts).ravel()]
+
+    tangent, bitangent = get_btn(
+        v[triangle_corners[:, 0]].reshape(-1, 3, 3),
+        vt[triangle_corners[:, 1]].reshape(-1, 3, 2))
+
+    #distinct corners, renumbered by first appearance.
+    #Packing each triple into one integer keeps the unique one dimensional
+    key = (triangle_corners[:, 0] * len(vt) + triangle_corners[:, 1]) \
+        * len(vn) + triangle_corners[:, 2]
+    _, first, inverse = np.unique(key, return_index = True, return_inverse = True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    first = first[order]
+    unique_corners = triangle_corners[first]
+
+    vertices = np.empty((len(first), 14), dtype=np.float32)
+    vertices[:, 0:3] = v[unique_corners[:, 0]]
+    vertices[:, 3:5] = vt[unique_corners[:, 1]]
+    vertices[:, 5:8] = vn[unique_corners[:, 2]]
+    vertices[:, 8:11] = tangent[first // 3]
+    vertices[:, 11:14] = bitangent[first // 3]
+    indices = rank[inverse.ravel()].astype(np.uint32)
+
+    return vertices.ravel(), indices
+
+def load(filename: str, cache_dir: str | None = "mesh_cache") -> tuple[np.ndarray]:
+    """
+        Load an obj file, from its binary cache if there is one.
+
+        Parameters:
+
+            filename: the obj file.
+
+            cache_dir: folder for binary copies of loaded models,
+                None to always parse.
+
+        Returns:
+
+            (vertices, indices), as parse returns them. Cached meshes
+            are memory mapped and read only.
+    """
+
+    path = None
+    if cache_dir is not None:
+        path = cache_path(filename, cache_dir)
+        cached = read_cache(path)
+        if cached is not None:
+            return cached
+
+    with open(filename, 'r') as f:
+        vertices, indices = parse(f.read())
+
+    if path is not None:
+        write_cache(path, vertices, indices)
+
+    return vertices, indices
+#endregion
@@ -0,0 +1,55 @@
+"""
+    Headless particle benchmark: how many particles are updated
+    per millisecond, at a range of pool sizes. Each frame a
+    hundredth of the particles die and are replaced, so the
+    compaction and spawning costs are counted too.
+
+    Run from this folder: python particle_benchmark.py
+"""
+from config import *
+from model import ParticlePool
+import numba
+import time
+
+def benchmark(particle_count: int, frames: int = 50) -> float:
+    """
+        Time a pool of the given size.
+
+        Parameters:
+
+            particle_count: number of live particles.
+
+            frames: number of updates to average over.
+
+        Returns:
+
+            Particles updated per millisecond.
+    """
+
+    pool = ParticlePool(particle_count)
+    pool.spawn(particle_count)
+    turnover = max(1, particle_count // 100)
+
+    #compile and warm up
+    pool.update(0.1)
+
+    total = 0.0
+    for _ in range(frames):
+        pool.kill(np.random.randint(0, pool.particle_count, turnover))
+        start = time.perf_counter()
+        pool.update(0.1)
+        pool.spawn(particle_count - pool.particle_count)
+        total += time.perf_counter() - start
+
+    return particle_count * frames / (1000 * total)
+
+def main() -> None:
+
+    print(f"numba threads: {numba.get_num_threads()}")
+    print(f"{'particles':>10} {'per ms':>12}")
+    for particle_count in (10_000, 100_000, 1_000_000):
+        rate = benchmark(particle_count)
+        print(f"{particle_count:>10} {rate:>12,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -85,7 +85,6 @@ UNIFORM_NAMES = {
         UNIFORM_TYPE_SPECULAR: "material.specular",
         UNIFORM_TYPE_NORMAL: "material.normal",
         UNIFORM_TYPE_MATERIAL_COUNT: "material_count",
-        UNIFORM_TYPE_MODEL: "model",
         UNIFORM_TYPE_VIEW: "view",
         UNIFORM_TYPE_LIGHT0_POS: "lightPos[0]",
         UNIFORM_TYPE_LIGHT0_COLOR: "lights[0].color",
@@ -112,17 +111,13 @@ UNIFORM_NAMES = {
         UNIFORM_TYPE_LIGHT7_COLOR: "lights[7].color",
         UNIFORM_TYPE_LIGHT7_STRENGTH: "lights[7].strength",
         UNIFORM_TYPE_CAMERA_POS: "viewPos",
-        UNIFORM_TYPE_MATERIAL_INDEX: "material_index",
     },
 
     PIPELINE_TYPE_UNLIT: {
         UNIFORM_TYPE_PROJECTION: "projection",
         UNIFORM_TYPE_MATERIAL: "imageTexture",
         UNIFORM_TYPE_MATERIAL_COUNT: "material_count",
-        UNIFORM_TYPE_MODEL: "model",
         UNIFORM_TYPE_VIEW: "view",
-        UNIFORM_TYPE_TINT: "tint",
-        UNIFORM_TYPE_MATERIAL_INDEX: "material_index",
     },
 
     PIPELINE_TYPE_SCREEN: {
@@ -7,6 +7,7 @@ from shaders import *
 from framebuffers import *
 from materials import *
 from meshes import *
+from batching import *
 
 def post_renderpass(shader: int,
                     src: Framebuffer,
@@ -160,6 +161,7 @@ class GraphicsEngine:
             self.mesh_group.add_billboard(mesh_type, size)
         
         self.mesh_group.build()
+        self.batch_renderer = BatchRenderer(self.mesh_group)
 
     def create_materials(self) -> None:
         """
@@ -225,19 +227,7 @@ class GraphicsEngine:
             shader.bind_vec3(UNIFORM_TYPE_LIGHT0_COLOR + 3 * i, color)
             shader.bind_float(UNIFORM_TYPE_LIGHT0_STRENGTH + 3 * i, strength)
 
-        self.mesh_group.bind()
-
-        for obj in scene.lit_objects:
-            render_component: model.RenderComponent = obj.render
-            mesh_type = render_component.mesh_type
-            material_type = render_component.material_type - WOOD_MATERIAL
-            transform_component: model.TransformComponent = obj.transform
-            model_matrix = transform_component.matrix
-
-            shader.bind_float(UNIFORM_TYPE_MATERIAL_INDEX, material_type)
-            shader.bind_mat4(UNIFORM_TYPE_MODEL, model_matrix)
-
-            self.mesh_group.draw(mesh_type)
+        self.batch_renderer.draw(scene.lit_objects)
 
         pipeline_type = PIPELINE_TYPE_UNLIT
         shader = self.shaders[pipeline_type]
@@ -247,20 +237,7 @@ class GraphicsEngine:
 
         self.material_groups[pipeline_type].bind()
 
-        for obj in scene.unlit_objects:
-            render_component: model.RenderComponent = obj.render
-            mesh_type = render_component.mesh_type
-            material_type = render_component.material_type - WOOD_MATERIAL
-            transform_component: model.TransformComponent = obj.transform
-            model_matrix = transform_component.matrix
-            light_component: model.LightComponent = obj.light
-            color = light_component.color
-
-            shader.bind_float(UNIFORM_TYPE_MATERIAL_INDEX, material_type)
-            shader.bind_vec3(UNIFORM_TYPE_TINT, color)
-            shader.bind_mat4(UNIFORM_TYPE_MODEL, model_matrix)
-
-            self.mesh_group.draw(mesh_type)
+        self.batch_renderer.draw(scene.unlit_objects, tinted = True)
 
         pipeline_type = PIPELINE_TYPE_PARTICLE
         shader = self.shaders[pipeline_type]
@@ -336,6 +313,7 @@ class GraphicsEngine:
             Destroy everything.
         """
 
+        self.batch_renderer.destroy()
         self.mesh_group.destroy()
         self.screen.destroy()
         for material_group in self.material_groups.values():
@@ -1,17 +1,16 @@
 from config import *
-import sphere
-import plane
 
 class Buffer:
 
-    def __init__(self, size: int, binding: int, floatCount: int):
+    def __init__(self, size: int, binding: int, dtype: np.dtype):
 
         self.size = size
         self.binding = binding
-        self.floatCount = floatCount
 
-        # (cx cy cz r) (r g b _)
-        self.hostMemory = np.zeros(floatCount * size, dtype=np.float32)
+        #one record per element, in the shader's layout
+        self.hostMemory = np.zeros(size, dtype=dtype)
+        #element ranges written since the last upload, [first, last)
+        self.dirtyRanges: list[tuple[int, int]] = []
 
         self.deviceMemory = glGenBuffers(1)
         glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.deviceMemory)
@@ -19,65 +18,52 @@ class Buffer:
             GL_SHADER_STORAGE_BUFFER, self.hostMemory.nbytes, 
             self.hostMemory, GL_DYNAMIC_STORAGE_BIT)
         glBindBufferBase(GL_SHADER_STORAGE_BUFFER, binding, self.deviceMemory)
-        self.elements_updated = 0
     
-    def recordSphere(self, i: int, _sphere: sphere.Sphere) -> None:
+    def blit(self, data: np.ndarray, first: int = 0) -> None:
         """
-            Record the given sphere in position i, if this exceeds the buffer size,
-            the sphere is not recorded.
+            Copy a whole batch of elements in, starting at position first.
+            Anything past the end of the buffer is not recorded.
         """
 
-        if i >= self.size:
-            return
-
-        baseIndex = self.floatCount * i
-        self.hostMemory[baseIndex : baseIndex + 3] = _sphere.center[:]
-        self.hostMemory[baseIndex + 3] = _sphere.radius
-        self.hostMemory[baseIndex + 4 : baseIndex + 7] = _sphere.color[:]
-        self.hostMemory[baseIndex + 7] = _sphere.roughness
-        self.elements_updated += 1
+        count = max(0, min(len(data), self.size - first))
+        self.hostMemory[first:first + count] = data[:count]
+        self.markDirty(first, count)
     
-    def recordPlane(self, i: int, _plane: plane.Plane) -> None:
+    def markDirty(self, first: int, count: int) -> None:
         """
-            Record the given sphere in position i, if this exceeds the buffer size,
-            the sphere is not recorded.
+            Flag elements as changed, they'll be sent on the next upload.
         """
 
-        if i >= self.size:
-            return
-
-        baseIndex = self.floatCount * i
-        # plane: (cx cy cz umin) (tx ty tz umax) (bx by bz vmin) (nx ny nz vmax) (r g b -)
-
-        self.hostMemory[baseIndex : baseIndex + 3]  = _plane.center[:]
-        self.hostMemory[baseIndex + 3]              = _plane.uMin
-
-        self.hostMemory[baseIndex + 4 : baseIndex + 7]  = _plane.tangent[:]
-        self.hostMemory[baseIndex + 7]                  = _plane.uMax
-
-        self.hostMemory[baseIndex + 8 : baseIndex + 11] = _plane.bitangent[:]
-        self.hostMemory[baseIndex + 11]                 = _plane.vMin
-
-        self.hostMemory[baseIndex + 12 : baseIndex + 15]    = _plane.normal[:]
-        self.hostMemory[baseIndex + 15]                     = _plane.vMax
-
-        self.hostMemory[baseIndex + 16 : baseIndex + 19] = _plane.color[:]
-        self.hostMemory[baseIndex + 19] = _plane.roughness
-        self.elements_updated += 1
+        if count > 0:
+            self.dirtyRanges.append((first, min(first + count, self.size)))
     
     def readFrom(self) -> None:
         """
-            Upload the CPU data to the buffer, then arm it for reading.
+            Upload any changed CPU data to the buffer, then arm it for reading.
         """
 
         glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.deviceMemory)
-        glBufferSubData(GL_SHADER_STORAGE_BUFFER, 0, self.floatCount * 4 * self.elements_updated, self.hostMemory)
+
+        #merge overlapping ranges, then send each span once
+        itemsize = self.hostMemory.itemsize
+        spans = []
+        for first, last in sorted(self.dirtyRanges):
+            if spans and first <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], last)
+            else:
+                spans.append([first, last])
+        self.dirtyRanges.clear()
+
+        for first, last in spans:
+            glBufferSubData(
+                GL_SHADER_STORAGE_BUFFER, first * itemsize, 
+                (last - first) * itemsize, self.hostMemory[first:last])
+
         glBindBufferBase(GL_SHADER_STORAGE_BUFFER, self.binding, self.deviceMemory)
-        self.elements_updated = 0
     
     def destroy(self) -> None:
         """
             Free the memory.
         """
 
-        glDeleteBuffers(1, (self.deviceMemory,))
\ No newline at end of file
+        glDeleteBuffers(1, (self.deviceMemory,))
@@ -2,4 +2,26 @@ import pygame as pg
 from OpenGL.GL import *
 from OpenGL.GL.shaders import compileProgram,compileShader
 import numpy as np
-import pyrr
\ No newline at end of file
+import pyrr
+
+#GPU layouts, these match the shader's structs
+
+# sphere: (cx cy cz r) (r g b roughness)
+data_type_sphere = np.dtype({
+    'names':   [             'center',   'radius',              'color', 'roughness'], 
+    'formats': [(np.float32, (3,)), np.float32, (np.float32, (3,)),  np.float32],
+    'offsets': [                   0,         12,                   16,          28],
+    'itemsize': 32})
+
+# plane: (cx cy cz umin) (tx ty tz umax) (bx by bz vmin) (nx ny nz vmax) (r g b roughness)
+data_type_plane = np.dtype({
+    'names':   [             'center',       'uMin',            'tangent',       'uMax', 
+                          'bitangent',       'vMin',             'normal',       'vMax',
+                              'color',  'roughness'], 
+    'formats': [(np.float32, (3,)), np.float32, (np.float32, (3,)), np.float32, 
+                (np.float32, (3,)), np.float32, (np.float32, (3,)), np.float32,
+                (np.float32, (3,)), np.float32],
+    'offsets': [                   0,         12,                   16,         28,
+                                  32,         44,                   48,         60,
+                                  64,         76],
+    'itemsize': 80})
@@ -3,6 +3,7 @@ import material
 import screen_quad
 import buffer
 import scene
+import noise
 
 class Engine:
     """
@@ -20,6 +21,11 @@ class Engine:
         self.screenWidth = width
         self.screenHeight = height
 
+        #noise settings, seeded noise is cached on disk by resolution
+        self.noiseSeed = 0
+        self.noiseKind = "white"
+        self.noiseCacheDir = "noise_cache"
+
         self.makeAssets()
         
         self.createNoiseTexture()
@@ -30,8 +36,8 @@ class Engine:
         self.screenQuad = screen_quad.ScreenQuad()
         self.colorBuffer = material.Material(self.screenWidth, self.screenHeight)
 
-        self.sphereBuffer = buffer.Buffer(size = 1024, binding = 1, floatCount = 8)
-        self.planeBuffer = buffer.Buffer(size = 1024, binding = 2, floatCount = 20)
+        self.sphereBuffer = buffer.Buffer(size = 1024, binding = 1, dtype = data_type_sphere)
+        self.planeBuffer = buffer.Buffer(size = 1024, binding = 2, dtype = data_type_plane)
 
         self.shader = self.createShader("shaders/frameBufferVertex.txt",
                                         "shaders/frameBufferFragment.txt")
@@ -44,21 +50,10 @@ class Engine:
             generate four screens' worth of noise
         """
 
-        self.noiseData = np.zeros(self.screenHeight * self.screenWidth * 16, dtype=np.float32)
-
         # random noise: (x y z -)
-        for i in range(self.screenHeight * self.screenWidth * 4):
-            radius = np.random.uniform(low = 0.0, high = 0.99)
-            theta = np.random.uniform(low = 0.0, high = 2 * np.pi)
-            phi = np.random.uniform(low = 0.0, high = np.pi)
-            variation = np.array(
-                [
-                    radius * np.cos(theta) * np.cos(phi), 
-                    radius * np.sin(theta) * np.cos(phi), 
-                    radius * np.sin(phi)
-                ], dtype=np.float32
-            )
-            self.noiseData[4*i:4*i+3] = variation[:]
+        self.noiseData = noise.make_noise(
+            4 * self.screenWidth, self.screenHeight, 
+            self.noiseSeed, self.noiseKind, self.noiseCacheDir)
 
         self.noiseTexture = glGenTextures(1)
         glActiveTexture(GL_TEXTURE2)
@@ -72,7 +67,7 @@ class Engine:
         glTexImage2D(
             GL_TEXTURE_2D,0,GL_RGBA32F, 
             4 * self.screenWidth,self.screenHeight,
-            0,GL_RGBA,GL_FLOAT,bytes(self.noiseData)
+            0,GL_RGBA,GL_FLOAT,self.noiseData
         )
     
     def createShader(self, vertexFilepath: str, fragmentFilepath: str) -> None:
@@ -111,11 +106,8 @@ class Engine:
 
         glUseProgram(self.rayTracerShader)
 
-        for i,_sphere in enumerate(_scene.spheres):
-            self.sphereBuffer.recordSphere(i, _sphere)
-
-        for i,_plane in enumerate(_scene.planes):
-            self.planeBuffer.recordPlane(i, _plane)
+        self.sphereBuffer.blit(_scene.spheres)
+        self.planeBuffer.blit(_scene.planes)
         
         glUniform2iv(glGetUniformLocation(self.rayTracerShader, "objectCounts"), 1, _scene.objectCounts)
 
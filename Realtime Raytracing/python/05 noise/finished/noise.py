@@ -0,0 +1,96 @@
+from config import *
+import os
+#---- Noise                          ----#
+# Random offsets inside the unit sphere, #
+# one per texel, for jittering rays.     #
+# Every texel is generated at once, the  #
+# kind only changes where the uniform    #
+# samples behind each offset come from.  #
+#----------------------------------------#
+
+#plastic number, generates the R2 sequence
+PLASTIC = 1.32471795724474602596
+
+def white_samples(rng: np.random.Generator, count: int) -> np.ndarray:
+    """
+        Independent uniform samples, (count, 3).
+    """
+
+    return rng.random((count, 3))
+
+def stratified_samples(rng: np.random.Generator, count: int) -> np.ndarray:
+    """
+        Latin hypercube samples, (count, 3): along each dimension,
+        every one of the count equal strata holds exactly one sample.
+    """
+
+    strata = np.stack([rng.permutation(count) for _ in range(3)], axis = 1)
+
+    return (strata + rng.random((count, 3))) / count
+
+def blue_samples(rng: np.random.Generator, width: int, height: int) -> np.ndarray:
+    """
+        Low discrepancy samples over the texture, (height * width, 3).
+        Neighbouring texels get well spread values, which leaves
+        little low frequency noise, like a blue noise mask.
+        Each dimension uses a different mask so they don't correlate.
+    """
+
+    y, x = np.mgrid[0:height, 0:width]
+    x = x.ravel().astype(np.float64)
+    y = y.ravel().astype(np.float64)
+    offsets = rng.random(3)
+
+    samples = np.empty((width * height, 3))
+    #R2 masks along two different directions
+    samples[:, 0] = x / PLASTIC + y / PLASTIC**2
+    samples[:, 1] = x / PLASTIC**2 + y / PLASTIC
+    #interleaved gradient noise
+    samples[:, 2] = 52.9829189 * np.modf(0.06711056 * x + 0.00583715 * y)[0]
+
+    return np.modf(samples + offsets)[0]
+
+def make_noise(width: int, height: int, seed: int = None,
+    kind: str = "white", cache_dir: str = None) -> np.ndarray:
+    """
+        Make a (height, width, 4) float32 texture of offsets (x y z -)
+        within the sphere of radius 0.99.
+
+            Parameters:
+                seed (int): seeds the generator, None draws a fresh one
+                kind (str): "white", "stratified" or "blue"
+                cache_dir (str): if given (and seeded), noise is saved
+                    here and loaded back on later calls
+    """
+
+    cache_path = None
+    if cache_dir is not None and seed is not None:
+        cache_path = os.path.join(cache_dir, f"noise_{kind}_{seed}_{width}x{height}.npy")
+        if os.path.exists(cache_path):
+            return np.load(cache_path)
+
+    rng = np.random.default_rng(seed)
+    count = width * height
+    if kind == "white":
+        samples = white_samples(rng, count)
+    elif kind == "stratified":
+        samples = stratified_samples(rng, count)
+    elif kind == "blue":
+        samples = blue_samples(rng, width, height)
+    else:
+        raise ValueError(f"Unknown noise kind: {kind}")
+
+    radius = 0.99 * samples[:, 0]
+    theta = 2 * np.pi * samples[:, 1]
+    phi = np.pi * samples[:, 2]
+
+    noise = np.zeros((height, width, 4), dtype=np.float32)
+    noise[..., 0] = (radius * np.cos(theta) * np.cos(phi)).reshape(height, width)
+    noise[..., 1] = (radius * np.sin(theta) * np.cos(phi)).reshape(height, width)
+    noise[..., 2] = (radius * np.sin(phi)).reshape(height, width)
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok = True)
+        np.save(cache_path, noise)
+
+    return noise
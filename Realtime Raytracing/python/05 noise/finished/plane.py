@@ -1,35 +1,36 @@
 from config import *
 
-class Plane:
+def make_planes(count: int) -> np.ndarray:
     """
-        Represents a plane in the scene
+        Make space for count planes, laid out as in the shader.
     """
 
+    return np.zeros(count, dtype=data_type_plane)
 
-    def __init__(
-        self, normal: list[float], tangent: list[float], 
-        bitangent: list[float], uMin: float, 
-        uMax: float, vMin: float, vMax: float, 
-        center: list[float], color: list[float], roughness: float):
-        """
-            Create a new plane
+def set_plane(
+    planes: np.ndarray, i: int, normal: list[float], tangent: list[float], 
+    bitangent: list[float], uMin: float, 
+    uMax: float, vMin: float, vMax: float, 
+    center: list[float], color: list[float], roughness: float) -> None:
+    """
+        Describe plane i
 
-            Parameters:
-                normal (array [3,1])
-                tangent (array [3,1])
-                bitangent (array [3,1])
-                uMin,uMax,vMin,vMax (float) constraints, u: tangent, v: bitangent
-                center (array [3,1])
-                color (array [3,1])
-        """
+        Parameters:
+            normal (array [3,1])
+            tangent (array [3,1])
+            bitangent (array [3,1])
+            uMin,uMax,vMin,vMax (float) constraints, u: tangent, v: bitangent
+            center (array [3,1])
+            color (array [3,1])
+    """
 
-        self.normal = np.array(normal, dtype=np.float32)
-        self.tangent = np.array(tangent, dtype=np.float32)
-        self.bitangent = np.array(bitangent, dtype=np.float32)
-        self.uMin = uMin
-        self.uMax = uMax
-        self.vMin = vMin
-        self.vMax = vMax
-        self.center = np.array(center, dtype=np.float32)
-        self.color = np.array(color, dtype=np.float32)
-        self.roughness = roughness
\ No newline at end of file
+    planes[i]['normal'] = normal
+    planes[i]['tangent'] = tangent
+    planes[i]['bitangent'] = bitangent
+    planes[i]['uMin'] = uMin
+    planes[i]['uMax'] = uMax
+    planes[i]['vMin'] = vMin
+    planes[i]['vMax'] = vMax
+    planes[i]['center'] = center
+    planes[i]['color'] = color
+    planes[i]['roughness'] = roughness
@@ -14,41 +14,26 @@ class Scene:
             Set up scene objects.
         """
         
-        self.spheres = [
-            sphere.Sphere(
-                center = [
-                    np.random.uniform(low = 3.0, high = 10.0),
-                    np.random.uniform(low = -5.0, high = 5.0),
-                    np.random.uniform(low = -5.0, high = 5.0)
-                ],
-                radius = np.random.uniform(low = 0.3, high = 2.0),
-                color = [
-                    np.random.uniform(low = 0.3, high = 1.0),
-                    np.random.uniform(low = 0.3, high = 1.0),
-                    np.random.uniform(low = 0.3, high = 1.0)
-                ],
-                roughness = np.random.uniform(low = 0.3, high = 0.8)
-            ) for i in range(16)
-        ]
+        self.spheres = sphere.make_spheres(16)
         
-        self.planes = [
-            plane.Plane(
-                normal = [0, 0, 1],
-                tangent = [1, 0, 0],
-                bitangent = [0, 1, 0],
-                uMin = -10,
-                uMax = 10,
-                vMin = -10,
-                vMax = 10,
-                center = [0, 0, -7],
-                color = [
-                    np.random.uniform(low = 0.3, high = 1.0),
-                    np.random.uniform(low = 0.3, high = 1.0),
-                    np.random.uniform(low = 0.3, high = 1.0)
-                ],
-                roughness = np.random.uniform(low = 0.3, high = 0.8)
-            ),
-        ]
+        self.planes = plane.make_planes(1)
+        plane.set_plane(
+            self.planes, 0,
+            normal = [0, 0, 1],
+            tangent = [1, 0, 0],
+            bitangent = [0, 1, 0],
+            uMin = -10,
+            uMax = 10,
+            vMin = -10,
+            vMax = 10,
+            center = [0, 0, -7],
+            color = [
+                np.random.uniform(low = 0.3, high = 1.0),
+                np.random.uniform(low = 0.3, high = 1.0),
+                np.random.uniform(low = 0.3, high = 1.0)
+            ],
+            roughness = np.random.uniform(low = 0.3, high = 0.8)
+        )
         
         self.camera = camera.Camera(
             position = [-8, 0, 0]
@@ -1,23 +1,18 @@
 from config import *
 
-class Sphere:
-    """
-        Represents a sphere in the scene
+def make_spheres(count: int) -> np.ndarray:
     """
+        Make a batch of random spheres in one pass.
 
-    def __init__(self, 
-        center: list[float], radius: float, 
-        color: list[float], roughness: float):
-        """
-            Create a new sphere
+        Returns an array of data_type_sphere, laid out as in the shader.
+    """
 
-            Parameters:
-                center (array [3,1])
-                radius (float)
-                color (array [3,1])
-        """
+    spheres = np.zeros(count, dtype=data_type_sphere)
+    spheres['center'][:, 0] = np.random.uniform(low = 3.0, high = 10.0, size = count)
+    spheres['center'][:, 1] = np.random.uniform(low = -5.0, high = 5.0, size = count)
+    spheres['center'][:, 2] = np.random.uniform(low = -5.0, high = 5.0, size = count)
+    spheres['radius'] = np.random.uniform(low = 0.3, high = 2.0, size = count)
+    spheres['color'] = np.random.uniform(low = 0.3, high = 1.0, size = (count, 3))
+    spheres['roughness'] = np.random.uniform(low = 0.3, high = 0.8, size = count)
 
-        self.center = np.array(center,dtype=np.float32)
-        self.radius = radius
-        self.color = np.array(color, dtype=np.float32)
-        self.roughness = roughness
\ No newline at end of file
+    return spheres
@@ -7,4 +7,30 @@ import time
 import queue
 from PIL import Image, ImageOps
 
-np.random.seed(0)
\ No newline at end of file
+np.random.seed(0)
+
+#data texture layouts, one row of RGBA texels per element
+
+# sphere: (cx cy cz r) (r g b roughness)
+data_type_sphere = np.dtype({
+    'names':   [             'center',   'radius',              'color', 'roughness'], 
+    'formats': [(np.float32, (3,)), np.float32, (np.float32, (3,)),  np.float32],
+    'offsets': [                   0,         12,                   16,          28],
+    'itemsize': 32})
+
+# node: (x_min, y_min, z_min, x_max) (y_max, z_max, index hit_link) (miss_link, offset, count, _)
+data_type_node = np.dtype({
+    'names':   [         'min_corner',         'max_corner',    'index', 'hit_link', 
+                 'miss_link', 'first_sphere_index', 'sphere_count'], 
+    'formats': [(np.float32, (3,)), (np.float32, (3,)), np.float32, np.float32, 
+                 np.float32,           np.float32,     np.float32],
+    'offsets': [                   0,                   12,         24,         28,
+                         32,                   36,             40],
+    'itemsize': 48})
+
+# index: (index, _, _, _)
+data_type_sphere_index = np.dtype({
+    'names':   [   'index'], 
+    'formats': [np.float32],
+    'offsets': [         0],
+    'itemsize': 16})
@@ -0,0 +1,90 @@
+from config import *
+
+class DataTexture:
+    """
+        A float texture holding one element per row,
+        written from a structured array in whole batches.
+    """
+
+    def __init__(self, size: int, unit: int, dtype: np.dtype):
+
+        self.size = size
+        self.unit = unit
+
+        self.hostMemory = np.zeros(size, dtype=dtype)
+        #RGBA32F texels per element
+        self.width = dtype.itemsize // 16
+        #element ranges written since the last upload, [first, last)
+        self.dirtyRanges: list[tuple[int, int]] = []
+
+        self.texture = glGenTextures(1)
+        glActiveTexture(GL_TEXTURE0 + unit)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+
+        glTexImage2D(
+            GL_TEXTURE_2D, 0, GL_RGBA32F, self.width, size,
+            0, GL_RGBA, GL_FLOAT, self.hostMemory.view(np.float32))
+
+    def blit(self, data: np.ndarray, first: int = 0, field: str = None) -> None:
+        """
+            Copy a whole batch of elements in, starting at position first.
+            If field is given, data fills just that field.
+            Anything past the end of the texture is not recorded.
+        """
+
+        count = max(0, min(len(data), self.size - first))
+        if field is None:
+            self.hostMemory[first:first + count] = data[:count]
+        else:
+            self.hostMemory[field][first:first + count] = data[:count]
+        self.markDirty(first, count)
+
+    def markDirty(self, first: int, count: int) -> None:
+        """
+            Flag elements as changed, they'll be sent on the next upload.
+        """
+
+        if count > 0:
+            self.dirtyRanges.append((first, min(first + count, self.size)))
+
+    def upload(self) -> None:
+        """
+            Send the changed rows to the texture.
+        """
+
+        glActiveTexture(GL_TEXTURE0 + self.unit)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+
+        #merge overlapping ranges, then send each span once
+        spans = []
+        for first, last in sorted(self.dirtyRanges):
+            if spans and first <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], last)
+            else:
+                spans.append([first, last])
+        self.dirtyRanges.clear()
+
+        for first, last in spans:
+            glTexSubImage2D(
+                GL_TEXTURE_2D, 0, 0, first, self.width, last - first,
+                GL_RGBA, GL_FLOAT, self.hostMemory[first:last].view(np.float32))
+
+    def readFrom(self) -> None:
+        """
+            Arm the texture for reading, as the image at its unit.
+        """
+
+        glActiveTexture(GL_TEXTURE0 + self.unit)
+        glBindImageTexture(self.unit, self.texture, 0, GL_FALSE, 0, GL_READ_ONLY, GL_RGBA32F)
+
+    def destroy(self) -> None:
+        """
+            Free the memory.
+        """
+
+        glDeleteTextures(1, (self.texture,))
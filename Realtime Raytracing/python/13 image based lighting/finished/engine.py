@@ -1,8 +1,7 @@
 from config import *
 import scene
-import sphere
-import node
 import materials
+import data_texture
 
 class Engine:
     """
@@ -107,47 +106,14 @@ class Engine:
             allocate storage for up to 1024 objects (why not?)
         """
 
-        # sphere: (cx cy cz r) (r g b roughness)
-        self.objectData = np.zeros(8 * 1024, dtype = np.float32)
+        self.objectData = data_texture.DataTexture(
+            size = 1024, unit = 1, dtype = data_type_sphere)
 
-        self.objectDataTexture = glGenTextures(1)
-        glActiveTexture(GL_TEXTURE1)
-        glBindTexture(GL_TEXTURE_2D, self.objectDataTexture)
+        self.nodeData = data_texture.DataTexture(
+            size = 1024, unit = 2, dtype = data_type_node)
 
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-    
-        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA32F, 2, 1024,0,GL_RGBA,GL_FLOAT,bytes(self.objectData))
-
-        # node: (x_min, y_min, z_min, x_max) (y_max, z_max, index hit_link) (miss_link, offset, count, _)
-        self.nodeData = np.zeros(12 * 1024, dtype = np.float32)
-
-        self.nodeTexture = glGenTextures(1)
-        glActiveTexture(GL_TEXTURE2)
-        glBindTexture(GL_TEXTURE_2D, self.nodeTexture)
-
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-    
-        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA32F,3,1024,0,GL_RGBA,GL_FLOAT,bytes(self.nodeData))
-
-        # sphere_lookup: (index _ _ _)
-        self.sphereLookupData = np.zeros(4 * 1024, dtype = np.float32)
-
-        self.sphereLookupTexture = glGenTextures(1)
-        glActiveTexture(GL_TEXTURE3)
-        glBindTexture(GL_TEXTURE_2D, self.sphereLookupTexture)
-
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-    
-        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA32F,1,1024,0,GL_RGBA,GL_FLOAT,bytes(self.sphereLookupData))
+        self.sphereLookupData = data_texture.DataTexture(
+            size = 1024, unit = 3, dtype = data_type_sphere_index)
 
     def createShader(self, vertexFilepath, fragmentFilepath):
         """
@@ -179,48 +145,6 @@ class Engine:
         
         return shader
 
-    def recordSphere(self, i, _sphere: sphere.Sphere):
-
-        # sphere: (cx cy cz r) (r g b roughness)
-
-        self.objectData[8*i]     = _sphere.center[0]
-        self.objectData[8*i + 1] = _sphere.center[1]
-        self.objectData[8*i + 2] = _sphere.center[2]
-
-        self.objectData[8*i + 3] = _sphere.radius
-
-        self.objectData[8*i + 4] = _sphere.color[0]
-        self.objectData[8*i + 5] = _sphere.color[1]
-        self.objectData[8*i + 6] = _sphere.color[2]
-
-        self.objectData[8*i + 7] = _sphere.roughness
-    
-    def recordNode(self, i, _node: node.Node):
-
-        # node: (x_min, y_min, z_min, x_max) (y_max, z_max, index hit_link) (miss_link, offset, count, _)
-
-        self.nodeData[12*i]      = _node.min_corner[0]
-        self.nodeData[12*i + 1]  = _node.min_corner[1]
-        self.nodeData[12*i + 2]  = _node.min_corner[2]
-
-        self.nodeData[12*i + 3]  = _node.max_corner[0]
-        self.nodeData[12*i + 4]  = _node.max_corner[1]
-        self.nodeData[12*i + 5]  = _node.max_corner[2]
-
-        self.nodeData[12*i + 6]  = _node.index
-
-        self.nodeData[12*i + 7]  = _node.hit_link
-        self.nodeData[12*i + 8]  = _node.miss_link
-
-        self.nodeData[12*i + 9]  = _node.first_sphere_index
-        self.nodeData[12*i + 10] = _node.sphere_count
-    
-    def recordSphereIndex(self, i, index):
-
-        # index: (index, _, _, _)
-
-        self.sphereLookupData[4*i] = index
-    
     def updateScene(self, scene: scene.Scene):
 
         scene.outDated = False
@@ -229,30 +153,16 @@ class Engine:
 
         glUniform1f(glGetUniformLocation(self.rayTracerShader, "sphereCount"), len(scene.spheres))
 
-        for i,_sphere in enumerate(scene.spheres):
-            self.recordSphere(i, _sphere)
-        
-        glActiveTexture(GL_TEXTURE1)
-        glBindTexture(GL_TEXTURE_2D, self.objectDataTexture)
-        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA32F,2,1024,0,GL_RGBA,GL_FLOAT,bytes(self.objectData))
+        self.objectData.blit(scene.spheres)
+        self.objectData.upload()
 
         glUniform1f(glGetUniformLocation(self.rayTracerShader, "nodeCount"), scene.nodes_used)
 
-        for i in range(scene.nodes_used):
-            _node = scene.nodes[i]
-            if _node.min_corner is not None:
-                self.recordNode(i, _node)
-
-        glActiveTexture(GL_TEXTURE2)
-        glBindTexture(GL_TEXTURE_2D, self.nodeTexture)
-        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA32F,3,1024,0,GL_RGBA,GL_FLOAT,bytes(self.nodeData))
+        self.nodeData.blit(scene.nodes[:scene.nodes_used])
+        self.nodeData.upload()
 
-        for i,_index in enumerate(scene.sphere_ids):
-            self.recordSphereIndex(i, _index)
-
-        glActiveTexture(GL_TEXTURE3)
-        glBindTexture(GL_TEXTURE_2D, self.sphereLookupTexture)
-        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA32F,1,1024,0,GL_RGBA,GL_FLOAT,bytes(self.sphereLookupData))
+        self.sphereLookupData.blit(scene.sphere_ids, field = 'index')
+        self.sphereLookupData.upload()
 
     def prepareScene(self, scene: scene.Scene):
         """
@@ -269,14 +179,9 @@ class Engine:
         if scene.outDated:
             self.updateScene(scene)
         
-        glActiveTexture(GL_TEXTURE1)
-        glBindImageTexture(1, self.objectDataTexture, 0, GL_FALSE, 0, GL_READ_ONLY, GL_RGBA32F)
-
-        glActiveTexture(GL_TEXTURE2)
-        glBindImageTexture(2, self.nodeTexture, 0, GL_FALSE, 0, GL_READ_ONLY, GL_RGBA32F)
-
-        glActiveTexture(GL_TEXTURE3)
-        glBindImageTexture(3, self.sphereLookupTexture, 0, GL_FALSE, 0, GL_READ_ONLY, GL_RGBA32F)
+        self.objectData.readFrom()
+        self.nodeData.readFrom()
+        self.sphereLookupData.readFrom()
 
         self.skyBoxMaterial.use()
         
@@ -1,17 +1,13 @@
 from config import *
 
-class Node:
+def make_nodes(count: int) -> np.ndarray:
+    """
+        Make space for count nodes, laid out as in the node data texture.
+        Links start out as -1, meaning none.
+    """
 
+    nodes = np.zeros(count, dtype=data_type_node)
+    nodes['hit_link'] = -1.0
+    nodes['miss_link'] = -1.0
 
-    def __init__(self):
-
-        self.min_corner = None
-        self.max_corner = None
-        self.left_child = -1.0
-        self.right_child = -1.0
-        self.parent = -1.0
-        self.first_sphere_index = 0
-        self.sphere_count = 0
-        self.index = 0
-        self.hit_link = -1.0
-        self.miss_link = -1.0
+    return nodes
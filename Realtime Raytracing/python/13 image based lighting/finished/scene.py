@@ -15,32 +15,20 @@ class Scene:
         """
         
         sphere_count = 128
-        self.spheres = [
-            sphere.Sphere(
-                center = [
-                    np.random.uniform(low = -15.0, high = 15.0),
-                    np.random.uniform(low = -15.0, high = 15.0),
-                    np.random.uniform(low = -15.0, high = 15.0)
-                ],
-                radius = np.random.uniform(low = 0.3, high = 2.0),
-                color = [
-                    np.random.uniform(low = 0.0, high = 1.0),
-                    np.random.uniform(low = 0.0, high = 1.0),
-                    np.random.uniform(low = 0.0, high = 1.0)
-                ],
-                roughness = np.random.uniform(low = 0.0, high = 1.0)
-            ) for i in range(sphere_count)
-        ]
+        self.spheres = sphere.make_spheres(sphere_count)
         
         self.camera = camera.Camera(
             position = [0.0, 0.0, 1.0]
         )
 
-        self.sphere_ids = [i for i in range(sphere_count)]
+        self.sphere_ids = np.arange(sphere_count, dtype=np.int32)
 
-        self.nodes = []
-        for _ in range(2 * len(self.spheres) + 1):
-            self.nodes.append(node.Node())
+        node_count = 2 * len(self.spheres) + 1
+        self.nodes = node.make_nodes(node_count)
+        #tree structure, only needed while building
+        self.parents = np.full(node_count, -1, dtype=np.int32)
+        self.left_children = np.full(node_count, -1, dtype=np.int32)
+        self.right_children = np.full(node_count, -1, dtype=np.int32)
         
         self.root_index = 0
         self.nodes_used = 1
@@ -49,12 +37,12 @@ class Scene:
         self.build_links(self.root_index)
 
         """
-        for _node in self.nodes:
-            print(f"Node index {_node.index}")
-            print(f"Parent ID: {_node.parent}")
+        for i in range(self.nodes_used):
+            print(f"Node index {self.nodes[i]['index']}")
+            print(f"Parent ID: {self.parents[i]}")
             
-            print(f"Hit Link: {_node.hit_link}")
-            print(f"Miss Link: {_node.miss_link}")
+            print(f"Hit Link: {self.nodes[i]['hit_link']}")
+            print(f"Miss Link: {self.nodes[i]['miss_link']}")
             print("-------")
         """
 
@@ -90,10 +78,10 @@ class Scene:
     
     def build_bvh(self):
 
-        root: node.Node = self.nodes[self.root_index]
-        root.first_sphere_index = 0
-        root.sphere_count = len(self.spheres)
-        root.index = self.root_index
+        root = self.nodes[self.root_index]
+        root['first_sphere_index'] = 0
+        root['sphere_count'] = len(self.spheres)
+        root['index'] = self.root_index
 
         self.update_bounds(self.root_index)
 
@@ -101,40 +89,39 @@ class Scene:
     
     def update_bounds(self, node_index):
 
-        _node: node.Node = self.nodes[node_index]
-        _node.min_corner = np.array([1e30, 1e30, 1e30], dtype=np.float32)
-        _node.max_corner = np.array([-1e30, -1e30, -1e30], dtype=np.float32)
-        first = _node.first_sphere_index
-        for i in range(_node.sphere_count):
+        _node = self.nodes[node_index]
+        first = int(_node['first_sphere_index'])
+        count = int(_node['sphere_count'])
 
-            sphere_index = self.sphere_ids[first + i]
-            _sphere = self.spheres[sphere_index]
+        #every sphere in the node at once
+        sphere_ids = self.sphere_ids[first : first + count]
+        centers = self.spheres['center'][sphere_ids]
+        radii = self.spheres['radius'][sphere_ids, np.newaxis]
 
-            sphere_min = _sphere.center - _sphere.radius * np.array([1, 1, 1], dtype=np.float32)
-            _node.min_corner = np.minimum(_node.min_corner, sphere_min)
-
-            sphere_max = _sphere.center + _sphere.radius * np.array([1, 1, 1], dtype=np.float32)
-            _node.max_corner = np.maximum(_node.max_corner, sphere_max)
+        _node['min_corner'] = np.min(centers - radii, axis = 0)
+        _node['max_corner'] = np.max(centers + radii, axis = 0)
     
     def subdivide(self, node_index):
 
-        _node: node.Node = self.nodes[node_index]
-        if _node.sphere_count <= 16:
+        _node = self.nodes[node_index]
+        sphere_count = int(_node['sphere_count'])
+        first = int(_node['first_sphere_index'])
+        if sphere_count <= 16:
             return
 
-        extent = _node.max_corner - _node.min_corner
+        extent = _node['max_corner'] - _node['min_corner']
         axis = 0
         if (extent[1] > extent[axis]):
             axis = 1
         if (extent[2] > extent[axis]):
             axis = 2
-        split_position = _node.min_corner[axis] + 0.5 * extent[axis]
+        split_position = _node['min_corner'][axis] + 0.5 * extent[axis]
 
         #split group into halves
-        i = _node.first_sphere_index
-        j = i + _node.sphere_count - 1
+        i = first
+        j = i + sphere_count - 1
         while i <= j:
-            if self.spheres[self.sphere_ids[i]].center[axis] < split_position:
+            if self.spheres['center'][self.sphere_ids[i], axis] < split_position:
                 i += 1
             else:
                 temp = self.sphere_ids[i]
@@ -143,63 +130,62 @@ class Scene:
                 j -= 1
 
         #create child nodes
-        left_count = i - _node.first_sphere_index
-        if (left_count == 0 or left_count == _node.sphere_count):
+        left_count = i - first
+        if (left_count == 0 or left_count == sphere_count):
             return
         
         left_child_index = self.nodes_used
         self.nodes_used += 1
-        _node.left_child = left_child_index
-        left_node: node.Node = self.nodes[left_child_index]
-        left_node.parent = node_index
-        left_node.index = left_child_index
-        left_node.first_sphere_index = _node.first_sphere_index
-        left_node.sphere_count = left_count
+        self.left_children[node_index] = left_child_index
+        self.parents[left_child_index] = node_index
+        left_node = self.nodes[left_child_index]
+        left_node['index'] = left_child_index
+        left_node['first_sphere_index'] = first
+        left_node['sphere_count'] = left_count
         self.update_bounds(left_child_index)
         self.subdivide(left_child_index)
 
         right_child_index = self.nodes_used
         self.nodes_used += 1
-        _node.right_child = right_child_index
-        right_node: node.Node = self.nodes[right_child_index]
-        right_node.parent = node_index
-        right_node.index = right_child_index
-        right_node.first_sphere_index = i
-        right_node.sphere_count = _node.sphere_count - left_count
+        self.right_children[node_index] = right_child_index
+        self.parents[right_child_index] = node_index
+        right_node = self.nodes[right_child_index]
+        right_node['index'] = right_child_index
+        right_node['first_sphere_index'] = i
+        right_node['sphere_count'] = sphere_count - left_count
         self.update_bounds(right_child_index)
         self.subdivide(right_child_index)
 
-        _node.sphere_count = 0
+        _node['sphere_count'] = 0
 
     def get_right_child(self, parent_index, requestor_index):
-
-        parent: node.Node = self.nodes[parent_index]
         
-        if requestor_index > parent.left_child:
+        if requestor_index > self.left_children[parent_index]:
 
-            if parent.parent < 0:
+            if self.parents[parent_index] < 0:
                 return -1.0
-            return self.get_right_child(parent.parent, parent_index)
+            return self.get_right_child(self.parents[parent_index], parent_index)
         
-        return parent.right_child
+        return self.right_children[parent_index]
     
     def build_links(self, node_index):
 
-        _node: node.Node = self.nodes[node_index]
+        _node = self.nodes[node_index]
+        parent = self.parents[node_index]
 
-        if _node.sphere_count == 0:
-            _node.hit_link = _node.left_child
+        if _node['sphere_count'] == 0:
+            _node['hit_link'] = self.left_children[node_index]
         else:
-            if _node.parent < 0:
-                _node.hit_link = -1.0
+            if parent < 0:
+                _node['hit_link'] = -1.0
             else:
-                _node.hit_link = self.get_right_child(_node.parent, _node.index)
+                _node['hit_link'] = self.get_right_child(parent, node_index)
         
-        if _node.parent < 0:
-            _node.miss_link = -1.0
+        if parent < 0:
+            _node['miss_link'] = -1.0
         else:
-            _node.miss_link = self.get_right_child(_node.parent, _node.index)
+            _node['miss_link'] = self.get_right_child(parent, node_index)
         
-        if (_node.left_child > 0):
-            self.build_links(_node.left_child)
-            self.build_links(_node.right_child)
\ No newline at end of file
+        if (self.left_children[node_index] > 0):
+            self.build_links(self.left_children[node_index])
+            self.build_links(self.right_children[node_index])
\ No newline at end of file
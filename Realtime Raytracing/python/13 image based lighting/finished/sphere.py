@@ -1,21 +1,14 @@
 from config import *
 
-class Sphere:
+def make_spheres(count: int) -> np.ndarray:
     """
-        Represents a sphere in the scene
+        Make a batch of random spheres in one pass,
+        laid out as in the object data texture.
     """
 
-    def __init__(self, center, radius, color, roughness):
-        """
-            Create a new sphere
+    # (cx cy cz r) (r g b roughness), drawn sphere by sphere
+    low = np.array([-15.0, -15.0, -15.0, 0.3, 0.0, 0.0, 0.0, 0.0])
+    high = np.array([15.0, 15.0, 15.0, 2.0, 1.0, 1.0, 1.0, 1.0])
+    attributes = np.random.uniform(low = low, high = high, size = (count, 8))
 
-            Parameters:
-                center (array [3,1])
-                radius (float)
-                color (array [3,1])
-        """
-
-        self.center = np.array(center,dtype=np.float32)
-        self.radius = radius
-        self.color = np.array(color, dtype=np.float32)
-        self.roughness = roughness
\ No newline at end of file
+    return attributes.astype(np.float32).view(data_type_sphere).ravel()
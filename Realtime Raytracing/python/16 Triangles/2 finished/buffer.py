@@ -1,7 +1,5 @@
 from config import *
 import sphere
-import triangle
-import node
 
 class Buffer:
 
@@ -38,48 +36,16 @@ class Buffer:
 
         self.elements_updated += 1
     
-    def recordTriangle(self, i: int, _triangle: triangle.Triangle) -> None:
+    def blit(self, data: np.ndarray) -> None:
         """
-            Record the given sphere in position i, if this exceeds the buffer size,
-            the sphere is not recorded.
+            Copy a whole packed array, one row per element,
+            into the buffer in one go.
         """
 
-        if i >= self.size:
-            return
-
-        baseIndex = self.floatCount * i
+        count = min(len(data), self.size)
+        self.hostMemory[:count * self.floatCount] = data[:count].ravel()
 
-        for j in range(3):
-            self.hostMemory[baseIndex + 4*j : baseIndex + 4*j + 3] =\
-                _triangle.corners[j][:]
-        
-        self.hostMemory[baseIndex + 12 : baseIndex + 15] = _triangle.normal[:]
-
-        self.hostMemory[baseIndex + 3] = _triangle.color[0]
-        self.hostMemory[baseIndex + 7] = _triangle.color[1]
-        self.hostMemory[baseIndex + 11] = _triangle.color[2]
-
-        self.elements_updated += 1
-    
-    def recordNode(self, i: int, _node: node.Node) -> None:
-        """
-            Record the given node in position i, if this exceeds the buffer size,
-            the node is not recorded.
-        """
-
-        if i >= self.size:
-            return
-
-        # node: (x_min, y_min, z_min, sphere_count) (x_max, y_max, z_max, contents)
-        base_index = self.floatCount * i
-
-        self.hostMemory[base_index : base_index + 3] = _node.min_corner[:]
-        self.hostMemory[base_index + 3] = _node.primitive_count
-
-        self.hostMemory[base_index + 4 : base_index + 7] = _node.max_corner[:]
-        self.hostMemory[base_index + 7]  = _node.contents
-
-        self.elements_updated += 1
+        self.elements_updated = count
     
     def recordSphereIndex(self, i: int, index: int) -> None:
         """
@@ -0,0 +1,342 @@
+from config import *
+import node
+#---- Data Oriented Design!          ----#
+# The triangle bvh, built over packed    #
+# corner and centroid arrays. Every      #
+# function is compiled and all scratch   #
+# memory is allocated up front.          #
+#----------------------------------------#
+
+#---- BVH Building                   ----#
+#region
+@njit(cache = True)
+def build_bvh(
+    nodes: np.ndarray,
+    corners: np.ndarray,
+    centroids: np.ndarray,
+    ids: np.ndarray,
+    primitive_count: int,
+    bin_count: int = 64) -> int:
+    """
+        Build the bvh from scratch, returns the number of nodes used.
+
+        corners: (count, 3, 3) float32, triangle, corner, axis
+        centroids: (count, 3) float32
+    """
+
+    #Configure root node
+    node.reset_nodes(nodes, 0, 1)
+    nodes[0]['primitive_count'] = primitive_count
+    nodes[0]['contents'] = 0
+
+    #preallocate memory:
+    # [bins -- left_bins -- right_bins -- dummy_left -- dummy_right]
+    bins = node.make_nodes(3 * bin_count + 2)
+
+    update_bounds(nodes, corners, ids, 0)
+
+    #each split pushes two children, the stack
+    #can't grow deeper than the number of leaves
+    stack = np.zeros(primitive_count + 1, dtype = np.int32)
+    stack_pos = 1
+    nodes_used = 1
+
+    while stack_pos > 0:
+
+        stack_pos -= 1
+        node_index = stack[stack_pos]
+
+        left_child_index = nodes_used
+        nodes_used = subdivide(
+            nodes, corners, centroids, ids,
+            node_index, nodes_used, bins, bin_count)
+
+        if nodes_used > left_child_index:
+            #push right first so the left subtree is built first
+            stack[stack_pos] = left_child_index + 1
+            stack[stack_pos + 1] = left_child_index
+            stack_pos += 2
+
+    return nodes_used
+
+@njit(cache = True)
+def grow(nodes: np.ndarray, node_index: int,
+    corners: np.ndarray, triangle_index: int) -> None:
+    """
+        Grow a node's box to fit the given triangle.
+    """
+
+    for j in range(3):
+        nodes[node_index]['min_x'] = min(nodes[node_index]['min_x'], corners[triangle_index, j, 0])
+        nodes[node_index]['min_y'] = min(nodes[node_index]['min_y'], corners[triangle_index, j, 1])
+        nodes[node_index]['min_z'] = min(nodes[node_index]['min_z'], corners[triangle_index, j, 2])
+        nodes[node_index]['max_x'] = max(nodes[node_index]['max_x'], corners[triangle_index, j, 0])
+        nodes[node_index]['max_y'] = max(nodes[node_index]['max_y'], corners[triangle_index, j, 1])
+        nodes[node_index]['max_z'] = max(nodes[node_index]['max_z'], corners[triangle_index, j, 2])
+
+@njit(cache = True)
+def merge(nodes: np.ndarray, dst: int, src: int) -> None:
+    """
+        Grow node dst to fit node src, adding up their counts.
+    """
+
+    nodes[dst]['min_x'] = min(nodes[dst]['min_x'], nodes[src]['min_x'])
+    nodes[dst]['min_y'] = min(nodes[dst]['min_y'], nodes[src]['min_y'])
+    nodes[dst]['min_z'] = min(nodes[dst]['min_z'], nodes[src]['min_z'])
+    nodes[dst]['primitive_count'] = nodes[dst]['primitive_count'] + nodes[src]['primitive_count']
+    nodes[dst]['max_x'] = max(nodes[dst]['max_x'], nodes[src]['max_x'])
+    nodes[dst]['max_y'] = max(nodes[dst]['max_y'], nodes[src]['max_y'])
+    nodes[dst]['max_z'] = max(nodes[dst]['max_z'], nodes[src]['max_z'])
+
+@njit(cache = True)
+def copy_node(nodes: np.ndarray, dst: int, src: int) -> None:
+
+    nodes[dst]['min_x'] = nodes[src]['min_x']
+    nodes[dst]['min_y'] = nodes[src]['min_y']
+    nodes[dst]['min_z'] = nodes[src]['min_z']
+    nodes[dst]['primitive_count'] = nodes[src]['primitive_count']
+    nodes[dst]['max_x'] = nodes[src]['max_x']
+    nodes[dst]['max_y'] = nodes[src]['max_y']
+    nodes[dst]['max_z'] = nodes[src]['max_z']
+
+@njit(cache = True)
+def get_cost(nodes: np.ndarray, node_index: int) -> float:
+
+    e_x = nodes[node_index]['max_x'] - nodes[node_index]['min_x']
+    e_y = nodes[node_index]['max_y'] - nodes[node_index]['min_y']
+    e_z = nodes[node_index]['max_z'] - nodes[node_index]['min_z']
+
+    return nodes[node_index]['primitive_count'] * (e_x * e_y + e_y * e_z + e_x * e_z)
+
+@njit(cache = True)
+def get_bounds(nodes: np.ndarray, node_index: int, axis: int) -> tuple[float, float]:
+
+    if axis == 0:
+        return nodes[node_index]['min_x'], nodes[node_index]['max_x']
+    if axis == 1:
+        return nodes[node_index]['min_y'], nodes[node_index]['max_y']
+    return nodes[node_index]['min_z'], nodes[node_index]['max_z']
+
+@njit(cache = True)
+def update_bounds(
+    nodes: np.ndarray,
+    corners: np.ndarray,
+    ids: np.ndarray,
+    node_index: int) -> None:
+
+    count = int(nodes[node_index]['primitive_count'])
+    first = int(nodes[node_index]['contents'])
+
+    for i in range(count):
+        grow(nodes, node_index, corners, ids[first + i])
+
+@njit(cache = True)
+def subdivide(nodes: np.ndarray,
+    corners: np.ndarray,
+    centroids: np.ndarray,
+    ids: np.ndarray,
+    node_index: int,
+    nodes_used: int,
+    bins: np.ndarray,
+    bin_count: int) -> int:
+    """
+        Attempt to split a single node along its longest axis,
+        returns the updated node count.
+        Any children are created and bounded but not subdivided.
+    """
+
+    primitive_count = int(nodes[node_index]['primitive_count'])
+    if primitive_count < 2:
+        return nodes_used
+
+    axis = 0
+    extent = 0.0
+    for i in range(3):
+        low, high = get_bounds(nodes, node_index, i)
+        if high - low > extent:
+            axis = i
+            extent = high - low
+
+    if primitive_count < bin_count:
+        pos, cost = determine_best_split_full(
+            nodes, corners, centroids, ids, node_index, axis, bins)
+    else:
+        pos, cost = determine_best_split_bin(
+            nodes, corners, centroids, ids, node_index, axis, bin_count, bins)
+
+    if cost >= get_cost(nodes, node_index):
+        return nodes_used
+
+    return object_split(
+        nodes, corners, centroids, ids, node_index, axis, nodes_used, pos)
+
+@njit(cache = True)
+def determine_best_split_full(nodes: np.ndarray,
+    corners: np.ndarray,
+    centroids: np.ndarray,
+    ids: np.ndarray,
+    node_index: int, axis: int,
+    bins: np.ndarray) -> tuple[float, float]:
+
+    bestPos = 0.0
+    bestCost = 1e30
+
+    primitive_count = int(nodes[node_index]['primitive_count'])
+    first = int(nodes[node_index]['contents'])
+
+    for i in range(primitive_count):
+        testPos = centroids[ids[first + i], axis]
+        cost = evaluate_sah(
+            nodes, corners, centroids, ids, node_index, axis, testPos, bins)
+        if cost < bestCost:
+            bestPos = testPos
+            bestCost = cost
+
+    return (bestPos, bestCost)
+
+@njit(cache = True)
+def evaluate_sah(nodes: np.ndarray,
+    corners: np.ndarray,
+    centroids: np.ndarray,
+    ids: np.ndarray,
+    node_index: int, axis: int, split_position: float,
+    bins: np.ndarray) -> float:
+
+    #dummy left and right boxes sit at the end of the scratch space
+    dl_index = len(bins) - 2
+    dr_index = len(bins) - 1
+    node.reset_nodes(bins, dl_index, 2)
+
+    primitive_count = int(nodes[node_index]['primitive_count'])
+    first = int(nodes[node_index]['contents'])
+
+    for i in range(primitive_count):
+        index = ids[first + i]
+        if centroids[index, axis] < split_position:
+            grow(bins, dl_index, corners, index)
+            bins[dl_index]['primitive_count'] += 1
+        else:
+            grow(bins, dr_index, corners, index)
+            bins[dr_index]['primitive_count'] += 1
+
+    cost = get_cost(bins, dl_index) + get_cost(bins, dr_index)
+    if cost < 0:
+        cost = 1e30
+    return cost
+
+@njit(cache = True)
+def determine_best_split_bin(nodes: np.ndarray,
+    corners: np.ndarray,
+    centroids: np.ndarray,
+    ids: np.ndarray,
+    node_index: int, axis: int, bin_count: int,
+    bins: np.ndarray) -> tuple[float, float]:
+
+    node.reset_nodes(bins, 0, 3 * bin_count + 2)
+    build_bins(nodes, corners, centroids, ids, node_index, axis, bin_count, bins)
+    collect_bins(bins, bin_count)
+
+    low, high = get_bounds(nodes, node_index, axis)
+    scale = (high - low) / bin_count
+
+    #left box i holds bins 0..i, right box i + 1 holds bins i+1..end
+    bestPos = 0.0
+    bestCost = 1e30
+    for i in range(bin_count - 1):
+
+        cost = get_cost(bins, bin_count + i) \
+            + get_cost(bins, 2 * bin_count + i + 1)
+        if cost < bestCost:
+            bestPos = low + (i + 1) * scale
+            bestCost = cost
+
+    return (bestPos, bestCost)
+
+@njit(cache = True)
+def build_bins(nodes: np.ndarray,
+    corners: np.ndarray,
+    centroids: np.ndarray,
+    ids: np.ndarray,
+    node_index: int, axis: int, bin_count: int,
+    bins: np.ndarray) -> None:
+
+    low, high = get_bounds(nodes, node_index, axis)
+    bin_size = (high - low) / bin_count
+
+    primitive_count = int(nodes[node_index]['primitive_count'])
+    first = int(nodes[node_index]['contents'])
+
+    for i in range(primitive_count):
+        index = ids[first + i]
+        offset = centroids[index, axis] - low
+        bin_index = max(0, min(bin_count - 1, int(offset / bin_size)))
+        grow(bins, bin_index, corners, index)
+        bins[bin_index]['primitive_count'] += 1
+
+@njit(cache = True)
+def collect_bins(bins: np.ndarray, bin_count: int) -> None:
+    """
+        Sweep the bins from both ends, recording the running
+        left and right boxes after each bin.
+    """
+
+    # [bins -- left_bins -- right_bins -- dummy_left -- dummy_right]
+    dl_index = 3 * bin_count
+    dr_index = 3 * bin_count + 1
+
+    for i in range(bin_count):
+
+        merge(bins, dl_index, i)
+        copy_node(bins, bin_count + i, dl_index)
+
+        merge(bins, dr_index, bin_count - 1 - i)
+        copy_node(bins, 3 * bin_count - 1 - i, dr_index)
+
+@njit(cache = True)
+def object_split(nodes: np.ndarray,
+    corners: np.ndarray,
+    centroids: np.ndarray,
+    ids: np.ndarray,
+    parent_index: int, axis: int,
+    nodes_used: int, split_position: float) -> int:
+
+    primitive_count = int(nodes[parent_index]['primitive_count'])
+    contents = int(nodes[parent_index]['contents'])
+
+    #split group into halves
+    i = contents
+    j = i + primitive_count - 1
+    while i <= j:
+        if centroids[ids[i], axis] < split_position:
+            i += 1
+        else:
+            temp = ids[i]
+            ids[i] = ids[j]
+            ids[j] = temp
+            j -= 1
+
+    #create child nodes
+    left_count = i - contents
+    if (left_count == 0 or left_count == primitive_count):
+        return nodes_used
+
+    left_child_index = nodes_used
+    nodes_used += 1
+    node.reset_nodes(nodes, left_child_index, 1)
+    nodes[left_child_index]['contents'] = contents
+    nodes[left_child_index]['primitive_count'] = left_count
+    nodes[parent_index]['contents'] = left_child_index
+
+    right_child_index = nodes_used
+    nodes_used += 1
+    node.reset_nodes(nodes, right_child_index, 1)
+    nodes[right_child_index]['contents'] = i
+    nodes[right_child_index]['primitive_count'] = primitive_count - left_count
+
+    update_bounds(nodes, corners, ids, left_child_index)
+    update_bounds(nodes, corners, ids, right_child_index)
+
+    nodes[parent_index]['primitive_count'] = 0
+
+    return nodes_used
+#endregion
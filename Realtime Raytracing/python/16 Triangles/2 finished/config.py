@@ -6,5 +6,12 @@ import numpy as np
 import pyrr
 import time
 from PIL import Image, ImageOps
+from numba import njit
 
-np.random.seed(0)
\ No newline at end of file
+np.random.seed(0)
+
+data_type_bvh_node = np.dtype({
+    'names':   [   'min_x',    'min_y',    'min_z', 'primitive_count',    'max_x',    'max_y',    'max_z', 'contents'], 
+    'formats': [np.float32, np.float32, np.float32,          np.int32, np.float32, np.float32, np.float32,   np.int32],
+    'offsets': [         0,          4,          8,                12,         16,         20,         24,         28],
+    'itemsize': 32})
@@ -36,7 +36,7 @@ class Engine:
         self.screenQuad = screen_quad.ScreenQuad()
         self.colorBuffer = materials.Material(minDetail = 8, maxDetail = 1024)
 
-        self.triangleBuffer = buffer.Buffer(size = len(_scene.triangles), binding = 1, floatCount = 16, dtype=np.float32)
+        self.triangleBuffer = buffer.Buffer(size = _scene.triangle_count, binding = 1, floatCount = 16, dtype=np.float32)
         self.nodeBuffer = buffer.Buffer(size = _scene.nodes_used, binding = 2, floatCount = 8, dtype=np.float32)
         self.indexBuffer = buffer.Buffer(size = len(_scene.ids), binding = 3, floatCount = 1, dtype=np.int32)
 
@@ -85,16 +85,11 @@ class Engine:
 
         glUseProgram(self.rayTracerShader)
 
-        for i,_triangle in enumerate(scene.triangles):
-            self.triangleBuffer.recordTriangle(i, _triangle)
+        self.triangleBuffer.blit(scene.triangle_data)
 
-        for i in range(scene.nodes_used):
-            _node = scene.nodes[i]
-            if _node.min_corner is not None:
-                self.nodeBuffer.recordNode(i, _node)
+        self.nodeBuffer.blit(node.pack_nodes(scene.nodes[:scene.nodes_used]))
 
-        for i,_index in enumerate(scene.ids):
-            self.indexBuffer.recordSphereIndex(i, _index)
+        self.indexBuffer.blit(scene.ids)
 
     def prepareScene(self, scene: scene.Scene):
         """
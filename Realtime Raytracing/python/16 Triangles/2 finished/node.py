@@ -1,54 +1,61 @@
 from config import *
-import sphere
-import triangle
 
-class Node:
+@njit(cache = True)
+def make_nodes(count: int) -> np.ndarray:
 
+    nodes = np.zeros(count, dtype=data_type_bvh_node)
+    reset_nodes(nodes, 0, count)
+    
+    return nodes
+
+@njit(cache = True)
+def reset_nodes(nodes: np.ndarray, offset: int, count: int) -> None:
+
+    for i in range(count):
+
+        nodes[offset + i]['min_x'] = 1e10
+        nodes[offset + i]['min_y'] = 1e10
+        nodes[offset + i]['min_z'] = 1e10
+        nodes[offset + i]['primitive_count'] = 0
+        nodes[offset + i]['max_x'] = -1e10
+        nodes[offset + i]['max_y'] = -1e10
+        nodes[offset + i]['max_z'] = -1e10
+        nodes[offset + i]['contents'] = -1
+
+def pack_nodes(nodes: np.ndarray) -> np.ndarray:
+    """
+        Convert nodes to the shader's layout, where the
+        primitive count and contents are stored as floats.
+        node: (x_min, y_min, z_min, primitive_count) (x_max, y_max, z_max, contents)
+    """
+
+    packed = np.empty((len(nodes), 8), dtype=np.float32)
+    for i, field in enumerate(data_type_bvh_node.names):
+        packed[:, i] = nodes[field]
+    
+    return packed
 
-    def __init__(self):
-
-        self.min_corner = np.array([1e10, 1e10, 1e10], dtype=np.float32)
-        self.primitive_count = 0
-        self.max_corner = np.array([-1e10, -1e10, -1e10], dtype=np.float32)
-        self.contents = -1
+def print_node(node: np.record, index: int) -> None:
 
-    def grow(self, _triangle: triangle.Triangle) -> None:
+    min_corner = (node['min_x'], node['min_y'], node['min_z'])
+    max_corner = (node['max_x'], node['max_y'], node['max_z'])
+    primitive_count = int(node['primitive_count'])
+    contents = int(node['contents'])
 
-        for i in range(3):
-            
-            corner = _triangle.corners[i]
-            self.min_corner = np.minimum(self.min_corner, corner)
-            self.max_corner = np.maximum(self.max_corner, corner)
+    result = ""
+    if primitive_count == 0:
+        node_type = "Internal"
+    else:
+        node_type = "External"
     
-    def get_cost(self) -> float:
+    result += f"---- {node_type} Node: {index} ----\n"
 
-        return self.primitive_count * self.get_surface_area()
+    result += f"\t{min_corner} -> {max_corner}\n"
 
-    def get_surface_area(self) -> float:
-
-        e = self.max_corner - self.min_corner
-        return e[0] * e[1] + e[0] * e[2] + e[1] * e[2]
+    if node_type == "Internal":
+        result += f"\tLeft Child: {contents}, Right Child: {contents + 1}"
+    else:
+        result += f"\tPrimitive Count: {primitive_count}"
+        result += f"\tFirst Primitive: {contents}, Last Primitive: {contents + primitive_count - 1}"
     
-    def __str__(self) -> None:
-
-        result = ""
-        node_type = "Internal"
-        if self.primitive_count > 0:
-            node_type = "External"
-        
-        result += f"---- {node_type} Node ----\n"
-
-        result += f"\t({self.min_corner[0]}, {self.min_corner[1]}, {self.min_corner[2]})"
-        result += f" -> ({self.max_corner[0]}, {self.max_corner[1]}, {self.max_corner[2]})\n"
-
-        if node_type == "Internal":
-            self.primitive_count = 2
-            result += f"\tCost: {self.get_cost()}\n"
-            self.primitive_count = 0
-            result += f"\tLeft Child: {self.contents}, Right Child: {self.contents + 1}"
-        else:
-            result += f"\tPrimitive Count: {self.primitive_count}"
-            result += f"\tCost: {self.get_cost()}\n"
-            result += f"\tFirst Primitive: {self.contents}, Last Primitive: {self.contents + self.primitive_count - 1}"
-        
-        return result
+    print(result)
@@ -1,18 +1,88 @@
 from config import *
+import re
+#---- Packed Triangles               ----#
+# Triangles live in flat float32 arrays: #
+# corners (count, 3, 3) and colors       #
+# (count, 3), rather than one object     #
+# per triangle.                          #
+#----------------------------------------#
 
-class Triangle:
+def make_triangles(count: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Scatter random triangles through the scene,
+        returns their corners and colors.
+    """
 
+    centers = np.empty((count, 3), dtype=np.float32)
+    centers[:,0] = np.random.uniform(low = -95.0, high = 95.0, size = count)
+    centers[:,1] = np.random.uniform(low = -95.0, high = 95.0, size = count)
+    centers[:,2] = np.random.uniform(low = -15.0, high = 15.0, size = count)
 
-    def __init__(self, corners: list[list[float]], color: list[float]):
+    corners = centers[:, np.newaxis, :] \
+        + np.random.uniform(low = -3.0, high = 3.0, size = (count, 3, 3))
 
-        self.corners = [
-            np.array(corner, dtype=np.float32) for corner in corners]
-        
-        self.centroid = 0.333 * (
-            self.corners[0] + self.corners[1] + self.corners[2])
-        
-        ab = self.corners[1] - self.corners[0]
-        ac = self.corners[2] - self.corners[0]
-        self.normal = pyrr.vector.normalize(pyrr.vector3.cross(ab, ac))
+    colors = np.random.uniform(low = 0.0, high = 1.0, size = (count, 3))
 
-        self.color = color
\ No newline at end of file
+    return corners.astype(np.float32), colors.astype(np.float32)
+
+def load_obj(filepath: str) -> np.ndarray:
+    """
+        Read the faces of an obj file as triangles,
+        returns their corners. Polygons are split into fans.
+    """
+
+    with open(filepath, 'r') as f:
+        text = f.read()
+    
+    #let the regex engine and numpy do the parsing, not python loops
+    vertices = np.array(
+        re.findall(r"^v\s+(\S+)\s+(\S+)\s+(\S+)", text, re.MULTILINE), 
+        dtype=np.float32)
+    
+    face_lines = re.findall(r"^f\s+(.*)$", text, re.MULTILINE)
+    corner_counts = np.fromiter(
+        map(len, map(str.split, face_lines)), 
+        dtype=np.int64, count = len(face_lines))
+    #keep only the position index of each v/vt/vn corner
+    indices = np.array(
+        re.findall(r"(-?\d+)\S*", " ".join(face_lines)), 
+        dtype=np.int64)
+    
+    #obj indices start at 1, negative ones count back from the end
+    indices = np.where(indices > 0, indices - 1, indices + len(vertices))
+
+    #fan triangulate: face corners (0, i, i + 1) for i in 1..n-2
+    triangle_counts = corner_counts - 2
+    starts = np.cumsum(corner_counts) - corner_counts
+    face_of = np.repeat(np.arange(len(face_lines)), triangle_counts)
+    first_triangle = np.cumsum(triangle_counts) - triangle_counts
+    i = np.arange(len(face_of)) - first_triangle[face_of] + 1
+    start = starts[face_of]
+
+    faces = np.stack(
+        (indices[start], indices[start + i], indices[start + i + 1]), axis = 1)
+
+    return vertices[faces]
+
+def get_centroids(corners: np.ndarray) -> np.ndarray:
+
+    return corners.mean(axis = 1, dtype=np.float32)
+
+def pack_triangles(corners: np.ndarray, colors: np.ndarray) -> np.ndarray:
+    """
+        Lay triangles out as the shader expects, one row each:
+        (corner_a, r) (corner_b, g) (corner_c, b) (normal, _)
+    """
+
+    count = len(corners)
+    packed = np.zeros((count, 16), dtype=np.float32)
+
+    for j in range(3):
+        packed[:, 4 * j : 4 * j + 3] = corners[:, j]
+        packed[:, 4 * j + 3] = colors[:, j]
+    
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis = 1, keepdims = True)
+    packed[:, 12:15] = normals / np.maximum(lengths, 1e-12)
+
+    return packed
@@ -1,6 +1,7 @@
 from config import *
 import engine
 import scene
+import profiler
 
 class App:
     """
@@ -11,6 +12,12 @@ class App:
 
         self.screenWidth = 800
         self.screenHeight = 600
+        #if set, the profiler's last frames are written here on quit,
+        #as a chrome trace (.json) or a table (.csv)
+        self.profileFilepath = None
+        #trace moving instances of a few meshes under a two level
+        #tree, rather than the flat tree of moving spheres
+        self.instancedScene = False
 
         self.set_up_glfw()
 
@@ -49,8 +56,10 @@ class App:
             Make everything needed by the program.
         """
 
-        self.scene = scene.Scene()
-        self.graphicsEngine = engine.Engine(self.screenWidth, self.screenHeight, self.scene)
+        self.profiler = profiler.Profiler()
+        self.scene = scene.Scene(self.profiler, instanced = self.instancedScene)
+        self.graphicsEngine = engine.Engine(
+            self.screenWidth, self.screenHeight, self.scene, self.profiler)
     
     def set_up_input_systems(self) -> None:
         """
@@ -100,6 +109,7 @@ class App:
 
         running = True
         while (running):
+            self.profiler.begin_frame()
             #events
             if glfw.window_should_close(self.window) \
                 or glfw.get_key(self.window, GLFW_CONSTANTS.GLFW_KEY_ESCAPE) == GLFW_CONSTANTS.GLFW_PRESS:
@@ -117,6 +127,7 @@ class App:
 
             #timing
             self.calculateFramerate()
+            self.profiler.end_frame()
         self.quit()
     
     def handleKeys(self) -> None:
@@ -184,5 +195,11 @@ class App:
             For some reason, the graphics engine's destructor throws weird errors.
         """
         
+        if self.profileFilepath is not None:
+            if self.profileFilepath.endswith(".csv"):
+                self.profiler.export_csv(self.profileFilepath)
+            else:
+                self.profiler.export_chrome_trace(self.profileFilepath)
+        
         #self.graphicsEngine.destroy()
         glfw.terminate()
\ No newline at end of file
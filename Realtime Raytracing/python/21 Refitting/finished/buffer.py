@@ -1,4 +1,5 @@
 from config import *
+import ctypes
 
 class Buffer:
 
@@ -8,6 +9,8 @@ class Buffer:
         self.binding = binding
 
         self.hostMemory = np.zeros(size, dtype=dtype)
+        #element ranges written since the last upload, [first, last)
+        self.dirtyRanges: list[tuple[int, int]] = []
 
         self.deviceMemory = glGenBuffers(1)
         glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.deviceMemory)
@@ -16,17 +19,57 @@ class Buffer:
             self.hostMemory, GL_DYNAMIC_STORAGE_BIT)
         glBindBufferBase(GL_SHADER_STORAGE_BUFFER, binding, self.deviceMemory)
     
-    def blit(self, data: np.ndarray) -> None:
+    def attach(self, data: np.ndarray) -> None:
+        """
+            Upload straight from the given array from now on,
+            rather than through a copy. Falls back to a blit if
+            the array can't be used in place.
+        """
+
+        if data.dtype == self.hostMemory.dtype \
+            and data.flags['C_CONTIGUOUS'] \
+            and len(data) == self.size:
+            self.hostMemory = data
+            self.markDirty(0, self.size)
+        else:
+            self.blit(data)
+    
+    def blit(self, data: np.ndarray, first: int = 0) -> None:
+
+        count = len(data)
+        self.hostMemory[first:first + count] = data[:]
+        self.markDirty(first, count)
+    
+    def markDirty(self, first: int, count: int) -> None:
+        """
+            Flag elements as changed, they'll be sent on the next upload.
+        """
 
-        self.hostMemory[:] = data[:]
+        if count > 0:
+            self.dirtyRanges.append((first, min(first + count, self.size)))
     
     def readFrom(self) -> None:
         """
-            Upload the CPU data to the buffer, then arm it for reading.
+            Upload any changed CPU data to the buffer, then arm it for reading.
         """
 
         glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.deviceMemory)
-        glBufferSubData(GL_SHADER_STORAGE_BUFFER, 0, self.hostMemory.nbytes, self.hostMemory)
+
+        #merge overlapping ranges, then send each span once
+        itemsize = self.hostMemory.itemsize
+        spans = []
+        for first, last in sorted(self.dirtyRanges):
+            if spans and first <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], last)
+            else:
+                spans.append([first, last])
+        self.dirtyRanges.clear()
+
+        for first, last in spans:
+            glBufferSubData(
+                GL_SHADER_STORAGE_BUFFER, first * itemsize, 
+                (last - first) * itemsize, self.hostMemory[first:last])
+
         glBindBufferBase(GL_SHADER_STORAGE_BUFFER, self.binding, self.deviceMemory)
     
     def destroy(self) -> None:
@@ -34,4 +77,204 @@ class Buffer:
             Free the memory.
         """
 
-        glDeleteBuffers(1, (self.deviceMemory,))
\ No newline at end of file
+        glDeleteBuffers(1, (self.deviceMemory,))
+
+class PersistentBuffer:
+    """
+        A ring of regions in one persistently mapped buffer.
+        Each frame writes the next region while the GPU may still be
+        reading the others, a fence per region stops us overwriting
+        one that's in flight.
+    """
+
+    def __init__(self, size: int, binding: int, dtype: np.dtype, regionCount: int = 3):
+
+        self.size = size
+        self.binding = binding
+        self.dtype = np.dtype(dtype)
+        self.regionCount = regionCount
+        self.region = regionCount - 1
+
+        #regions must start on an aligned offset
+        alignment = int(glGetIntegerv(GL_SHADER_STORAGE_BUFFER_OFFSET_ALIGNMENT))
+        self.regionBytes = size * self.dtype.itemsize
+        self.regionStride = -(-self.regionBytes // alignment) * alignment
+
+        #write only: regions are never read back on the CPU, reading
+        #this memory is undefined in GL and slow where it works
+        flags = GL_MAP_WRITE_BIT | GL_MAP_PERSISTENT_BIT | GL_MAP_COHERENT_BIT
+        self.deviceMemory = glGenBuffers(1)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.deviceMemory)
+        glBufferStorage(
+            GL_SHADER_STORAGE_BUFFER, self.regionStride * regionCount, 
+            None, flags)
+        address = glMapBufferRange(
+            GL_SHADER_STORAGE_BUFFER, 0, self.regionStride * regionCount, flags)
+        address = ctypes.cast(address, ctypes.c_void_p).value
+        
+        #a numpy view over each region of the mapping
+        self.regions: list[np.ndarray] = []
+        for i in range(regionCount):
+            raw = (ctypes.c_ubyte * self.regionBytes).from_address(
+                address + i * self.regionStride)
+            self.regions.append(np.frombuffer(raw, dtype=self.dtype))
+        
+        self.fences = [None] * regionCount
+        #element ranges each region is missing, [first, last)
+        self.dirtyRanges: list[list[tuple[int, int]]] = [[] for _ in range(regionCount)]
+        self.source: np.ndarray = None
+        #whether map has already moved on for the coming readFrom
+        self.mapped = False
+
+    def attach(self, data: np.ndarray) -> None:
+        """
+            Stream from the given array, every region needs all of it.
+        """
+
+        self.source = data
+        self.markDirty(0, self.size)
+    
+    def markDirty(self, first: int, count: int) -> None:
+        """
+            Flag elements as changed, each region picks them up
+            the next time it's written.
+        """
+
+        if count > 0:
+            last = min(first + count, self.size)
+            for ranges in self.dirtyRanges:
+                ranges.append((first, last))
+
+    def map(self) -> np.ndarray:
+        """
+            Move on to the next region, waiting for the GPU to be done
+            with it, and return a view for writing into directly.
+            The view must only be written, never read.
+            The region is brought up to date with the source first,
+            the next readFrom arms it rather than moving on again.
+        """
+
+        self.region = (self.region + 1) % self.regionCount
+
+        fence = self.fences[self.region]
+        if fence is not None:
+            while glClientWaitSync(
+                fence, GL_SYNC_FLUSH_COMMANDS_BIT, 1000000) == GL_TIMEOUT_EXPIRED:
+                pass
+            glDeleteSync(fence)
+            self.fences[self.region] = None
+        
+        self.sync()
+        self.mapped = True
+        
+        return self.regions[self.region]
+    
+    def sync(self) -> None:
+        """
+            Copy the source's changes into the current region.
+        """
+
+        target = self.regions[self.region]
+
+        if self.source is not None:
+            for first, last in self.dirtyRanges[self.region]:
+                target[first:last] = self.source[first:last]
+        self.dirtyRanges[self.region].clear()
+    
+    def readFrom(self) -> None:
+        """
+            Copy the source's changes into the next region, or the one
+            map handed out, then arm it for reading.
+        """
+
+        if not self.mapped:
+            self.map()
+        self.sync()
+        self.mapped = False
+
+        glBindBufferRange(
+            GL_SHADER_STORAGE_BUFFER, self.binding, self.deviceMemory, 
+            self.region * self.regionStride, self.regionBytes)
+    
+    def fence(self) -> None:
+        """
+            Mark the end of the GPU's work on the current region,
+            call after the dispatch that reads it.
+        """
+
+        self.fences[self.region] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+    
+    def destroy(self) -> None:
+        """
+            Free the memory.
+        """
+
+        for fence in self.fences:
+            if fence is not None:
+                glDeleteSync(fence)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.deviceMemory)
+        glUnmapBuffer(GL_SHADER_STORAGE_BUFFER)
+        glDeleteBuffers(1, (self.deviceMemory,))
+
+class CounterBuffer:
+    """
+        uint32 counters written by the shader, which the CPU only
+        clears and, when asked, reads back.
+    """
+
+    def __init__(self, size: int, binding: int):
+
+        self.size = size
+        self.binding = binding
+
+        self.hostMemory = np.zeros(size, dtype=np.uint32)
+
+        self.deviceMemory = glGenBuffers(1)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.deviceMemory)
+        glBufferStorage(
+            GL_SHADER_STORAGE_BUFFER, self.hostMemory.nbytes, 
+            self.hostMemory, GL_DYNAMIC_STORAGE_BIT)
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, binding, self.deviceMemory)
+    
+    def clear(self, first: int, count: int) -> None:
+        """
+            Zero a range of counters on the GPU.
+        """
+
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.deviceMemory)
+        glClearBufferSubData(
+            GL_SHADER_STORAGE_BUFFER, GL_R32UI, 4 * first, 4 * count, 
+            GL_RED_INTEGER, GL_UNSIGNED_INT, None)
+    
+    def readBack(self, first: int, count: int) -> np.ndarray:
+        """
+            Copy a range of counters into hostMemory and return it,
+            this waits for the GPU to finish writing them.
+        """
+
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.deviceMemory)
+        glGetBufferSubData(
+            GL_SHADER_STORAGE_BUFFER, 4 * first, 4 * count, 
+            self.hostMemory[first:first + count])
+        
+        return self.hostMemory[first:first + count]
+    
+    def write(self, first: int, data: np.ndarray) -> None:
+        """
+            Set a range of counters from the CPU.
+        """
+
+        count = len(data)
+        self.hostMemory[first:first + count] = data
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.deviceMemory)
+        glBufferSubData(
+            GL_SHADER_STORAGE_BUFFER, 4 * first, 4 * count, 
+            self.hostMemory[first:first + count])
+    
+    def readFrom(self) -> None:
+
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, self.binding, self.deviceMemory)
+    
+    def destroy(self) -> None:
+
+        glDeleteBuffers(1, (self.deviceMemory,))
@@ -8,28 +8,198 @@ import node
 
 #---- BVH Building                   ----#
 #region
+@njit(cache = True)
 def build_bvh(
     nodes: np.ndarray, 
     spheres: np.ndarray,
     sphere_ids: np.ndarray,
-    sphere_count: int) -> int:
+    sphere_count: int,
+    bin_count: int = 16,
+    all_axes: bool = False) -> int:
+    """
+        Build the bvh from scratch, returns the number of nodes used.
+
+        Nodes are split depth first off an explicit work stack,
+        so the layout matches the old recursive build.
+        Setting all_axes tests every axis at each split rather
+        than just the longest, which builds slower but traces faster.
+    """
 
     #Configure root node
     #sphere count
+    node.reset_nodes(nodes, 0, 1)
     nodes[0]['sphere_count'] = sphere_count
     nodes[0]['contents'] = 0
 
     #preallocate memory:
     # [bins -- left_bins -- right_bins -- dummy_left -- dummy_right]
-    bins = node.make_nodes(50)
+    bins = node.make_nodes(3 * bin_count + 2)
+
+    update_bounds(nodes, spheres, sphere_ids, 0)
+    
+    return build_subtree(
+        nodes, spheres, sphere_ids, 0, sphere_count, 1, bins,
+        bin_count, all_axes)
+
+@njit(cache = True)
+def build_subtree(
+    nodes: np.ndarray, 
+    spheres: np.ndarray,
+    sphere_ids: np.ndarray,
+    root_index: int,
+    sphere_count: int,
+    nodes_used: int,
+    bins: np.ndarray,
+    bin_count: int = 16,
+    all_axes: bool = False) -> int:
+    """
+        Fully subdivide the (already bounded) node at root_index,
+        children are allocated from nodes_used onwards.
+        Returns the updated node count.
+    """
+
+    #each split pushes two children, the stack
+    #can't grow deeper than the number of leaves
+    stack = np.zeros(sphere_count + 1, dtype = np.int32)
+    stack_pos = 0
+
+    stack[stack_pos] = root_index
+    stack_pos += 1
+
+    while stack_pos > 0:
+
+        stack_pos -= 1
+        node_index = stack[stack_pos]
+
+        left_child_index = nodes_used
+        nodes_used = subdivide(
+            nodes, spheres, sphere_ids, 
+            node_index, nodes_used, bins,
+            bin_count, all_axes)
+        
+        if nodes_used > left_child_index:
+            #push right first so the left subtree is built first
+            stack[stack_pos] = left_child_index + 1
+            stack[stack_pos + 1] = left_child_index
+            stack_pos += 2
+    
+    return nodes_used
+
+@njit(parallel = True, cache = True)
+def build_bvh_parallel(
+    nodes: np.ndarray, 
+    spheres: np.ndarray,
+    sphere_ids: np.ndarray,
+    sphere_count: int,
+    bin_count: int = 16,
+    all_axes: bool = False) -> int:
+    """
+        Build the bvh from scratch across all available threads,
+        returns the number of nodes used.
+
+        The top of the tree is split breadth first, testing all
+        three axes in parallel, until every open node is small
+        enough to be handed to a worker as an independent subtree.
+        Subtrees are built into a scratch array, then packed
+        in behind the top nodes so there are no gaps
+        and every child still comes after its parent.
+    """
 
+    #Configure root node
+    node.reset_nodes(nodes, 0, 1)
+    nodes[0]['sphere_count'] = sphere_count
+    nodes[0]['contents'] = 0
     update_bounds(nodes, spheres, sphere_ids, 0)
-    nodes_used = subdivide(
-        nodes, spheres, sphere_ids, 
-        0, 1, bins)
+
+    #cut the tree into a few hundred subtrees, enough
+    #to keep any number of threads evenly loaded
+    task_size = max(256, sphere_count // 256)
+
+    #one set of scratch bins per axis
+    bins = node.make_nodes(3 * (3 * bin_count + 2))
+
+    #---- Top levels: split breadth first ----#
+    queue = np.zeros(sphere_count + 1, dtype = np.int32)
+    tasks = np.zeros(sphere_count + 1, dtype = np.int32)
+    head = 0
+    tail = 1
+    task_count = 0
+    nodes_used = 1
+    while head < tail:
+
+        node_index = queue[head]
+        head += 1
+
+        if nodes[node_index]['sphere_count'] <= task_size:
+            tasks[task_count] = node_index
+            task_count += 1
+            continue
+
+        left_child_index = nodes_used
+        nodes_used = subdivide_all_axes(
+            nodes, spheres, sphere_ids, 
+            node_index, nodes_used, bins, bin_count)
+        
+        if nodes_used > left_child_index:
+            queue[tail] = left_child_index
+            queue[tail + 1] = left_child_index + 1
+            tail += 2
     
+    #---- Subtrees: one worker each ----#
+    #a subtree over n spheres needs fewer than 2n nodes
+    offsets = np.zeros(task_count + 1, dtype = np.int64)
+    for i in range(task_count):
+        offsets[i + 1] = offsets[i] + 2 * nodes[tasks[i]]['sphere_count']
+    scratch = node.make_nodes(offsets[task_count])
+    used = np.zeros(task_count, dtype = np.int64)
+
+    for i in prange(task_count):
+        root = offsets[i]
+        copy_node(nodes, tasks[i], scratch, root, 0)
+        task_bins = node.make_nodes(3 * bin_count + 2)
+        used[i] = build_subtree(
+            scratch, spheres, sphere_ids, root, 
+            int(scratch[root]['sphere_count']), root + 1, 
+            task_bins, bin_count, all_axes) - root - 1
+
+    #---- Pack subtrees behind the top levels ----#
+    destinations = np.zeros(task_count, dtype = np.int64)
+    for i in range(task_count):
+        destinations[i] = nodes_used
+        nodes_used += used[i]
+
+    for i in prange(task_count):
+        root = offsets[i]
+        shift = destinations[i] - root - 1
+        copy_node(scratch, root, nodes, tasks[i], shift)
+        for j in range(used[i]):
+            copy_node(scratch, root + 1 + j, nodes, destinations[i] + j, shift)
+
     return nodes_used
 
+@njit(cache = True)
+def copy_node(
+    src: np.ndarray, src_index: int, 
+    dst: np.ndarray, dst_index: int, 
+    shift: int) -> None:
+    """
+        Copy a node between arrays, moving internal nodes'
+        child index by the given shift.
+    """
+
+    dst[dst_index]['min_x'] = src[src_index]['min_x']
+    dst[dst_index]['min_y'] = src[src_index]['min_y']
+    dst[dst_index]['min_z'] = src[src_index]['min_z']
+    dst[dst_index]['sphere_count'] = src[src_index]['sphere_count']
+    dst[dst_index]['max_x'] = src[src_index]['max_x']
+    dst[dst_index]['max_y'] = src[src_index]['max_y']
+    dst[dst_index]['max_z'] = src[src_index]['max_z']
+    contents = src[src_index]['contents']
+    if src[src_index]['sphere_count'] == 0:
+        contents = contents + shift
+    dst[dst_index]['contents'] = contents
+
+@njit(cache = True)
 def update_bounds(
     nodes: np.ndarray, 
     spheres: np.ndarray, 
@@ -61,12 +231,22 @@ def update_bounds(
         nodes[node_index]['max_y'] = max(nodes[node_index]['max_y'], s_y + s_r)
         nodes[node_index]['max_z'] = max(nodes[node_index]['max_z'], s_z + s_r)
 
+@njit(cache = True)
 def subdivide(nodes: np.ndarray, 
     spheres: np.ndarray, 
     sphere_ids: np.ndarray,
     node_index: int,
     nodes_used: int,
-    bins: np.ndarray) -> int:
+    bins: np.ndarray,
+    bin_count: int = 16,
+    all_axes: bool = False) -> int:
+    """
+        Attempt to split a single node, returns the updated node count.
+        Any children are created and bounded but not subdivided.
+
+        Only the longest axis is tested unless all_axes is set.
+        bins must hold 3 * bin_count + 2 scratch nodes.
+    """
 
     sphere_count = int(nodes[node_index]['sphere_count'])
     if sphere_count < 2:
@@ -76,39 +256,104 @@ def subdivide(nodes: np.ndarray,
     e_y = nodes[node_index]['max_y'] - nodes[node_index]['min_y']
     e_z = nodes[node_index]['max_z'] - nodes[node_index]['min_z']
     e = e_x
-    bestAxis = 0
+    longestAxis = 0
     if e_y > e:
-        bestAxis = 1
+        longestAxis = 1
         e = e_y
     if e_z > e:
-        bestAxis = 2
+        longestAxis = 2
         e = e_z
     
-    bin_count = 16
+    bestAxis = longestAxis
+    bestPos = 0.0
+    bestCost = 1e30
+    for axis in range(3):
+
+        if axis != longestAxis:
+            if not all_axes:
+                continue
+            extent = e_x
+            if axis == 1:
+                extent = e_y
+            elif axis == 2:
+                extent = e_z
+            if extent <= 0:
+                continue
     
-    if sphere_count >= bin_count:
-        pos, cost = determine_best_split_bin(
-            nodes, spheres, sphere_ids, 
-            node_index, bestAxis, bin_count,
-            bins)
-    else:
-        pos, cost = determine_best_split_full(
-            nodes, spheres, sphere_ids, 
-            node_index, bestAxis, bins)
-    """
-    pos, cost = determine_best_split_bin(
-        nodes, spheres, sphere_ids, 
-        node_index, bestAxis, bin_count,
+        if sphere_count >= bin_count:
+            pos, cost = determine_best_split_bin(
+                nodes, spheres, sphere_ids, 
+                node_index, axis, bin_count,
+                bins)
+        else:
+            pos, cost = determine_best_split_full(
+                nodes, spheres, sphere_ids, 
+                node_index, axis, bins)
+        
+        if cost < bestCost:
+            bestAxis = axis
+            bestPos = pos
+            bestCost = cost
+
+    node_cost = sphere_count * (e_x * e_y + e_y * e_z + e_x * e_z)
+    
+    if bestCost >= node_cost:
+        return nodes_used
+
+    return object_split(
+        nodes, spheres, sphere_ids, node_index, bestAxis, nodes_used, bestPos,
         bins)
+
+@njit(parallel = True, cache = True)
+def subdivide_all_axes(nodes: np.ndarray, 
+    spheres: np.ndarray, 
+    sphere_ids: np.ndarray,
+    node_index: int,
+    nodes_used: int,
+    bins: np.ndarray,
+    bin_count: int = 16) -> int:
     """
+        Attempt to split a large node, testing each axis on its own
+        thread. bins must hold three sets of 3 * bin_count + 2
+        scratch nodes. Returns the updated node count.
+    """
+
+    sphere_count = int(nodes[node_index]['sphere_count'])
+    bin_size = 3 * bin_count + 2
+    
+    e_x = nodes[node_index]['max_x'] - nodes[node_index]['min_x']
+    e_y = nodes[node_index]['max_y'] - nodes[node_index]['min_y']
+    e_z = nodes[node_index]['max_z'] - nodes[node_index]['min_z']
+
+    positions = np.zeros(3, dtype = np.float64)
+    costs = np.full(3, 1e30, dtype = np.float64)
+    for axis in prange(3):
+        extent = e_x
+        if axis == 1:
+            extent = e_y
+        elif axis == 2:
+            extent = e_z
+        if extent > 0:
+            pos, cost = determine_best_split_bin(
+                nodes, spheres, sphere_ids, 
+                node_index, axis, bin_count,
+                bins[bin_size * axis : bin_size * (axis + 1)])
+            positions[axis] = pos
+            costs[axis] = cost
+    
+    bestAxis = 0
+    for axis in range(1, 3):
+        if costs[axis] < costs[bestAxis]:
+            bestAxis = axis
+
     node_cost = sphere_count * (e_x * e_y + e_y * e_z + e_x * e_z)
     
-    if cost >= node_cost:
+    if costs[bestAxis] >= node_cost:
         return nodes_used
 
     return object_split(
-        nodes, spheres, sphere_ids, node_index, bestAxis, nodes_used, pos,
-        bins)
+        nodes, spheres, sphere_ids, node_index, bestAxis, nodes_used, 
+        positions[bestAxis], bins)
 
 @njit(cache=True)
 def determine_best_split_full(nodes: np.ndarray, 
@@ -149,23 +394,27 @@ def evaluate_sah(nodes: np.ndarray,
     node_index: int, axis: int, split_position: float,
     bins: np.ndarray) -> float:
 
-    bins[48]['min_x'] = 1e10
-    bins[48]['min_y'] = 1e10
-    bins[48]['min_z'] = 1e10
-    bins[48]['sphere_count'] = 0
-    bins[48]['max_x'] = -1e10
-    bins[48]['max_y'] = -1e10
-    bins[48]['max_z'] = -1e10
-    bins[48]['contents'] = -1
-
-    bins[49]['min_x'] = 1e10
-    bins[49]['min_y'] = 1e10
-    bins[49]['min_z'] = 1e10
-    bins[49]['sphere_count'] = 0
-    bins[49]['max_x'] = -1e10
-    bins[49]['max_y'] = -1e10
-    bins[49]['max_z'] = -1e10
-    bins[49]['contents'] = -1
+    #dummy left and right boxes sit at the end of the scratch space
+    dl_index = len(bins) - 2
+    dr_index = len(bins) - 1
+
+    bins[dl_index]['min_x'] = 1e10
+    bins[dl_index]['min_y'] = 1e10
+    bins[dl_index]['min_z'] = 1e10
+    bins[dl_index]['sphere_count'] = 0
+    bins[dl_index]['max_x'] = -1e10
+    bins[dl_index]['max_y'] = -1e10
+    bins[dl_index]['max_z'] = -1e10
+    bins[dl_index]['contents'] = -1
+
+    bins[dr_index]['min_x'] = 1e10
+    bins[dr_index]['min_y'] = 1e10
+    bins[dr_index]['min_z'] = 1e10
+    bins[dr_index]['sphere_count'] = 0
+    bins[dr_index]['max_x'] = -1e10
+    bins[dr_index]['max_y'] = -1e10
+    bins[dr_index]['max_z'] = -1e10
+    bins[dr_index]['contents'] = -1
 
     sphere_count = int(nodes[node_index]['sphere_count'])
     contents = int(nodes[node_index]['contents'])
@@ -186,33 +435,33 @@ def evaluate_sah(nodes: np.ndarray,
         
         if s_pos < split_position:
             #Grow left box
-            bins[48]['min_x'] = min(bins[48]['min_x'], s_x - s_r)
-            bins[48]['min_y'] = min(bins[48]['min_y'], s_y - s_r)
-            bins[48]['min_z'] = min(bins[48]['min_z'], s_z - s_r)
-            bins[48]['sphere_count'] = bins[48]['sphere_count'] + 1
-            bins[48]['max_x'] = max(bins[48]['max_x'], s_x + s_r)
-            bins[48]['max_y'] = max(bins[48]['max_y'], s_y + s_r)
-            bins[48]['max_z'] = max(bins[48]['max_z'], s_z + s_r)
+            bins[dl_index]['min_x'] = min(bins[dl_index]['min_x'], s_x - s_r)
+            bins[dl_index]['min_y'] = min(bins[dl_index]['min_y'], s_y - s_r)
+            bins[dl_index]['min_z'] = min(bins[dl_index]['min_z'], s_z - s_r)
+            bins[dl_index]['sphere_count'] = bins[dl_index]['sphere_count'] + 1
+            bins[dl_index]['max_x'] = max(bins[dl_index]['max_x'], s_x + s_r)
+            bins[dl_index]['max_y'] = max(bins[dl_index]['max_y'], s_y + s_r)
+            bins[dl_index]['max_z'] = max(bins[dl_index]['max_z'], s_z + s_r)
         else:
             #Grow right box
-            bins[49]['min_x'] = min(bins[49]['min_x'], s_x - s_r)
-            bins[49]['min_y'] = min(bins[49]['min_y'], s_y - s_r)
-            bins[49]['min_z'] = min(bins[49]['min_z'], s_z - s_r)
-            bins[49]['sphere_count'] = bins[49]['sphere_count'] + 1
-            bins[49]['max_x'] = max(bins[49]['max_x'], s_x + s_r)
-            bins[49]['max_y'] = max(bins[49]['max_y'], s_y + s_r)
-            bins[49]['max_z'] = max(bins[49]['max_z'], s_z + s_r)
+            bins[dr_index]['min_x'] = min(bins[dr_index]['min_x'], s_x - s_r)
+            bins[dr_index]['min_y'] = min(bins[dr_index]['min_y'], s_y - s_r)
+            bins[dr_index]['min_z'] = min(bins[dr_index]['min_z'], s_z - s_r)
+            bins[dr_index]['sphere_count'] = bins[dr_index]['sphere_count'] + 1
+            bins[dr_index]['max_x'] = max(bins[dr_index]['max_x'], s_x + s_r)
+            bins[dr_index]['max_y'] = max(bins[dr_index]['max_y'], s_y + s_r)
+            bins[dr_index]['max_z'] = max(bins[dr_index]['max_z'], s_z + s_r)
     
-    l_x = bins[48]['max_x'] - bins[48]['min_x']
-    l_y = bins[48]['max_y'] - bins[48]['min_y']
-    l_z = bins[48]['max_z'] - bins[48]['min_z']
-    l_c = int(bins[48]['sphere_count'])
+    l_x = bins[dl_index]['max_x'] - bins[dl_index]['min_x']
+    l_y = bins[dl_index]['max_y'] - bins[dl_index]['min_y']
+    l_z = bins[dl_index]['max_z'] - bins[dl_index]['min_z']
+    l_c = int(bins[dl_index]['sphere_count'])
 
     #unpack right box
-    r_x = bins[49]['max_x'] - bins[49]['min_x']
-    r_y = bins[49]['max_y'] - bins[49]['min_y']
-    r_z = bins[49]['max_z'] - bins[49]['min_z']
-    r_c = int(bins[49]['sphere_count'])
+    r_x = bins[dr_index]['max_x'] - bins[dr_index]['min_x']
+    r_y = bins[dr_index]['max_y'] - bins[dr_index]['min_y']
+    r_z = bins[dr_index]['max_z'] - bins[dr_index]['min_z']
+    r_c = int(bins[dr_index]['sphere_count'])
 
     cost = l_c * (l_x * l_y + l_y * l_z + l_x * l_z) \
         + r_c * (r_x * r_y + r_y * r_z + r_x * r_z)
@@ -228,14 +477,14 @@ def determine_best_split_bin(nodes: np.ndarray,
     node_index: int, axis: int, bin_count: int,
     bins: np.ndarray) -> tuple[float, float]:
     
-    node.reset_nodes(bins, 0, 50)
+    node.reset_nodes(bins, 0, 3 * bin_count + 2)
     build_bins(nodes, spheres, sphere_ids, node_index, bin_count, axis, bins)
     collect_bins(bins, bin_count)
 
     _node = nodes[node_index]
 
     bestPos = 0
-    bestCost = 1e10
+    bestCost = 1e30
 
     testPos = _node['min_x']
     extent = _node['max_x'] - testPos
@@ -246,10 +495,11 @@ def determine_best_split_bin(nodes: np.ndarray,
         testPos = _node['min_z']
         extent = _node['max_z'] - testPos
     
+    #left box i holds bins 0..i, right box i + 1 holds bins i+1..end
     scale = extent / bin_count
-    left_index = 16
-    right_index = 32
-    for i in range(bin_count):
+    left_index = bin_count
+    right_index = 2 * bin_count + 1
+    for i in range(bin_count - 1):
 
         #unpack left box
         left_bin = bins[left_index]
@@ -330,14 +580,17 @@ def build_bins(nodes: np.ndarray,
 def collect_bins(bins: np.ndarray, 
     bin_count: int) -> None:
 
-    dl_index = 48
-    dr_index = 49
+    # [bins -- left_bins -- right_bins -- dummy_left -- dummy_right]
+    left_offset = bin_count
+    right_offset = 2 * bin_count
+    dl_index = 3 * bin_count
+    dr_index = 3 * bin_count + 1
 
     for i in range(bin_count):
 
         #get bin info
         bin_index = i
-        left_index = (i + 16)
+        left_index = i + left_offset
         b_min_x = bins[bin_index]['min_x']
         b_min_y = bins[bin_index]['min_y']
         b_min_z = bins[bin_index]['min_z']
@@ -365,7 +618,7 @@ def collect_bins(bins: np.ndarray,
 
         #get bin info
         bin_index = bin_count - 1 - i
-        right_index = (bin_count - 1 - i + 32)
+        right_index = bin_count - 1 - i + right_offset
         b_min_x = bins[bin_index]['min_x']
         b_min_y = bins[bin_index]['min_y']
         b_min_z = bins[bin_index]['min_z']
@@ -391,6 +644,7 @@ def collect_bins(bins: np.ndarray,
         bins[right_index]['max_y'] = bins[dr_index]['max_y']
         bins[right_index]['max_z'] = bins[dr_index]['max_z']
 
+@njit(cache = True)
 def object_split(nodes: np.ndarray, 
     spheres: np.ndarray, 
     sphere_ids: np.ndarray, 
@@ -429,19 +683,19 @@ def object_split(nodes: np.ndarray,
     
     left_child_index = nodes_used
     nodes_used += 1
+    node.reset_nodes(nodes, left_child_index, 1)
     nodes[left_child_index]['contents'] = contents
     nodes[left_child_index]['sphere_count'] = left_count
     nodes[parent_index]['contents'] = left_child_index
     
     right_child_index = nodes_used
     nodes_used += 1
+    node.reset_nodes(nodes, right_child_index, 1)
     nodes[right_child_index]['contents'] = i
     nodes[right_child_index]['sphere_count'] = sphere_count - left_count
 
     update_bounds(nodes, spheres, sphere_ids, left_child_index)
-    nodes_used = subdivide(nodes, spheres, sphere_ids, left_child_index, nodes_used, bins)
     update_bounds(nodes, spheres, sphere_ids, right_child_index)
-    nodes_used = subdivide(nodes, spheres, sphere_ids, right_child_index, nodes_used, bins)
 
     nodes[parent_index]['sphere_count'] = 0
 
@@ -451,63 +705,223 @@ def object_split(nodes: np.ndarray,
 #region
 @njit(cache = True)
 def refit_bvh(nodes: np.ndarray, 
-    spheres: np.ndarray,
+    columns: np.ndarray,
     sphere_ids: np.ndarray,
-    node_count: int) -> None:
+    node_count: int) -> float:
+    """
+        Refit every node, returns the tree's summed node cost
+        (see summed_cost) so its quality can be tracked for free.
+
+        Spheres are read from columns, rows x, y, z and radius
+        first, as sphere.make_columns or sphere.record_columns give.
+    """
 
+    cost = 0.0
     i = node_count - 1
     for _ in range(node_count):
         
-        #Fetch node info
-        _node = nodes[i]
-        count = int(_node['sphere_count'])
-        first = int(_node['contents'])
-
-        #reset node bounds
-        nodes[i]['min_x'] = 1e10
-        nodes[i]['min_y'] = 1e10
-        nodes[i]['min_z'] = 1e10
-        nodes[i]['max_x'] = -1e10
-        nodes[i]['max_y'] = -1e10
-        nodes[i]['max_z'] = -1e10
+        refit_node(nodes, columns, sphere_ids, i)
+        cost += node_cost(nodes, i)
+        i = i - 1
+    
+    return cost
+
+@njit(cache = True)
+def refit_node(nodes: np.ndarray, 
+    columns: np.ndarray,
+    sphere_ids: np.ndarray,
+    i: int) -> None:
+    """
+        Recompute one node's bounds from its spheres' columns
+        or its children.
+    """
+
+    #Fetch node info
+    _node = nodes[i]
+    count = int(_node['sphere_count'])
+    first = int(_node['contents'])
+
+    #reset node bounds
+    nodes[i]['min_x'] = 1e10
+    nodes[i]['min_y'] = 1e10
+    nodes[i]['min_z'] = 1e10
+    nodes[i]['max_x'] = -1e10
+    nodes[i]['max_y'] = -1e10
+    nodes[i]['max_z'] = -1e10
+
+    if count > 0:
+        #Exernal node, check spheres
+        for j in range(count):
+
+            sphere_index = sphere_ids[first + j]
+
+            #grab sphere info
+            s_x = columns[0, sphere_index]
+            s_y = columns[1, sphere_index]
+            s_z = columns[2, sphere_index]
+            s_r = columns[3, sphere_index]
+
+            #find new minimum
+            nodes[i]['min_x'] = min(nodes[i]['min_x'], s_x - s_r)
+            nodes[i]['min_y'] = min(nodes[i]['min_y'], s_y - s_r)
+            nodes[i]['min_z'] = min(nodes[i]['min_z'], s_z - s_r)
+            
+            #find new maximum
+            nodes[i]['max_x'] = max(nodes[i]['max_x'], s_x + s_r)
+            nodes[i]['max_y'] = max(nodes[i]['max_y'], s_y + s_r)
+            nodes[i]['max_z'] = max(nodes[i]['max_z'], s_z + s_r)
+    else:
+        #Internal node, check children
+        for j in range(2):
+
+            child_node = nodes[first + j]
+
+            #find new minimum
+            nodes[i]['min_x'] = min(nodes[i]['min_x'], child_node['min_x'])
+            nodes[i]['min_y'] = min(nodes[i]['min_y'], child_node['min_y'])
+            nodes[i]['min_z'] = min(nodes[i]['min_z'], child_node['min_z'])
+            
+            #find new maximum
+            nodes[i]['max_x'] = max(nodes[i]['max_x'], child_node['max_x'])
+            nodes[i]['max_y'] = max(nodes[i]['max_y'], child_node['max_y'])
+            nodes[i]['max_z'] = max(nodes[i]['max_z'], child_node['max_z'])
+
+@njit(cache = True)
+def write_bounds(nodes: np.ndarray, 
+    target: np.ndarray, 
+    node_count: int) -> None:
+    """
+        Copy the first node_count nodes' bounds into target, leaving
+        its child and sphere fields alone. Nothing is read from target,
+        so it can be a write only mapping.
+    """
+
+    for i in range(node_count):
+
+        target[i]['min_x'] = nodes[i]['min_x']
+        target[i]['min_y'] = nodes[i]['min_y']
+        target[i]['min_z'] = nodes[i]['min_z']
+        target[i]['max_x'] = nodes[i]['max_x']
+        target[i]['max_y'] = nodes[i]['max_y']
+        target[i]['max_z'] = nodes[i]['max_z']
+
+@njit(cache = True)
+def link_nodes(nodes: np.ndarray, 
+    sphere_ids: np.ndarray,
+    node_count: int,
+    parents: np.ndarray,
+    sphere_leaves: np.ndarray) -> None:
+    """
+        Record each node's parent and the leaf holding each sphere,
+        needs to be rerun after every build.
+    """
+
+    parents[0] = -1
+    for i in range(node_count):
+
+        count = int(nodes[i]['sphere_count'])
+        first = int(nodes[i]['contents'])
 
         if count > 0:
-            #Exernal node, check spheres
             for j in range(count):
-
-                sphere_index = sphere_ids[first + j]
-
-                #grab sphere info
-                sphere = spheres[sphere_index]
-                s_x = sphere['x']
-                s_y = sphere['y']
-                s_z = sphere['z']
-                s_r = sphere['radius']
-
-                #find new minimum
-                nodes[i]['min_x'] = min(nodes[i]['min_x'], s_x - s_r)
-                nodes[i]['min_y'] = min(nodes[i]['min_y'], s_y - s_r)
-                nodes[i]['min_z'] = min(nodes[i]['min_z'], s_z - s_r)
-                
-                #find new maximum
-                nodes[i]['max_x'] = max(nodes[i]['max_x'], s_x + s_r)
-                nodes[i]['max_y'] = max(nodes[i]['max_y'], s_y + s_r)
-                nodes[i]['max_z'] = max(nodes[i]['max_z'], s_z + s_r)
+                sphere_leaves[sphere_ids[first + j]] = i
         else:
-            #Internal node, check children
-            for j in range(2):
+            parents[first] = i
+            parents[first + 1] = i
+
+@njit(cache = True)
+def refit_bvh_dirty(nodes: np.ndarray, 
+    columns: np.ndarray,
+    sphere_ids: np.ndarray,
+    parents: np.ndarray,
+    sphere_leaves: np.ndarray,
+    changed: np.ndarray,
+    marks: np.ndarray,
+    cost: float) -> float:
+    """
+        Refit only the nodes on the paths from the changed spheres'
+        leaves up to the root. Takes the tree's summed node cost
+        before the refit and returns it updated. Spheres are
+        read from columns, as for refit_bvh.
 
-                child_node = nodes[first + j]
+        marks is per-node scratch space, it must be all zero
+        on entry and is left that way.
+    """
 
-                #find new minimum
-                nodes[i]['min_x'] = min(nodes[i]['min_x'], child_node['min_x'])
-                nodes[i]['min_y'] = min(nodes[i]['min_y'], child_node['min_y'])
-                nodes[i]['min_z'] = min(nodes[i]['min_z'], child_node['min_z'])
-                
-                #find new maximum
-                nodes[i]['max_x'] = max(nodes[i]['max_x'], child_node['max_x'])
-                nodes[i]['max_y'] = max(nodes[i]['max_y'], child_node['max_y'])
-                nodes[i]['max_z'] = max(nodes[i]['max_z'], child_node['max_z'])
+    #collect each dirty node once, stopping
+    #when a path joins one already walked
+    dirty = np.zeros(min(len(nodes), len(changed) * 64 + 1), dtype = np.int32)
+    dirty_count = 0
+    for k in range(len(changed)):
 
-        i = i - 1
+        i = sphere_leaves[changed[k]]
+        while i >= 0 and marks[i] == 0:
+
+            if dirty_count == len(dirty):
+                grown = np.zeros(2 * len(dirty), dtype = np.int32)
+                grown[:dirty_count] = dirty[:dirty_count]
+                dirty = grown
+
+            marks[i] = 1
+            dirty[dirty_count] = i
+            dirty_count += 1
+            i = parents[i]
+    
+    #children always sit after their parents,
+    #so refit from the highest index down
+    dirty = np.sort(dirty[:dirty_count])
+    for k in range(dirty_count - 1, -1, -1):
+
+        i = dirty[k]
+        cost -= node_cost(nodes, i)
+        refit_node(nodes, columns, sphere_ids, i)
+        cost += node_cost(nodes, i)
+        marks[i] = 0
+    
+    return cost
+
+@njit(cache = True)
+def node_area(nodes: np.ndarray, i: int) -> float:
+    """
+        Half the surface area of a node's box.
+    """
+
+    _node = nodes[i]
+    e_x = _node['max_x'] - _node['min_x']
+    e_y = _node['max_y'] - _node['min_y']
+    e_z = _node['max_z'] - _node['min_z']
+    
+    return e_x * e_y + e_y * e_z + e_x * e_z
+
+@njit(cache = True)
+def node_cost(nodes: np.ndarray, i: int) -> float:
+    """
+        A node's contribution to the SAH cost: one box test
+        for an internal node, one test per sphere for a leaf.
+    """
+
+    count = int(nodes[i]['sphere_count'])
+    if count > 0:
+        return count * node_area(nodes, i)
+    return node_area(nodes, i)
+
+@njit(cache = True)
+def summed_cost(nodes: np.ndarray, node_count: int) -> float:
+    """
+        Sum of every node's cost, not yet relative to the root.
+    """
+
+    cost = 0.0
+    for i in range(node_count):
+        cost += node_cost(nodes, i)
+    
+    return cost
+
+@njit(cache = True)
+def tree_cost(nodes: np.ndarray, node_count: int) -> float:
+    """
+        Total SAH cost of the tree, relative to the root's surface area.
+    """
+
+    return summed_cost(nodes, node_count) / max(node_area(nodes, 0), 1e-10)
 #endregion
\ No newline at end of file
@@ -0,0 +1,74 @@
+from config import *
+import hashlib
+import json
+import os
+import shutil
+#---- BVH Cache                      ----#
+# Built trees are saved under a hash of  #
+# the spheres' geometry and the build    #
+# settings. A later run over the same    #
+# scene maps the arrays back in instead  #
+# of building.                           #
+#----------------------------------------#
+
+#bump whenever the builder's output changes
+CACHE_VERSION = 1
+
+def scene_key(spheres: np.ndarray, builder: str,
+    bin_count: int, all_axes: bool) -> str:
+    """
+        Hash everything the tree depends on: sphere bounds, not
+        velocities or materials, and the build settings.
+    """
+
+    digest = hashlib.blake2b(digest_size = 16)
+    digest.update(json.dumps(
+        [CACHE_VERSION, builder, len(spheres), bin_count, all_axes]).encode())
+    for name in ('x', 'y', 'z', 'radius'):
+        digest.update(np.ascontiguousarray(spheres[name]).tobytes())
+
+    return digest.hexdigest()
+
+def load(key: str, cache_dir: str = "bvh_cache") -> tuple[np.ndarray, np.ndarray, int] | None:
+    """
+        Map a cached tree back in, returns (nodes, sphere_ids, nodes_used)
+        or None if there isn't one. The arrays are copy on write, so
+        refits and rebuilds never touch the files.
+    """
+
+    folder = os.path.join(cache_dir, key)
+    try:
+        with open(os.path.join(folder, "meta.json"), 'r') as f:
+            meta = json.load(f)
+        nodes = np.load(os.path.join(folder, "nodes.npy"), mmap_mode = 'c')
+        sphere_ids = np.load(os.path.join(folder, "sphere_ids.npy"), mmap_mode = 'c')
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("version") != CACHE_VERSION or nodes.dtype != data_type_bvh_node:
+        return None
+
+    return nodes, sphere_ids, int(meta["nodes_used"])
+
+def save(key: str, nodes: np.ndarray, sphere_ids: np.ndarray,
+    nodes_used: int, cache_dir: str = "bvh_cache") -> None:
+    """
+        Store a built tree. Written to a scratch folder and then
+        renamed, so a crash never leaves a half written entry.
+    """
+
+    folder = os.path.join(cache_dir, key)
+    scratch = f"{folder}.{os.getpid()}.tmp"
+    os.makedirs(scratch, exist_ok = True)
+
+    np.save(os.path.join(scratch, "nodes.npy"), nodes)
+    np.save(os.path.join(scratch, "sphere_ids.npy"), sphere_ids)
+    #meta last, load treats an entry without it as missing
+    with open(os.path.join(scratch, "meta.json"), 'w') as f:
+        json.dump({"version": CACHE_VERSION, "nodes_used": int(nodes_used)}, f)
+
+    try:
+        os.replace(scratch, folder)
+    except OSError:
+        #another run got there first
+        shutil.rmtree(scratch, ignore_errors = True)
@@ -0,0 +1,209 @@
+from config import *
+import bvh_stats
+#---- Compressed Nodes               ----#
+# Each node's box is stored as 8 bit     #
+# offsets into its parent's box, so a    #
+# node takes 16 bytes instead of 32.     #
+# Traversal decodes children from the    #
+# parent box it already holds. Lower     #
+# bounds round down and upper bounds     #
+# round up, so decoded boxes only grow.  #
+#----------------------------------------#
+
+QUANTIZATION_STEPS = 255
+#a multiply rounds exactly on the GPU, a divide needn't,
+#the shader builds the same constant from its bits (0x3b808081)
+INVERSE_STEPS = np.float32(1.0 / QUANTIZATION_STEPS)
+
+@njit(cache = True)
+def decode_lower(low: np.float32, step: np.float32, q: int) -> np.float32:
+
+    return np.float32(low + np.float32(q) * step)
+
+@njit(cache = True)
+def decode_upper(high: np.float32, step: np.float32, q: int) -> np.float32:
+
+    return np.float32(high - np.float32(QUANTIZATION_STEPS - q) * step)
+
+@njit(cache = True)
+def get_step(low: np.float32, high: np.float32) -> np.float32:
+
+    return np.float32(np.float32(high - low) * INVERSE_STEPS)
+
+@njit(cache = True)
+def quantize_lower(value: float, low: np.float32, step: np.float32) -> int:
+    """
+        Largest q whose decoded bound is still at or below value.
+    """
+
+    if step <= 0:
+        return 0
+
+    q = int(np.floor((value - low) / step))
+    q = max(0, min(QUANTIZATION_STEPS, q))
+    #correct for rounding in the decode
+    while q > 0 and decode_lower(low, step, q) > value:
+        q -= 1
+    return q
+
+@njit(cache = True)
+def quantize_upper(value: float, high: np.float32, step: np.float32) -> int:
+    """
+        Smallest q whose decoded bound is still at or above value.
+    """
+
+    if step <= 0:
+        return QUANTIZATION_STEPS
+
+    q = QUANTIZATION_STEPS - int(np.floor((high - value) / step))
+    q = max(0, min(QUANTIZATION_STEPS, q))
+    while q < QUANTIZATION_STEPS and decode_upper(high, step, q) < value:
+        q += 1
+    return q
+
+@njit(cache = True)
+def compress_nodes(nodes: np.ndarray, node_count: int,
+    compressed: np.ndarray, boxes: np.ndarray) -> None:
+    """
+        Quantize the first node_count nodes into compressed.
+        boxes (node_count, 6) float32 receives the decoded
+        bounds, min xyz then max xyz. The root decodes to its
+        own box, which is passed to the shader in full.
+    """
+
+    boxes[0, 0] = nodes[0]['min_x']
+    boxes[0, 1] = nodes[0]['min_y']
+    boxes[0, 2] = nodes[0]['min_z']
+    boxes[0, 3] = nodes[0]['max_x']
+    boxes[0, 4] = nodes[0]['max_y']
+    boxes[0, 5] = nodes[0]['max_z']
+    for axis in range(3):
+        compressed[0]['lower'][axis] = 0
+        compressed[0]['upper'][axis] = QUANTIZATION_STEPS
+
+    #children always sit after their parents,
+    #so every parent is decoded before its children
+    for i in range(node_count):
+
+        compressed[i]['sphere_count'] = nodes[i]['sphere_count']
+        compressed[i]['contents'] = nodes[i]['contents']
+        if nodes[i]['sphere_count'] > 0:
+            continue
+
+        for child in range(nodes[i]['contents'], nodes[i]['contents'] + 2):
+            for axis in range(3):
+
+                low = boxes[i, axis]
+                high = boxes[i, 3 + axis]
+                step = get_step(low, high)
+
+                if axis == 0:
+                    child_low = nodes[child]['min_x']
+                    child_high = nodes[child]['max_x']
+                elif axis == 1:
+                    child_low = nodes[child]['min_y']
+                    child_high = nodes[child]['max_y']
+                else:
+                    child_low = nodes[child]['min_z']
+                    child_high = nodes[child]['max_z']
+
+                q_low = quantize_lower(child_low, low, step)
+                q_high = quantize_upper(child_high, high, step)
+                compressed[child]['lower'][axis] = q_low
+                compressed[child]['upper'][axis] = q_high
+                boxes[child, axis] = decode_lower(low, step, q_low)
+                boxes[child, 3 + axis] = decode_upper(high, step, q_high)
+
+@njit(cache = True)
+def decode_nodes(compressed: np.ndarray, node_count: int,
+    root_box: np.ndarray, boxes: np.ndarray) -> None:
+    """
+        Decode boxes the way the shader does, starting from
+        the root's full precision box.
+    """
+
+    for axis in range(6):
+        boxes[0, axis] = root_box[axis]
+
+    for i in range(node_count):
+
+        if compressed[i]['sphere_count'] > 0:
+            continue
+
+        for child in range(compressed[i]['contents'], compressed[i]['contents'] + 2):
+            for axis in range(3):
+
+                low = boxes[i, axis]
+                high = boxes[i, 3 + axis]
+                step = get_step(low, high)
+                boxes[child, axis] = decode_lower(
+                    low, step, compressed[child]['lower'][axis])
+                boxes[child, 3 + axis] = decode_upper(
+                    high, step, compressed[child]['upper'][axis])
+
+class CompressedNodes:
+    """
+        A compressed copy of a node array, kept in step with it.
+    """
+
+    def __init__(self, size: int):
+
+        self.nodes = np.zeros(size, dtype=data_type_bvh_node_compressed)
+        self.boxes = np.zeros((size, 6), dtype=np.float32)
+        self.root_min = np.zeros(3, dtype=np.float32)
+        self.root_max = np.zeros(3, dtype=np.float32)
+
+    def update(self, nodes: np.ndarray, node_count: int) -> None:
+        """
+            Recompress after a build or refit.
+        """
+
+        compress_nodes(nodes, node_count, self.nodes, self.boxes)
+        self.root_min[:] = self.boxes[0, :3]
+        self.root_max[:] = self.boxes[0, 3:]
+
+def validate(nodes: np.ndarray, compressed: np.ndarray, node_count: int) -> dict:
+    """
+        Decode the compressed nodes independently of the encoder
+        and check each box contains the original one.
+        Also measures how much the rounding inflates the boxes.
+    """
+
+    root_box = np.array([
+        nodes[0]['min_x'], nodes[0]['min_y'], nodes[0]['min_z'],
+        nodes[0]['max_x'], nodes[0]['max_y'], nodes[0]['max_z']],
+        dtype = np.float32)
+    boxes = np.zeros((node_count, 6), dtype = np.float32)
+    decode_nodes(compressed, node_count, root_box, boxes)
+
+    nodes = nodes[:node_count]
+    original = np.stack([nodes[name] for name in
+        ('min_x', 'min_y', 'min_z', 'max_x', 'max_y', 'max_z')], axis = 1)
+
+    #how far each decoded bound falls short, positive is a violation
+    shortfall = np.concatenate(
+        (boxes[:, :3] - original[:, :3], original[:, 3:] - boxes[:, 3:]), axis = 1)
+    violations = np.flatnonzero((shortfall > 0).any(axis = 1))
+
+    original_areas = bvh_stats.half_areas(*original.T.astype(np.float64))
+    decoded_areas = bvh_stats.half_areas(*boxes.T.astype(np.float64))
+    inflation = decoded_areas.sum() / max(original_areas.sum(), 1e-10)
+
+    return {
+        "conservative": len(violations) == 0,
+        "violations": violations.tolist(),
+        "max_shortfall": float(max(shortfall.max(), 0.0)),
+        "area_inflation": float(inflation),
+        "original_bytes": int(node_count * data_type_bvh_node.itemsize),
+        "compressed_bytes": int(node_count * data_type_bvh_node_compressed.itemsize),
+    }
+
+if __name__ == "__main__":
+    import json
+    import scene
+    _scene = scene.Scene()
+    compressed = CompressedNodes(len(_scene.nodes))
+    compressed.update(_scene.nodes, _scene.nodes_used)
+    report = validate(_scene.nodes, compressed.nodes, _scene.nodes_used)
+    report["violations"] = len(report["violations"])
+    print(json.dumps(report, indent = 4))
@@ -0,0 +1,106 @@
+from config import *
+import contextlib
+import json
+import sys
+import bvh_backend
+#---- BVH Statistics                 ----#
+# Quality metrics for a built tree,      #
+# read straight from the node array so   #
+# builds can be compared without a GPU.  #
+#----------------------------------------#
+
+@njit(cache = True)
+def node_depths(nodes: np.ndarray, node_count: int) -> np.ndarray:
+    """
+        Depth of every node, the root being 0.
+    """
+
+    depths = np.zeros(node_count, dtype = np.int32)
+    #children always sit after their parents
+    for i in range(node_count):
+        if nodes[i]['sphere_count'] == 0:
+            first = nodes[i]['contents']
+            depths[first] = depths[i] + 1
+            depths[first + 1] = depths[i] + 1
+
+    return depths
+
+def half_areas(min_x, min_y, min_z, max_x, max_y, max_z) -> np.ndarray:
+
+    e_x = np.maximum(max_x - min_x, 0.0)
+    e_y = np.maximum(max_y - min_y, 0.0)
+    e_z = np.maximum(max_z - min_z, 0.0)
+
+    return e_x * e_y + e_y * e_z + e_x * e_z
+
+def analyze(nodes: np.ndarray, node_count: int) -> dict:
+    """
+        Gather quality metrics for the first node_count nodes.
+        Areas are half surface areas, probabilities are
+        relative to the root, as for a ray that hits the root.
+    """
+
+    nodes = nodes[:node_count]
+    counts = nodes['sphere_count'].astype(np.int64)
+    leaves = counts > 0
+    internal = ~leaves
+
+    bounds = [nodes[name].astype(np.float64) for name in
+        ('min_x', 'min_y', 'min_z', 'max_x', 'max_y', 'max_z')]
+    areas = half_areas(*bounds)
+    root_area = max(areas[0], 1e-10)
+    probabilities = areas / root_area
+
+    depths = node_depths(nodes, node_count)
+
+    #overlap between each internal node's two children
+    left = nodes['contents'][internal].astype(np.int64)
+    right = left + 1
+    overlap = half_areas(
+        np.maximum(bounds[0][left], bounds[0][right]),
+        np.maximum(bounds[1][left], bounds[1][right]),
+        np.maximum(bounds[2][left], bounds[2][right]),
+        np.minimum(bounds[3][left], bounds[3][right]),
+        np.minimum(bounds[4][left], bounds[4][right]),
+        np.minimum(bounds[5][left], bounds[5][right]))
+    #disjoint children clamp to a flat box, which still has area
+    overlaps = np.all([
+        np.minimum(bounds[3 + axis][left], bounds[3 + axis][right])
+        >= np.maximum(bounds[axis][left], bounds[axis][right])
+        for axis in range(3)], axis = 0)
+    overlap = np.where(overlaps, overlap, 0.0)
+    overlap_ratio = overlap / np.maximum(areas[internal], 1e-10)
+
+    return {
+        "node_count": int(node_count),
+        "leaf_count": int(leaves.sum()),
+        "sphere_count": int(counts.sum()),
+        "max_depth": int(depths.max()),
+        "mean_leaf_depth": float(depths[leaves].mean()),
+        "depth_histogram": np.bincount(depths[leaves]).tolist(),
+        "leaf_size_histogram": np.bincount(counts[leaves]).tolist(),
+        "sah_cost": float(bvh_backend.tree_cost(nodes, node_count)),
+        "mean_sibling_overlap": float(overlap_ratio.mean()) if len(left) else 0.0,
+        "max_sibling_overlap": float(overlap_ratio.max()) if len(left) else 0.0,
+        #every node a ray enters is visited, every sphere
+        #in a visited leaf is tested
+        "expected_node_visits": float(probabilities.sum()),
+        "expected_sphere_tests": float((probabilities * counts)[leaves].sum()),
+    }
+
+def save_report(report: dict, filepath: str) -> None:
+
+    with open(filepath, 'w') as f:
+        json.dump(report, f, indent = 4)
+
+if __name__ == "__main__":
+    import scene
+    #always build afresh, and keep the scene's build line
+    #out of the report when it goes to stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        _scene = scene.Scene(cache_dir = None)
+    report = analyze(_scene.nodes, _scene.nodes_used)
+    if len(sys.argv) > 1:
+        save_report(report, sys.argv[1])
+    else:
+        print(json.dumps(report, indent = 4))
@@ -6,7 +6,7 @@ import numpy as np
 import pyrr
 import time
 from PIL import Image, ImageOps
-from numba import njit
+from numba import njit, prange
 
 np.random.seed(0)
 
@@ -26,4 +26,20 @@ data_type_bvh_node = np.dtype({
     'names':   [   'min_x',    'min_y',    'min_z', 'sphere_count',    'max_x',    'max_y',    'max_z', 'contents'], 
     'formats': [np.float32, np.float32, np.float32,       np.int32, np.float32, np.float32, np.float32,   np.int32],
     'offsets': [         0,          4,          8,             12,         16,         20,         24,         28],
-    'itemsize': 32})
\ No newline at end of file
+    'itemsize': 32})
+
+#bounds quantized to 8 bits against the parent's decoded box,
+#bytes are x, y, z and one unused pad byte
+data_type_bvh_node_compressed = np.dtype({
+    'names':   [          'lower',           'upper', 'sphere_count', 'contents'], 
+    'formats': [(np.uint8, (4,)), (np.uint8, (4,)),       np.int32,   np.int32],
+    'offsets': [                0,                 4,              8,         12],
+    'itemsize': 16})
+
+#an instance of a cached bottom level bvh, transform takes
+#the mesh's local space to world space, inverse goes back
+data_type_instance = np.dtype({
+    'names':   [          'transform',            'inverse',   'mesh',   'root'], 
+    'formats': [(np.float32, (3, 4)), (np.float32, (3, 4)), np.int32, np.int32],
+    'offsets': [                    0,                   48,       96,      100],
+    'itemsize': 112})
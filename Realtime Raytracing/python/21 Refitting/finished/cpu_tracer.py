@@ -0,0 +1,407 @@
+from config import *
+#---- CPU Reference Tracer           ----#
+# A compiled port of trace() and hit()   #
+# from shaders/rayTracer.txt, reading    #
+# the same arrays the shader does. No GL #
+# context needed, so it can check and    #
+# benchmark the bvh anywhere.            #
+#----------------------------------------#
+
+#deeper than the shader's 12, so a deep
+#tree shows up as slow rather than wrong.
+#numba doesn't bounds check, so the node stack
+#grows when full and a reflection which finds the
+#ray stack full is dropped
+NODE_STACK_SIZE = 64
+RAY_STACK_SIZE = 4
+MAX_DEPTH = 2
+
+@njit(parallel = True, cache = True)
+def render(
+    spheres: np.ndarray, nodes: np.ndarray,
+    sphere_ids: np.ndarray, materials: np.ndarray,
+    position: np.ndarray, forwards: np.ndarray,
+    right: np.ndarray, up: np.ndarray,
+    sky_color: np.ndarray, width: int, height: int,
+    tile_size: int = 8) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+        Render the scene, one tile per task.
+
+        up should already be scaled by the screen's aspect ratio,
+        as it is for the shader. Misses return sky_color in place
+        of the skybox.
+
+        Returns the image (height, width, 3), and per pixel
+        the number of rays traced and nodes visited.
+    """
+
+    image = np.zeros((height, width, 3), dtype = np.float32)
+    ray_counts = np.zeros((height, width), dtype = np.int32)
+    node_counts = np.zeros((height, width), dtype = np.int32)
+
+    tiles_x = (width + tile_size - 1) // tile_size
+    tiles_y = (height + tile_size - 1) // tile_size
+
+    for tile in prange(tiles_x * tiles_y):
+
+        x0 = (tile % tiles_x) * tile_size
+        y0 = (tile // tiles_x) * tile_size
+
+        for y in range(y0, min(y0 + tile_size, height)):
+            for x in range(x0, min(x0 + tile_size, width)):
+                render_pixel(
+                    spheres, nodes, sphere_ids, materials,
+                    position, forwards, right, up, sky_color,
+                    x, y, width, height,
+                    image, ray_counts, node_counts)
+
+    return image, ray_counts, node_counts
+
+@njit(cache = True)
+def render_pixel(
+    spheres: np.ndarray, nodes: np.ndarray,
+    sphere_ids: np.ndarray, materials: np.ndarray,
+    position: np.ndarray, forwards: np.ndarray,
+    right: np.ndarray, up: np.ndarray, sky_color: np.ndarray,
+    x: int, y: int, width: int, height: int,
+    image: np.ndarray, ray_counts: np.ndarray, node_counts: np.ndarray) -> None:
+    """
+        main() from the shader, for a single pixel.
+    """
+
+    horizontal = (x * 2.0 - width) / width
+    vertical = (y * 2.0 - height) / width
+
+    #pending rays: origin, direction, energy, depth
+    stack_origin = np.zeros((RAY_STACK_SIZE, 3))
+    stack_direction = np.zeros((RAY_STACK_SIZE, 3))
+    stack_energy = np.zeros((RAY_STACK_SIZE, 3))
+    stack_depth = np.zeros(RAY_STACK_SIZE, dtype = np.int32)
+    stack_pos = 0
+
+    origin = position.astype(np.float64)
+    direction = forwards + horizontal * right + vertical * up
+    energy = np.ones(3)
+    depth = 0
+    early_exit = False
+
+    reflection_origin = np.zeros(3)
+    reflection_direction = np.zeros(3)
+    reflection_energy = np.zeros(3)
+
+    pixel = np.zeros(3)
+    rays = 0
+    visited = 0
+    while True:
+
+        hit = False
+        t = 0.0
+        index = -1
+        backface = False
+        if not early_exit:
+            rays += 1
+            hit, t, index, backface, visits = trace(
+                spheres, nodes, sphere_ids, origin, direction)
+            visited += visits
+
+        if hit:
+            reflection_depth, reflection_exit, depth, early_exit = scatter(
+                spheres, materials, t, index, backface,
+                origin, direction, energy, depth, early_exit,
+                reflection_origin, reflection_direction, reflection_energy)
+
+            if not reflection_exit and stack_pos < RAY_STACK_SIZE:
+                stack_origin[stack_pos] = reflection_origin
+                stack_direction[stack_pos] = reflection_direction
+                stack_energy[stack_pos] = reflection_energy
+                stack_depth[stack_pos] = reflection_depth
+                stack_pos += 1
+            continue
+
+        #miss, or dropped
+        pixel += energy * sky_color
+
+        if stack_pos == 0:
+            break
+
+        stack_pos -= 1
+        origin = stack_origin[stack_pos].copy()
+        direction = stack_direction[stack_pos].copy()
+        energy = stack_energy[stack_pos].copy()
+        depth = stack_depth[stack_pos]
+        early_exit = False
+
+    image[y, x] = pixel
+    ray_counts[y, x] = rays
+    node_counts[y, x] = visited
+
+@njit(cache = True)
+def trace(
+    spheres: np.ndarray, nodes: np.ndarray, sphere_ids: np.ndarray,
+    origin: np.ndarray, direction: np.ndarray) -> tuple[bool, float, int, bool, int]:
+    """
+        Find the nearest sphere along the ray.
+        Returns (hit, t, sphere index, backface, nodes visited).
+    """
+
+    nearest_hit = 9999999.0
+    hit_something = False
+    hit_index = -1
+    hit_backface = False
+
+    stack = np.zeros(NODE_STACK_SIZE, dtype = np.int32)
+    stack_pos = 0
+    node_index = 0
+    visited = 0
+
+    while True:
+
+        visited += 1
+        contents = int(nodes[node_index]['contents'])
+        sphere_count = int(nodes[node_index]['sphere_count'])
+
+        if sphere_count > 0:
+
+            for i in range(sphere_count):
+
+                sphere_index = sphere_ids[contents + i]
+                hit, t, backface = hit_sphere(
+                    spheres, sphere_index, origin, direction, 0.001, nearest_hit)
+
+                if hit:
+                    nearest_hit = t
+                    hit_something = True
+                    hit_index = sphere_index
+                    hit_backface = backface
+
+            if stack_pos == 0:
+                break
+            stack_pos -= 1
+            node_index = stack[stack_pos]
+            continue
+
+        left_child = contents
+        right_child = contents + 1
+        dist1 = hit_node(nodes, left_child, origin, direction, nearest_hit)
+        dist2 = hit_node(nodes, right_child, origin, direction, nearest_hit)
+
+        if dist1 > dist2:
+            left_child, right_child = right_child, left_child
+            dist1, dist2 = dist2, dist1
+
+        if dist1 > nearest_hit:
+            if stack_pos == 0:
+                break
+            stack_pos -= 1
+            node_index = stack[stack_pos]
+        else:
+            node_index = left_child
+            if dist2 <= nearest_hit:
+                stack = push_node(stack, stack_pos, right_child)
+                stack_pos += 1
+
+    return hit_something, nearest_hit, hit_index, hit_backface, visited
+
+@njit(cache = True)
+def push_node(stack: np.ndarray, stack_pos: int, node_index: int) -> np.ndarray:
+    """
+        Push onto a node stack, doubling it if it's full.
+        Returns the stack, which may be a new array.
+    """
+
+    if stack_pos == len(stack):
+        grown = np.zeros(2 * len(stack), dtype = np.int32)
+        grown[:stack_pos] = stack[:stack_pos]
+        stack = grown
+    
+    stack[stack_pos] = node_index
+    return stack
+
+@njit(cache = True)
+def hit_sphere(
+    spheres: np.ndarray, sphere_index: int,
+    origin: np.ndarray, direction: np.ndarray,
+    t_min: float, t_max: float) -> tuple[bool, float, bool]:
+    """
+        Ray-sphere test, returns (hit, t, backface).
+    """
+
+    sphere = spheres[sphere_index]
+    co_x = origin[0] - sphere['x']
+    co_y = origin[1] - sphere['y']
+    co_z = origin[2] - sphere['z']
+    r = sphere['radius']
+
+    a = direction[0] * direction[0] + direction[1] * direction[1] + direction[2] * direction[2]
+    b = 2 * (direction[0] * co_x + direction[1] * co_y + direction[2] * co_z)
+    c = co_x * co_x + co_y * co_y + co_z * co_z - r * r
+    discriminant = b * b - 4 * a * c
+
+    if discriminant > 0.0:
+
+        t1 = (-b - np.sqrt(discriminant)) / (2 * a)
+        t2 = (-b + np.sqrt(discriminant)) / (2 * a)
+
+        if t1 > t_min and t1 < t_max:
+            return True, t1, False
+        if t2 > t_min and t2 < t_max:
+            return True, t2, True
+
+    return False, 0.0, False
+
+@njit(cache = True)
+def hit_node(
+    nodes: np.ndarray, node_index: int,
+    origin: np.ndarray, direction: np.ndarray,
+    nearest_hit: float) -> float:
+    """
+        Ray-box test, returns the entry distance or 999999999 on a miss.
+    """
+
+    _node = nodes[node_index]
+    t_near = -1e30
+    t_far = 1e30
+    for axis in range(3):
+
+        if axis == 0:
+            low = _node['min_x']
+            high = _node['max_x']
+        elif axis == 1:
+            low = _node['min_y']
+            high = _node['max_y']
+        else:
+            low = _node['min_z']
+            high = _node['max_z']
+
+        #division by zero gives +-inf, as on the GPU
+        if direction[axis] != 0:
+            t1 = (low - origin[axis]) / direction[axis]
+            t2 = (high - origin[axis]) / direction[axis]
+        elif low <= origin[axis] <= high:
+            t1 = -np.inf
+            t2 = np.inf
+        else:
+            t1 = np.inf
+            t2 = np.inf
+
+        t_near = max(t_near, min(t1, t2))
+        t_far = min(t_far, max(t1, t2))
+
+    if t_near <= t_far and t_far > 0 and t_near < nearest_hit:
+        return t_near
+    return 999999999.0
+
+@njit(cache = True)
+def scatter(
+    spheres: np.ndarray, materials: np.ndarray,
+    t: float, sphere_index: int, backface: bool,
+    origin: np.ndarray, direction: np.ndarray, energy: np.ndarray,
+    depth: int, early_exit: bool,
+    reflection_origin: np.ndarray, reflection_direction: np.ndarray,
+    reflection_energy: np.ndarray) -> tuple[int, bool, int, bool]:
+    """
+        Split the ray into refracted (updated in place)
+        and reflected (written to the reflection arrays) parts.
+        Returns (reflection depth, reflection early exit,
+        refraction depth, refraction early exit).
+    """
+
+    sphere = spheres[sphere_index]
+    material = materials[sphere['material']]
+
+    hit_pos = origin + t * direction
+    normal = np.empty(3)
+    normal[0] = hit_pos[0] - sphere['x']
+    normal[1] = hit_pos[1] - sphere['y']
+    normal[2] = hit_pos[2] - sphere['z']
+    normal /= np.sqrt(dot(normal, normal))
+
+    origin[:] = hit_pos
+    reflection_origin[:] = hit_pos
+    reflection_direction[:] = direction
+    reflection_energy[:] = energy
+
+    if backface:
+        normal = -1.0 * normal
+        early_exit = refract_ray(direction, energy, normal, material, True, early_exit)
+        return depth, True, depth, early_exit
+
+    early_exit = refract_ray(direction, energy, normal, material, False, early_exit)
+
+    #reflect
+    reflection_energy *= material['reflectance']
+    reflection_direction -= 2 * dot(normal, reflection_direction) * normal
+    reflection_direction /= np.sqrt(dot(reflection_direction, reflection_direction))
+
+    depth += 1
+    early_exit = early_exit or depth >= MAX_DEPTH
+    return depth, depth >= MAX_DEPTH, depth, early_exit
+
+@njit(cache = True)
+def refract_ray(
+    direction: np.ndarray, energy: np.ndarray, normal: np.ndarray,
+    material: np.record, backface: bool, early_exit: bool) -> bool:
+    """
+        Tint and bend the ray, returns its early exit flag.
+    """
+
+    energy[0] *= (1.0 - material['reflectance']) * material['r']
+    energy[1] *= (1.0 - material['reflectance']) * material['g']
+    energy[2] *= (1.0 - material['reflectance']) * material['b']
+
+    eta = material['eta']
+    if backface:
+        eta = 1.0 / eta
+
+    #glsl refract()
+    d = dot(normal, direction)
+    k = 1.0 - eta * eta * (1.0 - d * d)
+    if k < 0.0:
+        direction[:] = 0.0
+    else:
+        direction[:] = eta * direction - (eta * d + np.sqrt(k)) * normal
+
+    length = np.sqrt(dot(direction, direction))
+    if length < 0.000001:
+        return True
+    direction /= length
+    return early_exit
+
+@njit(cache = True)
+def dot(a: np.ndarray, b: np.ndarray) -> float:
+
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+def benchmark(_scene, size: int = 256, repeats: int = 5) -> dict[str, float]:
+    """
+        Render the scene from its camera a few times,
+        returns throughput and traversal statistics.
+    """
+
+    camera = _scene.camera
+    sky_color = np.array([176.0 / 255, 1.0, 188.0 / 255])
+    args = (_scene.spheres, _scene.nodes, _scene.sphere_ids, _scene.materials,
+        camera.position.astype(np.float64), camera.forwards.astype(np.float64),
+        camera.right.astype(np.float64), camera.up.astype(np.float64),
+        sky_color, size, size)
+
+    #warm up the compiler
+    render(*args)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        image, ray_counts, node_counts = render(*args)
+    seconds = (time.perf_counter() - start) / repeats
+
+    rays = int(ray_counts.sum())
+    return {
+        "ms_per_frame": seconds * 1000,
+        "rays_per_second": rays / seconds,
+        "nodes_per_ray": float(node_counts.sum()) / max(rays, 1),
+    }
+
+if __name__ == "__main__":
+    import scene
+    results = benchmark(scene.Scene())
+    for name, value in results.items():
+        print(f"{name}: {value:.2f}")
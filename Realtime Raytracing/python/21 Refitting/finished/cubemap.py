@@ -0,0 +1,112 @@
+from config import *
+import concurrent.futures
+import hashlib
+import json
+import os
+#---- Cube Map Loading               ----#
+# The six faces decode on a thread pool, #
+# PIL drops the GIL while it inflates    #
+# the PNGs. Oriented faces are cached as #
+# one (6, size, size, 4) blob, which     #
+# later runs map straight back in.       #
+#----------------------------------------#
+
+#bump whenever the face orientations change
+CACHE_VERSION = 1
+
+#(file suffix, cube map face, quarter turns anticlockwise, flip, mirror)
+FACES = (
+    ("left",   GL_TEXTURE_CUBE_MAP_NEGATIVE_Y,  0, False, False),
+    ("right",  GL_TEXTURE_CUBE_MAP_POSITIVE_Y,  0, True,  True),
+    ("top",    GL_TEXTURE_CUBE_MAP_POSITIVE_Z,  1, False, False),
+    ("bottom", GL_TEXTURE_CUBE_MAP_NEGATIVE_Z,  0, False, False),
+    ("back",   GL_TEXTURE_CUBE_MAP_NEGATIVE_X, -1, False, False),
+    ("front",  GL_TEXTURE_CUBE_MAP_POSITIVE_X,  1, False, False),
+)
+
+def face_paths(filepath: str) -> list[str]:
+
+    return [f"{filepath}_{suffix}.png" for suffix, *_ in FACES]
+
+def decode_face(path: str, turns: int, flip: bool, mirror: bool) -> np.ndarray:
+    """
+        Read one face as a (size, size, 4) uint8 array, oriented.
+    """
+
+    with Image.open(path, mode = "r") as img:
+        pixels = np.asarray(img.convert('RGBA'))
+
+    if flip:
+        pixels = pixels[::-1]
+    if mirror:
+        pixels = pixels[:, ::-1]
+    if turns:
+        pixels = np.rot90(pixels, turns)
+
+    return pixels
+
+def cache_key(paths: list[str]) -> str:
+    """
+        Hash the faces' names, sizes and modification times,
+        touching any source file invalidates the entry.
+    """
+
+    digest = hashlib.blake2b(digest_size = 16)
+    stamps = []
+    for path in paths:
+        info = os.stat(path)
+        stamps.append([os.path.abspath(path), info.st_size, info.st_mtime_ns])
+    digest.update(json.dumps([CACHE_VERSION, stamps]).encode())
+
+    return digest.hexdigest()
+
+def load_faces(filepath: str, cache_dir: str = "cubemap_cache") -> np.ndarray:
+    """
+        Load the six faces at filepath_<face>.png as one
+        (6, size, size, 4) uint8 array, in FACES order.
+
+            Parameters:
+                cache_dir (str): decoded faces are kept here and mapped
+                    back in on later runs, None turns caching off
+    """
+
+    paths = face_paths(filepath)
+
+    cache_path = None
+    if cache_dir is not None:
+        name = os.path.basename(filepath)
+        cache_path = os.path.join(cache_dir, f"{name}_{cache_key(paths)}.npy")
+        try:
+            return np.load(cache_path, mmap_mode = 'r')
+        except (OSError, ValueError):
+            pass
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers = len(FACES)) as pool:
+        jobs = [
+            pool.submit(decode_face, path, turns, flip, mirror)
+            for path, (_, _, turns, flip, mirror) in zip(paths, FACES)
+        ]
+        faces = [job.result() for job in jobs]
+
+    size = faces[0].shape[0]
+    for path, face in zip(paths, faces):
+        if face.shape != (size, size, 4):
+            raise ValueError(
+                f"Cube map faces must be square and the same size: {path} is "
+                f"{face.shape[1]}x{face.shape[0]}, expected {size}x{size}")
+
+    if cache_path is None:
+        return np.stack(faces)
+
+    #decode straight into the cache file, then rename it into place
+    os.makedirs(cache_dir, exist_ok = True)
+    scratch = f"{cache_path}.{os.getpid()}.tmp"
+    blob = np.lib.format.open_memmap(
+        scratch, mode = 'w+', dtype = np.uint8, shape = (len(FACES), size, size, 4))
+    for i, face in enumerate(faces):
+        blob[i] = face
+    blob.flush()
+    del blob
+    os.replace(scratch, cache_path)
+
+    return np.load(cache_path, mmap_mode = 'r')
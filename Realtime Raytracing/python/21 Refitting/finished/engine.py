@@ -5,25 +5,55 @@ import node
 import materials
 import screen_quad
 import buffer
+import profiler
 
 class Engine:
     """
         Responsible for drawing scenes
     """
 
-    def __init__(self, width, height, _scene: scene.Scene):
+    def __init__(self, width, height, _scene: scene.Scene, _profiler: profiler.Profiler = None):
         """
             Initialize a flat raytracing context
             
                 Parameters:
                     width (int): width of screen
                     height (int): height of screen
+                    _profiler (Profiler): times each frame's stages,
+                        defaults to the scene's
         """
         self.screenWidth = width
         self.screenHeight = height
 
         self.targetFrameRate = 60
         self.frameRateMargin = 10
+        #stream spheres and nodes through a mapped ring of buffers
+        self.persistentBuffers = True
+        #send 16 byte quantized nodes rather than 32 byte float ones
+        self.compressedNodes = False
+        #have the scene write refit bounds straight into the mapped node
+        #region for the next frame, so whole nodes are only copied after
+        #a rebuild
+        self.refitInPlace = self.persistentBuffers and not self.compressedNodes
+        #trace one in every interleave pixels each frame, at full
+        #resolution, and reproject the rest from the last frame
+        self.temporalAccumulation = False
+        self.interleave = 2
+        #give 8x8 tiles which visited many nodes extra samples, in a
+        #second pass dispatched over a list of just those tiles
+        self.adaptiveSampling = False
+        self.adaptiveSamples = 4
+        self.costThreshold = 24.0
+        #read each tile's node visits back into tileCosts every frame,
+        #this stalls on the GPU so it's for profiling only
+        self.recordTileCosts = False
+        self.profiler = _profiler if _profiler is not None else _scene.profiler
+        #a two level scene streams its instances rather than
+        #refitting, and its trees are always sent as float nodes
+        self.instanced = _scene.instanced
+        if self.instanced:
+            self.compressedNodes = False
+            self.refitInPlace = False
 
         self.makeAssets(_scene)
         
@@ -41,24 +71,124 @@ class Engine:
             height = self.screenHeight)
         """
 
-        sphere_count = int(len(_scene.spheres))
-        self.sphereBuffer = buffer.Buffer(
-            size = sphere_count, binding = 1, dtype=data_type_sphere)
-        self.nodeBuffer = buffer.Buffer(
-            size = len(_scene.nodes), binding = 2, dtype=data_type_bvh_node)
-        self.indexBuffer = buffer.Buffer(
-            size = len(_scene.sphere_ids), binding = 3, dtype=np.int32)
+        if self.persistentBuffers:
+            streamingBuffer = buffer.PersistentBuffer
+        else:
+            streamingBuffer = buffer.Buffer
         self.materialBuffer = buffer.Buffer(
             size = len(_scene.materials), binding = 4, dtype=data_type_material)
+        self.materialBuffer.attach(_scene.materials)
+
+        if self.instanced:
+            self.makeInstanceBuffers(_scene, streamingBuffer)
+        else:
+            self.makeSphereBuffers(_scene, streamingBuffer)
 
         self.shader = self.createShader("shaders/frameBufferVertex.txt",
                                         "shaders/frameBufferFragment.txt")
         
-        self.rayTracerShader = self.createComputeShader("shaders/rayTracer.txt")
+        if self.instanced:
+            self.rayTracerShader = self.createComputeShader("shaders/rayTracerInstanced.txt")
+        elif self.compressedNodes:
+            self.rayTracerShader = self.createComputeShader("shaders/rayTracerCompressed.txt")
+        else:
+            self.rayTracerShader = self.createComputeShader("shaders/rayTracer.txt")
 
         self.skyBoxMaterial = materials.CubeMapMaterial("gfx/sky")
         glUseProgram(self.rayTracerShader)
         glUniform1i(glGetUniformLocation(self.rayTracerShader, "sky_cube"), 4)
+
+        #each tile's cost, for the largest dispatch
+        self.maxTileCount = (self.colorBuffer.sizes[-1] // 8) ** 2
+        self.tileCostBuffer = buffer.CounterBuffer(
+            size = self.maxTileCount, binding = 5)
+        self.tileCosts = np.zeros((0, 0), dtype=np.uint32)
+        #the extra sample pass's indirect dispatch arguments,
+        #(tile count, 1, 1), followed by the tiles themselves
+        self.tileListBuffer = buffer.CounterBuffer(
+            size = 3 + self.maxTileCount, binding = 9)
+        self.tileListBuffer.write(0, np.array([0, 1, 1], dtype=np.uint32))
+        self.compactShader = self.createComputeShader("shaders/tileCompact.txt")
+
+        if self.temporalAccumulation:
+            self.accumulationBuffer = materials.AccumulationBuffer(self.colorBuffer.sizes[-1])
+            self.resolveShader = self.createComputeShader("shaders/temporalResolve.txt")
+            glUseProgram(self.resolveShader)
+            glUniform1i(glGetUniformLocation(self.resolveShader, "history"), 5)
+            self.frameIndex = 0
+            #(position, forwards, right, up) of the last resolved frame
+            self.previousCamera = None
+    
+    def makeSphereBuffers(self, _scene: scene.Scene, streamingBuffer: type) -> None:
+        """
+            Buffers for the flat tree: spheres and nodes stream
+            every update, sphere indices change on a rebuild.
+        """
+
+        sphere_count = int(len(_scene.spheres))
+        self.sphereBuffer = streamingBuffer(
+            size = sphere_count, binding = 1, dtype=data_type_sphere)
+        if self.compressedNodes:
+            _scene.compress_nodes = True
+            _scene.compressed_nodes.update(_scene.nodes, _scene.nodes_used)
+            self.nodeBuffer = streamingBuffer(
+                size = len(_scene.nodes), binding = 2, 
+                dtype=data_type_bvh_node_compressed)
+        else:
+            self.nodeBuffer = streamingBuffer(
+                size = len(_scene.nodes), binding = 2, dtype=data_type_bvh_node)
+        self.indexBuffer = buffer.Buffer(
+            size = len(_scene.sphere_ids), binding = 3, dtype=np.int32)
+        
+        #upload straight from the scene's arrays
+        self.sphereBuffer.attach(_scene.spheres)
+        if self.compressedNodes:
+            self.nodeBuffer.attach(_scene.compressed_nodes.nodes)
+        else:
+            self.nodeBuffer.attach(_scene.nodes)
+        self.indexBuffer.attach(_scene.sphere_ids)
+
+        self.sceneBuffers = [
+            self.sphereBuffer, self.nodeBuffer, 
+            self.indexBuffer, self.materialBuffer]
+        self.streamingBuffers = [self.sphereBuffer, self.nodeBuffer]
+    
+    def makeInstanceBuffers(self, _scene: scene.Scene, streamingBuffer: type) -> None:
+        """
+            Buffers for the two level scene: the meshes' packed trees
+            are sent once, the instances and the top level tree
+            over them stream every update.
+        """
+
+        blas = _scene.blas
+        top_level = _scene.instance_bvh
+        self.sphereBuffer = buffer.Buffer(
+            size = len(blas.spheres), binding = 1, dtype=data_type_sphere)
+        self.nodeBuffer = buffer.Buffer(
+            size = len(blas.nodes), binding = 2, dtype=data_type_bvh_node)
+        self.indexBuffer = buffer.Buffer(
+            size = len(blas.sphere_ids), binding = 3, dtype=np.int32)
+        self.instanceBuffer = streamingBuffer(
+            size = len(_scene.instances), binding = 6, dtype=data_type_instance)
+        self.topLevelBuffer = streamingBuffer(
+            size = len(top_level.nodes), binding = 7, dtype=data_type_bvh_node)
+        self.instanceIndexBuffer = streamingBuffer(
+            size = len(top_level.instance_ids), binding = 8, dtype=np.int32)
+        
+        #upload straight from the scene's arrays
+        self.sphereBuffer.attach(blas.spheres)
+        self.nodeBuffer.attach(blas.nodes)
+        self.indexBuffer.attach(blas.sphere_ids)
+        self.instanceBuffer.attach(_scene.instances)
+        self.topLevelBuffer.attach(top_level.nodes)
+        self.instanceIndexBuffer.attach(top_level.instance_ids)
+
+        self.sceneBuffers = [
+            self.sphereBuffer, self.nodeBuffer, 
+            self.indexBuffer, self.materialBuffer,
+            self.instanceBuffer, self.topLevelBuffer, self.instanceIndexBuffer]
+        self.streamingBuffers = [
+            self.instanceBuffer, self.topLevelBuffer, self.instanceIndexBuffer]
     
     def createShader(self, vertexFilepath, fragmentFilepath):
         """
@@ -95,14 +225,27 @@ class Engine:
         scene.outDated = False
 
         glUseProgram(self.rayTracerShader)
+
+        if self.instanced:
+            #the instances move and the top level is rebuilt every
+            #update, the meshes' trees never change
+            self.instanceBuffer.markDirty(0, len(scene.instances))
+            self.topLevelBuffer.markDirty(0, scene.instance_bvh.nodes_used)
+            self.instanceIndexBuffer.markDirty(0, len(scene.instances))
+            return
         
-        self.sphereBuffer.blit(scene.spheres)
+        #spheres move and nodes refit every update,
+        #the sphere order only changes on a rebuild
+        self.sphereBuffer.markDirty(0, scene.sphere_count)
         
-        self.nodeBuffer.blit(scene.nodes)
-
-        self.indexBuffer.blit(scene.sphere_ids)
+        #nodes refit in place are already in their region,
+        #a rebuilt tree still has to reach every region
+        if not self.refitInPlace or scene.rebuilt:
+            self.nodeBuffer.markDirty(0, scene.nodes_used)
 
-        self.materialBuffer.blit(scene.materials)
+        if scene.rebuilt:
+            self.indexBuffer.markDirty(0, scene.sphere_count)
+            scene.rebuilt = False
 
     def prepareScene(self, scene: scene.Scene):
         """
@@ -118,49 +261,176 @@ class Engine:
         glUniform3fv(glGetUniformLocation(self.rayTracerShader, "viewer.right"), 1, scene.camera.right)
         glUniform3fv(glGetUniformLocation(self.rayTracerShader, "viewer.up"), 1, correction_factor * scene.camera.up)
 
-        if scene.outDated:
-            self.updateScene(scene)
-        
-        self.sphereBuffer.readFrom()
-        self.nodeBuffer.readFrom()
-        self.indexBuffer.readFrom()
-        self.materialBuffer.readFrom()
+        if self.temporalAccumulation:
+            glUniform1i(glGetUniformLocation(self.rayTracerShader, "interleave"), self.interleave)
+            glUniform1i(glGetUniformLocation(self.rayTracerShader, "frame_index"), self.frameIndex)
+
+        measureTiles = self.adaptiveSampling or self.recordTileCosts
+        glUniform1i(glGetUniformLocation(self.rayTracerShader, "measure_tiles"), measureTiles)
+        if measureTiles:
+            self.prepareTileCosts()
+
+        if self.compressedNodes:
+            glUniform3fv(glGetUniformLocation(self.rayTracerShader, "root_min"), 1, scene.compressed_nodes.root_min)
+            glUniform3fv(glGetUniformLocation(self.rayTracerShader, "root_max"), 1, scene.compressed_nodes.root_max)
+
+        with self.profiler.scope("buffer upload"):
+            if scene.outDated:
+                self.updateScene(scene)
+            
+            #no update ran since the region was mapped,
+            #it still holds bounds from a few frames ago
+            scene.write_refit_target()
+            
+            for sceneBuffer in self.sceneBuffers:
+                sceneBuffer.readFrom()
 
         self.skyBoxMaterial.use()
         
+    def prepareTileCosts(self) -> None:
+        """
+            Clear the tile costs, this frame's dispatch adds to them.
+        """
+
+        self.tileCostBuffer.clear(0, self.maxTileCount)
+        self.tileCostBuffer.readFrom()
+    
+    def dispatchExtraSamples(self, tileCount: int) -> None:
+        """
+            List the tiles whose cost passed the threshold, then
+            dispatch one work group per listed tile to add samples.
+            Tiles under the threshold cost nothing.
+        """
+
+        #untraced pixels don't add to the cost
+        interleave = self.interleave if self.temporalAccumulation else 1
+        costLimit = int(self.costThreshold * 64 / max(interleave, 1))
+
+        self.tileListBuffer.clear(0, 1)
+        self.tileListBuffer.readFrom()
+        glMemoryBarrier(GL_SHADER_STORAGE_BARRIER_BIT)
+
+        glUseProgram(self.compactShader)
+        glUniform1i(glGetUniformLocation(self.compactShader, "tile_count"), tileCount)
+        glUniform1ui(glGetUniformLocation(self.compactShader, "cost_limit"), costLimit)
+        glDispatchCompute((tileCount + 63) // 64, 1, 1)
+        glMemoryBarrier(
+            GL_SHADER_STORAGE_BARRIER_BIT | GL_COMMAND_BARRIER_BIT 
+            | GL_SHADER_IMAGE_ACCESS_BARRIER_BIT)
+
+        glUseProgram(self.rayTracerShader)
+        glUniform1i(glGetUniformLocation(self.rayTracerShader, "extra_samples"), 1)
+        glUniform1i(glGetUniformLocation(self.rayTracerShader, "adaptive_samples"), self.adaptiveSamples)
+        glBindBuffer(GL_DISPATCH_INDIRECT_BUFFER, self.tileListBuffer.deviceMemory)
+        glDispatchComputeIndirect(0)
+        glUniform1i(glGetUniformLocation(self.rayTracerShader, "extra_samples"), 0)
+    
     def renderScene(self, scene: scene.Scene):
         """
             Draw all objects in the scene
         """
         
-        start = time.time()
         glUseProgram(self.rayTracerShader)
 
         self.prepareScene(scene)
 
-        self.colorBuffer.writeTo()
+        #the extra sample pass averages with the color the first pass wrote
+        extraSamples = self.adaptiveSampling and self.adaptiveSamples > 1
+        access = GL_READ_WRITE if extraSamples else GL_WRITE_ONLY
+        if self.temporalAccumulation:
+            self.accumulationBuffer.writeTo(access)
+            size = self.accumulationBuffer.size
+        else:
+            self.colorBuffer.writeTo(access)
+            size = self.colorBuffer.sizes[self.colorBuffer.detailLevel]
         
-        subgroup_x_count = int(self.colorBuffer.sizes[self.colorBuffer.detailLevel] / 8)
-        subgroup_y_count = int(self.colorBuffer.sizes[self.colorBuffer.detailLevel] / 8)
+        subgroup_x_count = int(size / 8)
+        subgroup_y_count = int(size / 8)
 
-        glDispatchCompute(subgroup_x_count, subgroup_y_count, 1)
+        with self.profiler.scope("dispatch"), self.profiler.gpu_scope("dispatch"):
+            glDispatchCompute(subgroup_x_count, subgroup_y_count, 1)
+
+        if extraSamples:
+            with self.profiler.scope("extra samples"), self.profiler.gpu_scope("extra samples"):
+                self.dispatchExtraSamples(subgroup_x_count * subgroup_y_count)
+
+        if self.recordTileCosts:
+            glMemoryBarrier(GL_BUFFER_UPDATE_BARRIER_BIT)
+            self.tileCosts = self.tileCostBuffer.readBack(
+                0, subgroup_x_count * subgroup_y_count
+            ).reshape(subgroup_y_count, subgroup_x_count).copy()
+
+        if self.persistentBuffers:
+            for streamingBuffer in self.streamingBuffers:
+                streamingBuffer.fence()
+        
+        #the next update writes its bounds into the region the next frame reads
+        if self.refitInPlace:
+            scene.refit_target = self.nodeBuffer.map()
         
         glMemoryBarrier(GL_SHADER_IMAGE_ACCESS_BARRIER_BIT)
 
-        self.drawScreen()
-        finish = time.time()
-        #print(f"render took {(finish - start) * 1000} milliseconds.")
+        if self.temporalAccumulation:
+            with self.profiler.gpu_scope("resolve"):
+                self.resolveHistory(scene)
+
+        with self.profiler.gpu_scope("blit"):
+            self.drawScreen()
+
+    def resolveHistory(self, scene: scene.Scene) -> None:
+        """
+            Fill in the pixels skipped this frame from the last
+            frame's image, reprojected through the previous camera.
+        """
+
+        glUseProgram(self.resolveShader)
+
+        correction_factor = self.screenHeight / self.screenWidth
+        camera = (
+            scene.camera.position.copy(), scene.camera.forwards.copy(), 
+            scene.camera.right.copy(), correction_factor * scene.camera.up)
+        historyValid = self.previousCamera is not None
+        if not historyValid:
+            self.previousCamera = camera
+
+        for name, previous, value in zip(
+            ("position", "forwards", "right", "up"), self.previousCamera, camera):
+            glUniform3fv(glGetUniformLocation(self.resolveShader, f"viewer.{name}"), 1, value)
+            glUniform3fv(glGetUniformLocation(self.resolveShader, f"previous_viewer.{name}"), 1, previous)
+        glUniform1i(glGetUniformLocation(self.resolveShader, "interleave"), self.interleave)
+        glUniform1i(glGetUniformLocation(self.resolveShader, "frame_index"), self.frameIndex)
+        glUniform1i(glGetUniformLocation(self.resolveShader, "history_valid"), historyValid)
+
+        self.accumulationBuffer.resolveTo()
+        groups = int(self.accumulationBuffer.size / 8)
+        glDispatchCompute(groups, groups, 1)
+        glMemoryBarrier(GL_SHADER_IMAGE_ACCESS_BARRIER_BIT | GL_TEXTURE_FETCH_BARRIER_BIT)
+
+        self.accumulationBuffer.swap()
+        self.previousCamera = camera
+        self.frameIndex += 1
 
     def drawScreen(self):
         glUseProgram(self.shader)
         glBindFramebuffer(GL_FRAMEBUFFER, 0)
-        self.colorBuffer.readFrom()
+        if self.temporalAccumulation:
+            self.accumulationBuffer.readFrom()
+        else:
+            self.colorBuffer.readFrom()
         self.screenQuad.draw()
         glFlush()
         self.numFrames += 1
     
     def adaptResolution(self, frameRate):
 
+        if self.temporalAccumulation:
+            #hold full resolution, trace fewer pixels per frame instead
+            if frameRate > self.targetFrameRate + self.frameRateMargin:
+                self.interleave = max(1, self.interleave // 2)
+            elif frameRate < self.targetFrameRate - self.frameRateMargin:
+                self.interleave = min(4, self.interleave * 2)
+            return
+
         if frameRate > self.targetFrameRate + self.frameRateMargin:
             #increase resolution
             self.colorBuffer.upsize()
@@ -175,6 +445,7 @@ class Engine:
         glUseProgram(self.rayTracerShader)
         glMemoryBarrier(GL_ALL_BARRIER_BITS)
         glDeleteProgram(self.rayTracerShader)
+        self.profiler.destroy()
         glDeleteVertexArrays(1, (self.vao,))
         glDeleteBuffers(1, (self.vbo,))
         glDeleteTextures(1, (self.colorBuffer,))
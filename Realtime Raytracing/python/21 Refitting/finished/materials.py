@@ -1,9 +1,14 @@
 from config import *
+import cubemap
 
 class CubeMapMaterial:
 
 
-    def __init__(self, filepath):
+    def __init__(self, filepath, cache_dir = "cubemap_cache"):
+        """
+            Load the six faces at filepath_<face>.png, decoded in
+            parallel the first time and from cache_dir after that.
+        """
 
         self.texture = glGenTextures(1)
         glBindTexture(GL_TEXTURE_CUBE_MAP, self.texture)
@@ -14,63 +19,13 @@ class CubeMapMaterial:
         glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
         glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
 
-        with Image.open(f"{filepath}_left.png", mode = "r") as img:
-            image_width,image_height = img.size
-            img = img.convert('RGBA')
-            img_data = bytes(img.tobytes())
-            glTexImage2D(
-                GL_TEXTURE_CUBE_MAP_NEGATIVE_Y,0,GL_RGBA8,image_width,image_height,
-                0,GL_RGBA,GL_UNSIGNED_BYTE,img_data
-            )
-        
-        with Image.open(f"{filepath}_right.png", mode = "r") as img:
-            image_width,image_height = img.size
-            img = ImageOps.flip(img)
-            img = ImageOps.mirror(img)
-            img = img.convert('RGBA')
-            img_data = bytes(img.tobytes())
-            glTexImage2D(
-                GL_TEXTURE_CUBE_MAP_POSITIVE_Y,0,GL_RGBA8,image_width,image_height,
-                0,GL_RGBA,GL_UNSIGNED_BYTE,img_data
-            )
-        
-        with Image.open(f"{filepath}_top.png", mode = "r") as img:
-            image_width,image_height = img.size
-            img = img.rotate(90)
-            img = img.convert('RGBA')
-            img_data = bytes(img.tobytes())
-            glTexImage2D(
-                GL_TEXTURE_CUBE_MAP_POSITIVE_Z,0,GL_RGBA8,image_width,image_height,
-                0,GL_RGBA,GL_UNSIGNED_BYTE,img_data
-            )
-
-        with Image.open(f"{filepath}_bottom.png", mode = "r") as img:
-            image_width,image_height = img.size
-            img = img.convert('RGBA')
-            img_data = bytes(img.tobytes())
-            glTexImage2D(
-                GL_TEXTURE_CUBE_MAP_NEGATIVE_Z,0,GL_RGBA8,image_width,image_height,
-                0,GL_RGBA,GL_UNSIGNED_BYTE,img_data
-            )
-        
-        with Image.open(f"{filepath}_back.png", mode = "r") as img:
-            image_width,image_height = img.size
-            img = img.rotate(-90)
-            img = img.convert('RGBA')
-            img_data = bytes(img.tobytes())
-            glTexImage2D(
-                GL_TEXTURE_CUBE_MAP_NEGATIVE_X,0,GL_RGBA8,image_width,image_height,
-                0,GL_RGBA,GL_UNSIGNED_BYTE,img_data
-            )
-
-        with Image.open(f"{filepath}_front.png", mode = "r") as img:
-            image_width,image_height = img.size
-            img = img.rotate(90)
-            img = img.convert('RGBA')
-            img_data = bytes(img.tobytes())
+        faces = cubemap.load_faces(filepath, cache_dir)
+        size = faces.shape[1]
+        #each face is a contiguous slice, GL reads it in place
+        for (_, target, *_), face in zip(cubemap.FACES, faces):
             glTexImage2D(
-                GL_TEXTURE_CUBE_MAP_POSITIVE_X,0,GL_RGBA8,image_width,image_height,
-                0,GL_RGBA,GL_UNSIGNED_BYTE,img_data
+                target,0,GL_RGBA8,size,size,
+                0,GL_RGBA,GL_UNSIGNED_BYTE,face
             )
     
     def use(self):
@@ -81,6 +36,10 @@ class CubeMapMaterial:
         glDeleteTextures(1, (self.texture,))
 
 class Material:
+    """
+        Color images at a range of sizes, one is traced into at a time.
+        They're rgba32f, the format the raytracer declares its output in.
+    """
         
     def __init__(self, minDetail: int, maxDetail: int):
 
@@ -98,7 +57,7 @@ class Material:
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
         
-            glTexStorage2D(GL_TEXTURE_2D, 1, GL_RGBA16F, size, size)
+            glTexStorage2D(GL_TEXTURE_2D, 1, GL_RGBA32F, size, size)
             self.textures.append(newTexture)
             self.sizes.append(size)
             size *= 2
@@ -126,10 +85,14 @@ class Material:
         """
         self.detailLevel = max(0, self.detailLevel - 1)
     
-    def writeTo(self) -> None:
+    def writeTo(self, access: int = GL_WRITE_ONLY) -> None:
+        """
+            Bind the current image for the raytracer, access is
+            GL_READ_WRITE when a pass reads back what it wrote.
+        """
 
         glActiveTexture(GL_TEXTURE0)
-        glBindImageTexture(0, self.textures[self.detailLevel], 0, GL_FALSE, 0, GL_READ_ONLY, GL_RGBA16F)
+        glBindImageTexture(0, self.textures[self.detailLevel], 0, GL_FALSE, 0, access, GL_RGBA32F)
 
     def readFrom(self) -> None:
 
@@ -156,7 +119,7 @@ class MaterialFixed:
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
     
-        glTexStorage2D(GL_TEXTURE_2D, 1, GL_RGBA16F, width, height)
+        glTexStorage2D(GL_TEXTURE_2D, 1, GL_RGBA32F, width, height)
         
         self.clearColor = np.zeros(width * height * 4, dtype = np.float16)
     
@@ -178,10 +141,10 @@ class MaterialFixed:
         """
         pass
     
-    def writeTo(self) -> None:
+    def writeTo(self, access: int = GL_WRITE_ONLY) -> None:
 
         glActiveTexture(GL_TEXTURE0)
-        glBindImageTexture(0, self.texture, 0, GL_FALSE, 0, GL_READ_ONLY, GL_RGBA16F)
+        glBindImageTexture(0, self.texture, 0, GL_FALSE, 0, access, GL_RGBA32F)
 
     def readFrom(self) -> None:
 
@@ -192,15 +155,83 @@ class MaterialFixed:
 
         pass
 
-def make_materials(count: int) -> np.ndarray:
+class AccumulationBuffer:
+    """
+        Fixed resolution images for temporal accumulation.
+        current receives this frame's traced pixels, the two
+        history images take turns being read and resolved into.
+        Each holds (r g b primary hit distance).
+    """
+        
+    def __init__(self, size: int):
+
+        self.size = size
+        self.textures: list[int] = []
+        for _ in range(3):
+            newTexture = glGenTextures(1)
+            glActiveTexture(GL_TEXTURE0)
+            glBindTexture(GL_TEXTURE_2D, newTexture)
+
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        
+            glTexStorage2D(GL_TEXTURE_2D, 1, GL_RGBA32F, size, size)
+            self.textures.append(newTexture)
+        
+        self.current = self.textures[0]
+        self.history = self.textures[1:]
+        #index of the most recently resolved history image
+        self.latest = 0
+    
+    def writeTo(self, access: int = GL_WRITE_ONLY) -> None:
+
+        glActiveTexture(GL_TEXTURE0)
+        glBindImageTexture(0, self.current, 0, GL_FALSE, 0, access, GL_RGBA32F)
+    
+    def resolveTo(self) -> None:
+        """
+            Bind the images for the resolve pass: write the older
+            history image, read the current one and the latest history.
+        """
+
+        glActiveTexture(GL_TEXTURE0)
+        glBindImageTexture(0, self.history[1 - self.latest], 0, GL_FALSE, 0, GL_WRITE_ONLY, GL_RGBA32F)
+        glBindImageTexture(1, self.current, 0, GL_FALSE, 0, GL_READ_ONLY, GL_RGBA32F)
+        glActiveTexture(GL_TEXTURE5)
+        glBindTexture(GL_TEXTURE_2D, self.history[self.latest])
+    
+    def swap(self) -> None:
+
+        self.latest = 1 - self.latest
+
+    def readFrom(self) -> None:
+
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self.history[self.latest])
+    
+    def destroy(self) -> None:
 
-    _materials = []
-    for _ in range(count):
-        r = np.random.uniform(low = 0.0, high = 1.0)
-        g = np.random.uniform(low = 0.0, high = 1.0)
-        b = np.random.uniform(low = 0.0, high = 1.0)
-        reflectance = np.random.uniform(low = 0.2, high = 0.8)
-        eta = np.random.uniform(low = 0.5, high = 0.9)
-        _materials.append((r,g,b,reflectance,eta))
+        glDeleteTextures(len(self.textures), self.textures)
 
-    return np.array(_materials, dtype=data_type_material)
\ No newline at end of file
+def make_materials(count: int, rng = None) -> np.ndarray:
+    """
+        Make a batch of random materials in one pass.
+        rng is a seed or np.random.Generator, by default
+        numpy's global (seeded) state is used.
+    """
+
+    if rng is None:
+        rng = np.random
+    else:
+        rng = np.random.default_rng(rng)
+
+    _materials = np.zeros(count, dtype=data_type_material)
+    _materials['r'] = rng.uniform(low = 0.0, high = 1.0, size = count)
+    _materials['g'] = rng.uniform(low = 0.0, high = 1.0, size = count)
+    _materials['b'] = rng.uniform(low = 0.0, high = 1.0, size = count)
+    _materials['reflectance'] = rng.uniform(low = 0.2, high = 0.8, size = count)
+    _materials['eta'] = rng.uniform(low = 0.5, high = 0.9, size = count)
+
+    return _materials
\ No newline at end of file
@@ -0,0 +1,188 @@
+from config import *
+import collections
+import contextlib
+import csv
+import json
+#---- Frame Profiler                 ----#
+# CPU scopes are timed directly, GPU     #
+# scopes with GL_TIME_ELAPSED queries,   #
+# which are read back a few frames late  #
+# so the CPU never waits on them.        #
+# The last few hundred frames are kept   #
+# for export.                            #
+#----------------------------------------#
+
+class Profiler:
+    """
+        Collects per frame timings into a ring buffer of frame records.
+        Each record holds the frame number, its start time and, in
+        milliseconds, its cpu scopes as (name, start, duration) and
+        its gpu scopes as name: (start, duration). Starts are relative
+        to the profiler's creation, gpu starts are when the query was
+        issued on the CPU.
+    """
+
+    def __init__(self, capacity: int = 600):
+
+        self.origin = time.perf_counter()
+        self.frames = collections.deque(maxlen = capacity)
+        self.frame = None
+        self.frame_count = 0
+
+        #(record, name, query) in the order issued
+        self.pending_queries = collections.deque()
+        self.free_queries: list[int] = []
+        self.query_available = np.zeros(1, dtype = np.uint32)
+        self.query_result = np.zeros(1, dtype = np.uint64)
+
+    def now(self) -> float:
+
+        return (time.perf_counter() - self.origin) * 1000
+
+    def begin_frame(self) -> None:
+
+        self.frame = {
+            "frame": self.frame_count,
+            "start": self.now(),
+            "duration": 0.0,
+            "cpu": [],
+            "gpu": {}
+        }
+        self.frame_count += 1
+        self.frames.append(self.frame)
+
+    def end_frame(self) -> None:
+
+        if self.frame is not None:
+            self.frame["duration"] = self.now() - self.frame["start"]
+            self.frame = None
+        self.collect_queries()
+
+    @contextlib.contextmanager
+    def scope(self, name: str):
+        """
+            Time a block on the CPU.
+        """
+
+        start = self.now()
+        try:
+            yield
+        finally:
+            if self.frame is not None:
+                self.frame["cpu"].append((name, start, self.now() - start))
+
+    @contextlib.contextmanager
+    def gpu_scope(self, name: str):
+        """
+            Time a block's GL commands on the GPU. Scopes can't overlap,
+            GL allows only one elapsed time query at a time.
+        """
+
+        if self.frame is None:
+            yield
+            return
+
+        if self.free_queries:
+            query = self.free_queries.pop()
+        else:
+            query = glGenQueries(1)[0]
+
+        start = self.now()
+        glBeginQuery(GL_TIME_ELAPSED, query)
+        try:
+            yield
+        finally:
+            glEndQuery(GL_TIME_ELAPSED)
+            self.frame["gpu"][name] = (start, None)
+            self.pending_queries.append((self.frame, name, query))
+
+    def collect_queries(self) -> None:
+        """
+            Read back whichever queries have finished, oldest first.
+        """
+
+        while self.pending_queries:
+
+            record, name, query = self.pending_queries[0]
+            glGetQueryObjectuiv(query, GL_QUERY_RESULT_AVAILABLE, self.query_available)
+            if not self.query_available[0]:
+                break
+
+            glGetQueryObjectui64v(query, GL_QUERY_RESULT, self.query_result)
+            start, _ = record["gpu"][name]
+            record["gpu"][name] = (start, float(self.query_result[0]) / 1e6)
+
+            self.pending_queries.popleft()
+            self.free_queries.append(query)
+
+    def summary(self) -> dict[str, float]:
+        """
+            Mean milliseconds per frame spent in each scope,
+            over the frames held.
+        """
+
+        totals = collections.defaultdict(float)
+        frames = 0
+        for record in self.frames:
+            frames += 1
+            for name, _, duration in record["cpu"]:
+                totals[f"cpu/{name}"] += duration
+            for name, (_, duration) in record["gpu"].items():
+                if duration is not None:
+                    totals[f"gpu/{name}"] += duration
+            totals["frame"] += record["duration"]
+
+        return {name: total / max(frames, 1) for name, total in totals.items()}
+
+    def export_csv(self, filepath: str) -> None:
+        """
+            One row per scope: frame, kind, name, start_ms, duration_ms.
+        """
+
+        with open(filepath, 'w', newline = '') as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "kind", "name", "start_ms", "duration_ms"])
+            for record in self.frames:
+                writer.writerow(
+                    [record["frame"], "frame", "frame", record["start"], record["duration"]])
+                for name, start, duration in record["cpu"]:
+                    writer.writerow([record["frame"], "cpu", name, start, duration])
+                for name, (start, duration) in record["gpu"].items():
+                    if duration is not None:
+                        writer.writerow([record["frame"], "gpu", name, start, duration])
+
+    def export_chrome_trace(self, filepath: str) -> None:
+        """
+            Write a trace for chrome://tracing or Perfetto,
+            cpu scopes on one track and gpu scopes on another.
+        """
+
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": 0, "tid": 0, "args": {"name": "CPU"}},
+            {"name": "thread_name", "ph": "M", "pid": 0, "tid": 1, "args": {"name": "GPU"}},
+        ]
+        for record in self.frames:
+            events.append({
+                "name": f"frame {record['frame']}", "cat": "frame", "ph": "X",
+                "ts": record["start"] * 1000, "dur": record["duration"] * 1000,
+                "pid": 0, "tid": 0})
+            for name, start, duration in record["cpu"]:
+                events.append({
+                    "name": name, "cat": "cpu", "ph": "X",
+                    "ts": start * 1000, "dur": duration * 1000,
+                    "pid": 0, "tid": 0})
+            for name, (start, duration) in record["gpu"].items():
+                if duration is not None:
+                    events.append({
+                        "name": name, "cat": "gpu", "ph": "X",
+                        "ts": start * 1000, "dur": duration * 1000,
+                        "pid": 0, "tid": 1})
+
+        with open(filepath, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def destroy(self) -> None:
+
+        queries = self.free_queries + [query for _, _, query in self.pending_queries]
+        if queries:
+            glDeleteQueries(len(queries), queries)
@@ -3,7 +3,11 @@ import sphere
 import camera
 import node
 import bvh_backend
+import bvh_cache
+import bvh_compress
 import materials
+import profiler
+import two_level
 
 class Scene:
     """
@@ -11,30 +15,92 @@ class Scene:
     """
 
 
-    def __init__(self):
+    def __init__(self, _profiler: profiler.Profiler = None, 
+                 cache_dir: str = "bvh_cache", instanced: bool = False):
         """
             Set up scene objects.
+
+                Parameters:
+                    _profiler (Profiler): times the update's stages,
+                        one is made if not given
+                    cache_dir (str): trees are saved here and reused by
+                        later runs over the same spheres, None turns
+                        caching off
+                    instanced (bool): trace moving instances of a few
+                        cached meshes, under a top level tree rebuilt
+                        every update, rather than one flat tree over
+                        every sphere
         """
         
-        self.rebuild_count = 0
+        self.profiler = _profiler if _profiler is not None else profiler.Profiler()
+        self.parallel_build = True
+        #reuse the tree from an earlier run over the same spheres
+        self.cache_bvh = cache_dir is not None
+        self.cache_dir = cache_dir
+        #rebuild once the tree's cost has grown by this factor
+        #since the last build
+        self.rebuild_threshold = 1.5
+        #and keep rebuilding to at most this share of the time,
+        #going by how long the last build took, so a slow build
+        #waits longer before the next one
+        self.rebuild_budget = 0.25
+        self.last_rebuild = time.time()
+        self.refits = 0
+        self.rebuilds = 0
+        self.cache_loads = 0
+        self.cost_ratio = 1.0
+        #build settings, more bins and axes give a better tree
+        #at the price of a slower build
+        self.bin_count = 16
+        self.all_axes = False
         material_count = 16
         self.materials = materials.make_materials(material_count)
         self.sphere_count = 3000
         self.spheres = sphere.make_spheres(self.sphere_count, material_count)
+        #move the spheres and refit from a contiguous copy of their
+        #fields, packing positions back into the records for upload,
+        #rather than working on the records in place. The refit is
+        #bound by its node writes, so this doesn't pay off yet
+        self.column_layout = False
+        if self.column_layout:
+            self.sphere_columns = sphere.make_columns(self.spheres)
+        else:
+            self.sphere_columns = sphere.record_columns(self.spheres)
         
         self.camera = camera.Camera(
             position = [0.0, 0.0, 1.0]
         )
+        #when set, the next refit also writes its bounds here.
+        #The engine points it at the mapped region for the next frame,
+        #which is write only, so the refit itself always runs on nodes
+        self.refit_target: np.ndarray = None
+
+        self.instanced = instanced
+        if self.instanced:
+            self.make_instances(material_count)
+            self.outDated = True
+            return
 
         self.sphere_ids = np.arange(self.sphere_count, dtype=np.int32)
 
         self.nodes = node.make_nodes(2 * self.sphere_count + 1)
+        #bookkeeping for partial refits
+        self.parents = np.zeros(len(self.nodes), dtype=np.int32)
+        self.sphere_leaves = np.zeros(self.sphere_count, dtype=np.int32)
+        self.refit_marks = np.zeros(len(self.nodes), dtype=np.uint8)
+        #a quantized copy of the nodes, kept up to date when set
+        self.compress_nodes = False
+        self.compressed_nodes = bvh_compress.CompressedNodes(len(self.nodes))
 
-        start = time.time()
-        self.nodes_used = bvh_backend.build_bvh(
-            self.nodes, self.spheres, self.sphere_ids, self.sphere_count)
-        finish = time.time()
-        print(f"BVH build took {(finish - start) * 1000} ms.")
+        if self.cache_bvh and self.load_cached_bvh():
+            print(f"BVH loaded from cache in {self.build_time} ms, SAH cost: {self.build_cost}.")
+        else:
+            self.rebuild()
+            print(f"BVH build took {self.build_time} ms, SAH cost: {self.build_cost}.")
+            if self.cache_bvh:
+                bvh_cache.save(
+                    self.cache_key(), self.nodes, self.sphere_ids, 
+                    self.nodes_used, self.cache_dir)
 
         """
         for i in range(self.nodes_used):
@@ -43,10 +109,150 @@ class Scene:
 
         self.outDated = True
     
+    def make_instances(self, material_count: int) -> None:
+        """
+            Set up the two level scene: each mesh's tree is built once,
+            instances place the meshes and move every update.
+
+                Parameters:
+                    material_count (int): materials the meshes pick from
+        """
+
+        self.mesh_count = 8
+        self.instance_count = 300
+        self.blas = two_level.BlasCache()
+        for _ in range(self.mesh_count):
+            self.blas.add_mesh(two_level.make_mesh(40, material_count, size = 6.0))
+        
+        count = self.instance_count
+        self.instances = two_level.make_instances(count)
+        for i in range(count):
+            two_level.set_transform(
+                self.instances, i, self.blas, i % self.mesh_count, np.eye(4))
+        self.instance_positions = np.random.uniform(
+            low = (-95.0, -95.0, -15.0), high = (95.0, 95.0, 15.0), size = (count, 3))
+        self.instance_velocities = np.random.uniform(low = -1.0, high = 1.0, size = (count, 3))
+        self.instance_angles = np.random.uniform(low = 0.0, high = 2 * np.pi, size = count)
+        self.instance_spins = np.random.uniform(low = -0.05, high = 0.05, size = count)
+        two_level.move_instances(
+            self.instances, self.instance_positions, self.instance_velocities,
+            self.instance_angles, self.instance_spins, 0.0)
+
+        self.instance_bvh = two_level.TwoLevelBVH(self.blas, self.instances)
+    
     def rebuild(self):
+        """
+            Build the bvh from scratch, on every core if parallel_build is set.
+            Records the build time (ms) and the resulting tree's SAH cost.
+        """
+
+        if self.parallel_build:
+            build = bvh_backend.build_bvh_parallel
+        else:
+            build = bvh_backend.build_bvh
+
+        start = time.time()
+        self.nodes_used = build(
+            self.nodes, self.spheres, self.sphere_ids, self.sphere_count,
+            self.bin_count, self.all_axes)
+        finish = time.time()
+
+        self.build_time = (finish - start) * 1000
+        self.rebuilds += 1
+        self.finish_build()
+    
+    def cache_key(self) -> str:
+
+        if self.parallel_build:
+            builder = "build_bvh_parallel"
+        else:
+            builder = "build_bvh"
+        
+        return bvh_cache.scene_key(
+            self.spheres, builder, self.bin_count, self.all_axes)
+    
+    def load_cached_bvh(self) -> bool:
+        """
+            Map in the tree saved by an earlier run over the same spheres,
+            returns whether one was found.
+        """
 
-        self.nodes_used = bvh_backend.build_bvh(
-            self.nodes, self.spheres, self.sphere_ids, 3000)
+        start = time.time()
+        cached = bvh_cache.load(self.cache_key(), self.cache_dir)
+        if cached is None or len(cached[0]) != len(self.nodes):
+            return False
+        
+        self.nodes, self.sphere_ids, self.nodes_used = cached
+        finish = time.time()
+
+        self.build_time = (finish - start) * 1000
+        self.cache_loads += 1
+        self.finish_build()
+        return True
+    
+    def finish_build(self) -> None:
+        """
+            Measure a freshly built tree and set up refitting.
+        """
+
+        self.build_cost = bvh_backend.tree_cost(self.nodes, self.nodes_used)
+        self.cost_sum = bvh_backend.summed_cost(self.nodes, self.nodes_used)
+        self.cost_ratio = 1.0
+        self.last_rebuild = time.time()
+        self.rebuilt = True
+
+        bvh_backend.link_nodes(
+            self.nodes, self.sphere_ids, self.nodes_used, 
+            self.parents, self.sphere_leaves)
+
+        if self.compress_nodes:
+            self.compressed_nodes.update(self.nodes, self.nodes_used)
+    
+    def refit(self, changed: np.ndarray = None) -> None:
+        """
+            Refit the bvh to the spheres' current positions,
+            and measure how far its cost has drifted since the last build.
+
+            Parameters:
+                changed: indices or boolean mask of the spheres
+                    which moved, if not given, every node is refit.
+        """
+
+        self.refits += 1
+
+        if changed is None:
+            self.cost_sum = bvh_backend.refit_bvh(
+                self.nodes, self.sphere_columns, self.sphere_ids, self.nodes_used)
+        else:
+            if changed.dtype == np.bool_:
+                changed = np.flatnonzero(changed)
+            
+            self.cost_sum = bvh_backend.refit_bvh_dirty(
+                self.nodes, self.sphere_columns, self.sphere_ids, 
+                self.parents, self.sphere_leaves, 
+                changed.astype(np.int32, copy=False), self.refit_marks,
+                self.cost_sum)
+        
+        cost = self.cost_sum / max(bvh_backend.node_area(self.nodes, 0), 1e-10)
+        self.cost_ratio = cost / self.build_cost
+
+        self.write_refit_target()
+
+        if self.compress_nodes:
+            self.compressed_nodes.update(self.nodes, self.nodes_used)
+    
+    def write_refit_target(self) -> None:
+        """
+            Write the nodes' bounds into refit_target, if it's set.
+            The target can be a few frames behind, so every node's
+            bounds go in, but nothing is read back from it.
+        """
+
+        if self.refit_target is None:
+            return
+        
+        bvh_backend.write_bounds(self.nodes, self.refit_target, self.nodes_used)
+        self.refit_target = None
     
     def move_player(self, forwardsSpeed, rightSpeed):
         """
@@ -82,13 +288,27 @@ class Scene:
         """
 
         self.outDated = True
-        sphere.update_spheres(self.spheres, dt)
 
-        if self.rebuild_count == 16:
-            self.nodes_used = bvh_backend.build_bvh(
-                self.nodes, self.spheres, 
-                self.sphere_ids, self.sphere_count)
-            self.rebuild_count = 0
-        else:
-            bvh_backend.refit_bvh(self.nodes, self.spheres, self.sphere_ids, self.nodes_used)
-            self.rebuild_count += 1
+        if self.instanced:
+            with self.profiler.scope("instance update"):
+                two_level.move_instances(
+                    self.instances, self.instance_positions, self.instance_velocities,
+                    self.instance_angles, self.instance_spins, dt)
+            with self.profiler.scope("top level rebuild"):
+                self.instance_bvh.rebuild()
+            return
+
+        with self.profiler.scope("sphere update"):
+            if self.column_layout:
+                sphere.update_columns(self.sphere_columns, dt)
+                sphere.pack_positions(self.sphere_columns, self.spheres)
+            else:
+                sphere.update_spheres(self.spheres, dt)
+
+        with self.profiler.scope("refit"):
+            self.refit()
+        hold_off = self.build_time / (1000 * self.rebuild_budget)
+        if self.cost_ratio > self.rebuild_threshold \
+            and time.time() - self.last_rebuild >= hold_off:
+            with self.profiler.scope("rebuild"):
+                self.rebuild()
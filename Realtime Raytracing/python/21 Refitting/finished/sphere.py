@@ -1,20 +1,34 @@
 from config import *
 
-def make_spheres(count: int, material_count: int) -> np.ndarray:
-
-    spheres = []
-    for _ in range(count):
-        x = np.random.uniform(low = -95.0, high = 95.0)
-        y = np.random.uniform(low = -95.0, high = 95.0)
-        z = np.random.uniform(low = -15.0, high = 15.0)
-        radius = np.random.uniform(low = 0.3, high = 2.0)
-        vx = np.random.uniform(low = -1.0, high = 1.0)
-        vy = np.random.uniform(low = -1.0, high = 1.0)
-        vz = np.random.uniform(low = -1.0, high = 1.0)
-        material = np.random.randint(low = 0, high = material_count)
-        spheres.append((x,y,z,radius,vx,vy,vz,material))
-
-    return np.array(spheres, dtype=data_type_sphere)
+def make_spheres(count: int, material_count: int, rng = None) -> np.ndarray:
+    """
+        Make a batch of random spheres in one pass.
+
+        Parameters:
+            count: number of spheres
+            material_count: materials are picked from [0, material_count)
+            rng: a seed or np.random.Generator, by default
+                numpy's global (seeded) state is used.
+    """
+
+    if rng is None:
+        rng = np.random
+    else:
+        rng = np.random.default_rng(rng)
+
+    spheres = np.zeros(count, dtype=data_type_sphere)
+    spheres['x'] = rng.uniform(low = -95.0, high = 95.0, size = count)
+    spheres['y'] = rng.uniform(low = -95.0, high = 95.0, size = count)
+    spheres['z'] = rng.uniform(low = -15.0, high = 15.0, size = count)
+    spheres['radius'] = rng.uniform(low = 0.3, high = 2.0, size = count)
+    spheres['vx'] = rng.uniform(low = -1.0, high = 1.0, size = count)
+    spheres['vy'] = rng.uniform(low = -1.0, high = 1.0, size = count)
+    spheres['vz'] = rng.uniform(low = -1.0, high = 1.0, size = count)
+    spheres['material'] = np.minimum(
+        rng.uniform(low = 0.0, high = material_count, size = count),
+        material_count - 1)
+
+    return spheres
 
 @njit(cache = True)
 def update_spheres(spheres: np.ndarray, dt: float) -> None:
@@ -44,4 +58,73 @@ def update_spheres(spheres: np.ndarray, dt: float) -> None:
 
         spheres[i]['vx'] = vx
         spheres[i]['vy'] = vy
-        spheres[i]['vz'] = vz
\ No newline at end of file
+        spheres[i]['vz'] = vz
+
+#---- Structure of Arrays            ----#
+# x, y, z, radius, vx, vy, vz as rows,   #
+# the refit reads spheres through these. #
+# make_columns copies them out into      #
+# contiguous rows, record_columns views  #
+# the records in place, strided.         #
+#----------------------------------------#
+def make_columns(spheres: np.ndarray) -> np.ndarray:
+    """
+        Copy the spheres into a (7, count) float32 array.
+    """
+
+    columns = np.empty((7, len(spheres)), dtype = np.float32)
+    for i, field in enumerate(('x', 'y', 'z', 'radius', 'vx', 'vy', 'vz')):
+        columns[i] = spheres[field]
+
+    return columns
+
+def record_columns(spheres: np.ndarray) -> np.ndarray:
+    """
+        View the sphere records as an (8, count) float32 array,
+        without copying. Rows are laid out as make_columns', the
+        last one holds the material's bits.
+    """
+
+    return spheres.view(np.float32).reshape(len(spheres), 8).T
+
+@njit(cache = True)
+def update_columns(columns: np.ndarray, dt: float) -> None:
+    """
+        update_spheres, over columns.
+    """
+
+    x = columns[0]
+    y = columns[1]
+    z = columns[2]
+    vx = columns[4]
+    vy = columns[5]
+    vz = columns[6]
+
+    for i in range(columns.shape[1]):
+
+        #Check for rebounds
+        if x[i] < -95.0 or x[i] > 95.0:
+            vx[i] = -vx[i]
+        if y[i] < -95.0 or y[i] > 95.0:
+            vy[i] = -vy[i]
+        if z[i] < -15.0 or z[i] > 15.0:
+            vz[i] = -vz[i]
+        
+        #Update positions
+        x[i] = x[i] + dt * vx[i]
+        y[i] = y[i] + dt * vy[i]
+        z[i] = z[i] + dt * vz[i]
+
+@njit(cache = True)
+def pack_positions(columns: np.ndarray, spheres: np.ndarray) -> None:
+    """
+        Write the columns' positions back into the sphere records,
+        ready for upload. The records' velocities aren't kept up to
+        date, the raytracer never reads them.
+    """
+
+    for i in range(columns.shape[1]):
+
+        spheres[i]['x'] = columns[0, i]
+        spheres[i]['y'] = columns[1, i]
+        spheres[i]['z'] = columns[2, i]
\ No newline at end of file
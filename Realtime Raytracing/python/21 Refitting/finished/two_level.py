@@ -0,0 +1,368 @@
+from config import *
+import node
+import bvh_backend
+import cpu_tracer
+#---- Two Level Acceleration         ----#
+# Each mesh (a group of spheres in its   #
+# own local space) gets a bottom level   #
+# bvh, built once. A small top level     #
+# bvh over the instances is rebuilt      #
+# whenever they move.                    #
+#----------------------------------------#
+
+class BlasCache:
+    """
+        Bottom level bvhs for every mesh, packed into shared arrays.
+        Child indices, sphere_id offsets and sphere indices are all
+        shifted to point into the packed arrays, so a mesh's tree
+        starts at its entry in roots.
+    """
+
+    def __init__(self):
+
+        self.spheres = np.zeros(0, dtype=data_type_sphere)
+        self.nodes = np.zeros(0, dtype=data_type_bvh_node)
+        self.sphere_ids = np.zeros(0, dtype=np.int32)
+        self.roots: list[int] = []
+
+    def add_mesh(self, spheres: np.ndarray) -> int:
+        """
+            Build a mesh's bvh and append it to the cache,
+            returns the mesh's index.
+        """
+
+        count = len(spheres)
+        nodes = node.make_nodes(2 * count + 1)
+        sphere_ids = np.arange(count, dtype=np.int32)
+        nodes_used = bvh_backend.build_bvh(nodes, spheres, sphere_ids, count)
+        nodes = nodes[:nodes_used]
+
+        #shift into the packed arrays
+        node_offset = len(self.nodes)
+        internal = nodes['sphere_count'] == 0
+        nodes['contents'] += np.where(internal, node_offset, len(self.sphere_ids))
+        sphere_ids += len(self.spheres)
+
+        self.roots.append(node_offset)
+        self.spheres = np.concatenate((self.spheres, spheres))
+        self.nodes = np.concatenate((self.nodes, nodes))
+        self.sphere_ids = np.concatenate((self.sphere_ids, sphere_ids))
+
+        return len(self.roots) - 1
+
+def make_mesh(count: int, material_count: int, size: float, rng = None) -> np.ndarray:
+    """
+        Make a cluster of random spheres around the local origin.
+
+        Parameters:
+            count: number of spheres
+            material_count: materials are picked from [0, material_count)
+            size: sphere centers lie within [-size, size] on each axis
+            rng: a seed or np.random.Generator, by default
+                numpy's global (seeded) state is used.
+    """
+
+    if rng is None:
+        rng = np.random
+    else:
+        rng = np.random.default_rng(rng)
+
+    spheres = np.zeros(count, dtype=data_type_sphere)
+    spheres['x'] = rng.uniform(low = -size, high = size, size = count)
+    spheres['y'] = rng.uniform(low = -size, high = size, size = count)
+    spheres['z'] = rng.uniform(low = -size, high = size, size = count)
+    spheres['radius'] = rng.uniform(low = 0.3, high = 2.0, size = count)
+    spheres['material'] = np.minimum(
+        rng.uniform(low = 0.0, high = material_count, size = count),
+        material_count - 1)
+
+    return spheres
+
+def make_instances(count: int) -> np.ndarray:
+
+    instances = np.zeros(count, dtype=data_type_instance)
+    instances['transform'][:] = np.eye(3, 4, dtype=np.float32)
+    instances['inverse'][:] = np.eye(3, 4, dtype=np.float32)
+
+    return instances
+
+def set_transform(instances: np.ndarray, i: int,
+    blas: BlasCache, mesh: int, transform: np.ndarray) -> None:
+    """
+        Place mesh as instance i, transform is a 3x4 or 4x4
+        local to world matrix.
+    """
+
+    matrix = np.eye(4, dtype=np.float64)
+    matrix[:3] = np.asarray(transform, dtype=np.float64)[:3]
+
+    instances[i]['transform'] = matrix[:3]
+    instances[i]['inverse'] = np.linalg.inv(matrix)[:3]
+    instances[i]['mesh'] = mesh
+    instances[i]['root'] = blas.roots[mesh]
+
+@njit(cache = True)
+def transform_point(matrix: np.ndarray, x: float, y: float, z: float) -> tuple[float, float, float]:
+
+    return (
+        matrix[0, 0] * x + matrix[0, 1] * y + matrix[0, 2] * z + matrix[0, 3],
+        matrix[1, 0] * x + matrix[1, 1] * y + matrix[1, 2] * z + matrix[1, 3],
+        matrix[2, 0] * x + matrix[2, 1] * y + matrix[2, 2] * z + matrix[2, 3])
+
+@njit(cache = True)
+def move_instances(instances: np.ndarray, 
+    positions: np.ndarray, velocities: np.ndarray,
+    angles: np.ndarray, spins: np.ndarray, dt: float) -> None:
+    """
+        Move and spin each instance about its z axis, bouncing off
+        the same walls as the spheres, and rewrite its transforms.
+        Transforms stay rigid, so the inverse is the transpose.
+    """
+
+    for i in range(len(instances)):
+
+        #Check for rebounds
+        if positions[i, 0] < -95.0 or positions[i, 0] > 95.0:
+            velocities[i, 0] = -velocities[i, 0]
+        if positions[i, 1] < -95.0 or positions[i, 1] > 95.0:
+            velocities[i, 1] = -velocities[i, 1]
+        if positions[i, 2] < -15.0 or positions[i, 2] > 15.0:
+            velocities[i, 2] = -velocities[i, 2]
+        
+        for axis in range(3):
+            positions[i, axis] += dt * velocities[i, axis]
+        angles[i] += dt * spins[i]
+
+        c = np.cos(angles[i])
+        s = np.sin(angles[i])
+        x = positions[i, 0]
+        y = positions[i, 1]
+        z = positions[i, 2]
+
+        transform = instances[i]['transform']
+        transform[0, 0] = c
+        transform[0, 1] = -s
+        transform[0, 2] = 0.0
+        transform[0, 3] = x
+        transform[1, 0] = s
+        transform[1, 1] = c
+        transform[1, 2] = 0.0
+        transform[1, 3] = y
+        transform[2, 0] = 0.0
+        transform[2, 1] = 0.0
+        transform[2, 2] = 1.0
+        transform[2, 3] = z
+
+        inverse = instances[i]['inverse']
+        inverse[0, 0] = c
+        inverse[0, 1] = s
+        inverse[0, 2] = 0.0
+        inverse[0, 3] = -(c * x + s * y)
+        inverse[1, 0] = -s
+        inverse[1, 1] = c
+        inverse[1, 2] = 0.0
+        inverse[1, 3] = s * x - c * y
+        inverse[2, 0] = 0.0
+        inverse[2, 1] = 0.0
+        inverse[2, 2] = 1.0
+        inverse[2, 3] = -z
+
+@njit(cache = True)
+def update_proxies(instances: np.ndarray, blas_nodes: np.ndarray,
+    proxies: np.ndarray) -> None:
+    """
+        Bound each instance's world space box with a sphere,
+        so the top level can be built by the sphere builder.
+    """
+
+    for i in range(len(instances)):
+
+        matrix = instances[i]['transform']
+        root = blas_nodes[instances[i]['root']]
+
+        #world box of the 8 transformed corners
+        min_x = min_y = min_z = 1e30
+        max_x = max_y = max_z = -1e30
+        for corner in range(8):
+            x = root['max_x'] if corner & 1 else root['min_x']
+            y = root['max_y'] if corner & 2 else root['min_y']
+            z = root['max_z'] if corner & 4 else root['min_z']
+            w_x, w_y, w_z = transform_point(matrix, x, y, z)
+            min_x = min(min_x, w_x)
+            min_y = min(min_y, w_y)
+            min_z = min(min_z, w_z)
+            max_x = max(max_x, w_x)
+            max_y = max(max_y, w_y)
+            max_z = max(max_z, w_z)
+
+        e_x = max_x - min_x
+        e_y = max_y - min_y
+        e_z = max_z - min_z
+        proxies[i]['x'] = 0.5 * (min_x + max_x)
+        proxies[i]['y'] = 0.5 * (min_y + max_y)
+        proxies[i]['z'] = 0.5 * (min_z + max_z)
+        proxies[i]['radius'] = 0.5 * np.sqrt(e_x * e_x + e_y * e_y + e_z * e_z)
+
+class TwoLevelBVH:
+    """
+        Instances of cached meshes, with a top level bvh over them.
+    """
+
+    def __init__(self, blas: BlasCache, instances: np.ndarray):
+
+        self.blas = blas
+        self.instances = instances
+
+        count = len(instances)
+        self.proxies = np.zeros(count, dtype=data_type_sphere)
+        self.nodes = node.make_nodes(2 * count + 1)
+        self.instance_ids = np.arange(count, dtype=np.int32)
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """
+            Rebuild the top level, call after moving instances.
+        """
+
+        update_proxies(self.instances, self.blas.nodes, self.proxies)
+        self.nodes_used = bvh_backend.build_bvh(
+            self.nodes, self.proxies, self.instance_ids, len(self.instances))
+
+    def trace(self, origin: np.ndarray, direction: np.ndarray) -> tuple[bool, float, int, int]:
+        """
+            Returns (hit, t, sphere index into blas.spheres, instance).
+        """
+
+        return trace(
+            self.nodes, self.instance_ids, self.instances,
+            self.blas.nodes, self.blas.sphere_ids, self.blas.spheres,
+            origin.astype(np.float64), direction.astype(np.float64))
+
+@njit(cache = True)
+def trace(
+    tlas_nodes: np.ndarray, instance_ids: np.ndarray, instances: np.ndarray,
+    blas_nodes: np.ndarray, sphere_ids: np.ndarray, spheres: np.ndarray,
+    origin: np.ndarray, direction: np.ndarray) -> tuple[bool, float, int, int]:
+    """
+        Find the nearest sphere along a world space ray.
+        Instances are entered by moving the ray into local space,
+        the direction isn't renormalized so t carries over unchanged.
+    """
+
+    nearest_hit = 9999999.0
+    hit_sphere = -1
+    hit_instance = -1
+
+    stack = np.zeros(cpu_tracer.NODE_STACK_SIZE, dtype = np.int32)
+    stack_pos = 0
+    node_index = 0
+    local_origin = np.zeros(3)
+    local_direction = np.zeros(3)
+
+    while True:
+
+        contents = int(tlas_nodes[node_index]['contents'])
+        count = int(tlas_nodes[node_index]['sphere_count'])
+
+        if count > 0:
+
+            for i in range(count):
+
+                instance = instance_ids[contents + i]
+                inverse = instances[instance]['inverse']
+                o_x, o_y, o_z = transform_point(inverse, origin[0], origin[1], origin[2])
+                d_x, d_y, d_z = transform_point(inverse, direction[0], direction[1], direction[2])
+                local_origin[0] = o_x
+                local_origin[1] = o_y
+                local_origin[2] = o_z
+                #directions don't translate
+                local_direction[0] = d_x - inverse[0, 3]
+                local_direction[1] = d_y - inverse[1, 3]
+                local_direction[2] = d_z - inverse[2, 3]
+
+                t, index = trace_blas(
+                    blas_nodes, sphere_ids, spheres, instances[instance]['root'],
+                    local_origin, local_direction, nearest_hit)
+                if index >= 0:
+                    nearest_hit = t
+                    hit_sphere = index
+                    hit_instance = instance
+
+        else:
+            left_child = contents
+            right_child = contents + 1
+            dist1 = cpu_tracer.hit_node(tlas_nodes, left_child, origin, direction, nearest_hit)
+            dist2 = cpu_tracer.hit_node(tlas_nodes, right_child, origin, direction, nearest_hit)
+
+            if dist1 > dist2:
+                left_child, right_child = right_child, left_child
+                dist1, dist2 = dist2, dist1
+
+            if dist1 <= nearest_hit:
+                node_index = left_child
+                if dist2 <= nearest_hit:
+                    stack = cpu_tracer.push_node(stack, stack_pos, right_child)
+                    stack_pos += 1
+                continue
+
+        if stack_pos == 0:
+            break
+        stack_pos -= 1
+        node_index = stack[stack_pos]
+
+    return hit_sphere >= 0, nearest_hit, hit_sphere, hit_instance
+
+@njit(cache = True)
+def trace_blas(
+    nodes: np.ndarray, sphere_ids: np.ndarray, spheres: np.ndarray, root: int,
+    origin: np.ndarray, direction: np.ndarray, nearest_hit: float) -> tuple[float, int]:
+    """
+        Traverse one bottom level tree, returns the nearest t
+        closer than nearest_hit and its sphere, or -1 on a miss.
+    """
+
+    hit_index = -1
+
+    stack = np.zeros(cpu_tracer.NODE_STACK_SIZE, dtype = np.int32)
+    stack_pos = 0
+    node_index = root
+
+    while True:
+
+        contents = int(nodes[node_index]['contents'])
+        count = int(nodes[node_index]['sphere_count'])
+
+        if count > 0:
+
+            for i in range(count):
+
+                sphere_index = sphere_ids[contents + i]
+                hit, t, backface = cpu_tracer.hit_sphere(
+                    spheres, sphere_index, origin, direction, 0.001, nearest_hit)
+                if hit:
+                    nearest_hit = t
+                    hit_index = sphere_index
+
+        else:
+            left_child = contents
+            right_child = contents + 1
+            dist1 = cpu_tracer.hit_node(nodes, left_child, origin, direction, nearest_hit)
+            dist2 = cpu_tracer.hit_node(nodes, right_child, origin, direction, nearest_hit)
+
+            if dist1 > dist2:
+                left_child, right_child = right_child, left_child
+                dist1, dist2 = dist2, dist1
+
+            if dist1 <= nearest_hit:
+                node_index = left_child
+                if dist2 <= nearest_hit:
+                    stack = cpu_tracer.push_node(stack, stack_pos, right_child)
+                    stack_pos += 1
+                continue
+
+        if stack_pos == 0:
+            break
+        stack_pos -= 1
+        node_index = stack[stack_pos]
+
+    return nearest_hit, hit_index